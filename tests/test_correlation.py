@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from scipy.stats import spearmanr
+
+from tolerable_app.simulate import sim_stream, sim_chunks
+
+
+INPUTS = {
+    'inputform_{}'.format(i): {'input_details': {'triangle_input_min': 0.0, 'triangle_input_mode': 0.5, 'triangle_input_max': 1.0},
+                               'input_name': name, 'input_type': 'triangle'}
+    for i, name in enumerate(('Aa', 'Bb', 'Cc'))
+}
+CORRELATIONS = 'Aa, Bb, 0.5; Bb, Cc, 0.5'
+
+
+@pytest.mark.parametrize('n', [2, 3, 2 ** 12 + 1, 2 ** 12 + 2])
+def test_short_blocks_are_correlated(n):
+    # the last chunk holds only n % chunk_size samples, fewer than the correlated inputs
+    settings = {'setting_alpha': 0.05, 'setting_n': n, 'setting_seed': 0, 'setting_sampling': 'random', 'setting_correlations': CORRELATIONS}
+    inputs_summaries, __ = sim_stream(inputs=INPUTS, settings=settings, chunk_size=2 ** 12)
+    assert inputs_summaries['Aa'].stats.count == n
+
+
+def test_rank_correlation_follows_the_target():
+    settings = {'setting_alpha': 0.05, 'setting_n': 2 ** 14, 'setting_seed': 0, 'setting_sampling': 'random', 'setting_correlations': CORRELATIONS}
+    (inputs_data, __), = sim_chunks(inputs=INPUTS, settings=settings, chunk_size=2 ** 14)
+    assert spearmanr(inputs_data['Aa'], inputs_data['Bb'])[0] == pytest.approx(0.5, abs=0.03)
+    assert spearmanr(inputs_data['Bb'], inputs_data['Cc'])[0] == pytest.approx(0.5, abs=0.03)
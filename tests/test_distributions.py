@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from tolerable_app.distributions import binomial_alias_table, poisson_alias_table, max_alias_support, sample_binomial, sample_poisson
+
+
+def test_alias_tables_truncate_both_tails():
+    table = binomial_alias_table(10 ** 6, 0.5)
+    assert len(table.values) < max_alias_support
+    assert table.values[0] > 0 and table.values[-1] < 10 ** 6
+
+    table = poisson_alias_table(10 ** 4)
+    assert table.values[0] > 0 and table.values[-1] < 2 * 10 ** 4
+
+
+@pytest.mark.parametrize('sample, input_details, mean, stdev', [
+    (sample_binomial, {'binomial_input_trials': 10 ** 15, 'binomial_input_p': 0.5}, 5e14, np.sqrt(2.5e14)),
+    (sample_poisson, {'poisson_input_lambda': 1e15}, 1e15, np.sqrt(1e15)),
+    (sample_binomial, {'binomial_input_trials': 20, 'binomial_input_p': 0.3}, 6.0, np.sqrt(4.2)),
+    (sample_poisson, {'poisson_input_lambda': 3.0}, 3.0, np.sqrt(3.0)),
+])
+def test_samples_match_the_distribution(sample, input_details, mean, stdev):
+    samples = sample(input_details, 10 ** 5, np.random.default_rng(0))
+    assert samples.dtype == float
+    assert samples.mean() == pytest.approx(mean, abs=5 * stdev / np.sqrt(10 ** 5))
+    assert samples.std() == pytest.approx(stdev, rel=0.02)
@@ -0,0 +1,27 @@
+import pytest
+from scipy.stats import norm
+
+from tolerable_app.importance import tail_probabilities
+
+
+INPUTS = {'inputform_0': {'input_details': {'normal_input_mean': 0.0, 'normal_input_stdev': 1.0}, 'input_name': 'Aa', 'input_type': 'normal'}}
+SETTINGS = {'setting_alpha': 0.05, 'setting_seed': 0}
+
+
+def test_linear_tail_matches_normal_tail():
+    outputs = {'outputform_0': {'output_defn': '2 * Aa + 1', 'output_name': 'Y', 'output_vis': True}}
+    estimate = tail_probabilities(INPUTS, outputs, 'Y', None, 9, SETTINGS, 2 ** 13)['above_usl']
+
+    assert estimate['lower'] <= norm.sf(4) <= estimate['upper']
+    assert estimate['reliability_index'] == pytest.approx(4)
+    assert estimate['reliable']
+
+
+def test_both_failure_regions_are_sampled():
+    # y = x^2 > 16 fails at both x < -4 and x > 4, on opposite sides of the means
+    outputs = {'outputform_0': {'output_defn': 'Aa*Aa', 'output_name': 'Y', 'output_vis': True}}
+    estimate = tail_probabilities(INPUTS, outputs, 'Y', None, 16, SETTINGS, 2 ** 15)['above_usl']
+
+    assert len(estimate['design_points']) == 2
+    assert estimate['lower'] <= 2 * norm.sf(4) <= estimate['upper']
+    assert estimate['reliable']
@@ -0,0 +1,40 @@
+import threading
+
+from tolerable_app.jobs import JobQueue
+
+
+def stoppable(job, started, total):
+    for iterations in range(1, total + 1):
+        job.report(iterations, partial=iterations)
+        started.set()
+        threading.Event().wait(0.01)
+    return total
+
+
+def test_stopped_job_keeps_partial_result():
+    queue = JobQueue(workers=1)
+    started = threading.Event()
+    job = queue.submit('owner', stoppable, started, 1000, total=1000)
+    started.wait(5)
+
+    queue.cancel(job.id, 'owner', keep_partial=True)
+    job.future.result(5)
+
+    assert job.status == 'finished'
+    assert job.stopped_early
+    assert job.result == job.iterations < 1000
+    queue.shutdown()
+
+
+def test_cancelled_job_has_no_result():
+    queue = JobQueue(workers=1)
+    started = threading.Event()
+    job = queue.submit('owner', stoppable, started, 1000, total=1000)
+    started.wait(5)
+
+    queue.cancel(job.id, 'owner')
+    job.future.result(5)
+
+    assert job.status == 'cancelled'
+    assert job.result is None
+    queue.shutdown()
@@ -0,0 +1,15 @@
+import numpy as np
+
+from tolerable_app.kernels import compile_fused, evaluate_blocked
+
+
+def test_evaluate_blocked_matches_unblocked_evaluation():
+    kernel = compile_fused(('inputform_0 * inputform_1 + 1', 'sin(inputform_0) / inputform_1', '2 * pi'), ('inputform_0', 'inputform_1'))
+    args = (np.linspace(0.5, 1.5, 1001), np.linspace(1.0, 2.0, 1001))
+
+    # a block size that leaves a short final block
+    results = evaluate_blocked(kernel, args, 3, (1001,), block_size=64)
+
+    expected = kernel(*args)
+    for result, expected_result in zip(results, expected):
+        np.testing.assert_allclose(result, np.broadcast_to(expected_result, (1001,)))
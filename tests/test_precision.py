@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from tolerable_app.precision import SpecLimitError, adaptive_stop, parse_spec_limits, summary_intervals
+from tolerable_app.summary import fold_sims_data
+
+
+def summary(data):
+    return fold_sims_data({}, {'Y': np.asarray(data, dtype=float)})['Y']
+
+
+def test_parse_spec_limits():
+    assert parse_spec_limits('Compression, 0.1, 0.4; Stack Height, , 5.2\n') == {
+        'Compression': (0.1, 0.4), 'Stack Height': (None, 5.2)}
+    assert parse_spec_limits('') == {}
+    for text in ('Compression, 0.1', 'Compression, , ', 'Compression, a, 1', 'Compression, 1, 0'):
+        with pytest.raises(SpecLimitError):
+            parse_spec_limits(text)
+
+
+def test_out_of_spec_interval_is_wilson():
+    # 30 of 1000 samples above the upper limit
+    intervals = summary_intervals(summary(np.r_[np.zeros(970), np.ones(30)]), 0.05, (None, 0.5))
+    out_of_spec = intervals['out_of_spec']
+
+    assert out_of_spec['estimate'] == pytest.approx(0.03)
+    assert out_of_spec['lower'] == pytest.approx(0.02108, abs=1e-4)
+    assert out_of_spec['upper'] == pytest.approx(0.04253, abs=1e-4)
+
+
+def test_out_of_spec_interval_without_failures():
+    out_of_spec = summary_intervals(summary(np.linspace(0, 1, 1000)), 0.05, (-1.0, 2.0))['out_of_spec']
+    assert out_of_spec['estimate'] == 0.0
+    assert 0 < out_of_spec['upper'] < 0.01
+    assert out_of_spec['precision'] == np.inf
+
+
+def test_adaptive_stop_waits_for_the_out_of_spec_fraction():
+    data = np.random.default_rng(0).normal(size=10 ** 5)
+    settings = {'setting_alpha': 0.05, 'setting_precision': 0.02}
+    outputs_summaries = {'Y': summary(data)}
+
+    assert adaptive_stop(settings, 0)(len(data), {}, outputs_summaries)
+    assert not adaptive_stop(dict(settings, setting_spec_limits='Y, , 2'), 0)(len(data), {}, outputs_summaries)
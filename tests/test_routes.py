@@ -0,0 +1,190 @@
+import time
+
+import pytest
+
+from tolerable_app import create_app
+from tolerable_app.jobs import Job, get_job_queue
+
+
+INPUTS = {
+    'inputform_0': {'input_details': {'normal_input_mean': 1.0, 'normal_input_stdev': 0.05}, 'input_name': 'Gland Depth', 'input_type': 'normal'},
+    'inputform_1': {'input_details': {'normal_input_mean': 1.0, 'normal_input_stdev': 0.08}, 'input_name': 'Oring Chord', 'input_type': 'normal'},
+    'inputform_2': {'input_details': {'triangle_input_min': 0.2, 'triangle_input_mode': 0.25, 'triangle_input_max': 0.3}, 'input_name': 'Tab Height', 'input_type': 'triangle'}
+}
+OUTPUTS = {
+    'outputform_0': {'output_defn': '1 - (Gland Depth - Tab Height)/(Oring Chord)', 'output_name': 'Compression', 'output_vis': True}
+}
+SETTINGS = {'setting_alpha': 0.05, 'setting_n': 2000, 'setting_seed': 1}
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    # the routes attach to the first app created, so the whole session shares one
+    instance = tmp_path_factory.mktemp('instance')
+    return create_app({
+        'SECRET_KEY': 'test',
+        'WTF_CSRF_ENABLED': False,
+        'KERNEL_CACHE_DIR': str(instance / 'kernels'),
+        'SAMPLE_STORE_PATH': str(instance / 'samples.sqlite3')
+    })
+
+
+@pytest.fixture
+def client(app):
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def model(client):
+    with client.session_transaction() as session:
+        session['inputs'] = INPUTS
+        session['input_forms'] = INPUTS
+        session['input_names'] = tuple(input_spec['input_name'] for input_spec in INPUTS.values())
+        session['outputs'] = OUTPUTS
+        session['output_forms'] = OUTPUTS
+        session['output_names'] = tuple(output_spec['output_name'] for output_spec in OUTPUTS.values())
+        session['settings'] = SETTINGS
+    return client
+
+
+def wait_for_result(client, path='/result', pending=b'Simulating', timeout=60):
+    deadline = time.time() + timeout
+    response = client.get(path)
+    while pending in response.data and time.time() < deadline:
+        time.sleep(0.2)
+        response = client.get(path)
+    return response
+
+
+@pytest.mark.parametrize('path', ['/', '/index', '/new', '/input', '/settings', '/report'])
+def test_pages_render(client, path):
+    assert client.get(path, follow_redirects=True).status_code == 200
+
+
+@pytest.mark.parametrize('path', ['/input', '/output', '/settings', '/sweep', '/compare', '/sensitivity'])
+def test_model_pages_render(model, path):
+    assert model.get(path).status_code == 200
+
+
+def test_output_page_shows_estimates(model):
+    response = model.get('/output')
+    assert response.status_code == 200
+    assert b'Compression' in response.data
+
+
+def test_result_page_renders_finished_simulation(model):
+    response = wait_for_result(model)
+    assert response.status_code == 200
+    assert b'Simulating' not in response.data
+    assert b'confidence intervals' in response.data
+
+
+def test_json_endpoints(model):
+    assert model.get('/analytic').status_code == 200
+    assert model.get('/worst_case').status_code == 200
+    assert model.get('/tail?variable=Compression').status_code == 400
+
+
+def test_tail_runs_on_the_job_queue(model):
+    path = '/tail?variable=Compression&usl=0.6&n=1000'
+    response = model.get(path)
+    assert response.status_code in (200, 202)
+    deadline = time.time() + 60
+    while response.status_code == 202 and time.time() < deadline:
+        assert response.get_json()['status'] in ('queued', 'running', 'finished')
+        time.sleep(0.2)
+        response = model.get(path)
+
+    assert response.status_code == 200
+    assert 0 <= response.get_json()['above_usl']['probability'] < 1
+
+
+def test_tail_rejects_stale_correlations(model):
+    with model.session_transaction() as session:
+        session['settings'] = dict(SETTINGS, setting_correlations='Gland Depth, Removed Input, 0.5')
+    assert model.get('/tail?variable=Compression&usl=0.6&n=1000').status_code == 400
+
+
+@pytest.mark.parametrize('alpha', ['1', '1.5', '-0.05', '0'])
+def test_settings_reject_alpha_outside_the_unit_interval(model, alpha):
+    response = model.post('/settings', data={'setting_n': '2000', 'setting_alpha': alpha, 'setting_sampling': 'random'})
+    assert response.status_code == 200
+    with model.session_transaction() as session:
+        assert session['settings'] == SETTINGS
+
+
+@pytest.mark.parametrize('sweep_parameters, message', [
+    ('Gland Depth, stdev, 0.05 -0.01', "'Gland Depth' is invalid where Gland Depth stdev = -0.01: St. Dev. cannot be negative."),
+    ('Tab Height, mode, 0.1:0.25:4\nGland Depth, mean, 1 1.1', "'Tab Height' is invalid where Tab Height mode = 0.1, Gland Depth mean = 1: Mode cannot be less than Min."),
+])
+def test_sweep_rejects_invalid_scenarios(model, sweep_parameters, message):
+    response = model.post('/sweep', data={'sweep_parameters': sweep_parameters, 'submit_sweep': 'Run Sweep'})
+    assert response.status_code == 200
+    assert message in response.get_data(as_text=True)
+    with model.session_transaction() as session:
+        assert 'sweep_parameters' not in session
+
+
+def test_stopped_run_is_not_reused(app, model):
+    # the routes module can only be imported once an app exists
+    from tolerable_app.routes import result_plot_keys
+
+    finished = wait_for_result(model)
+    assert finished.status_code == 200
+
+    full = Job('owner', total=SETTINGS['setting_n'])
+    stopped = Job('owner', total=SETTINGS['setting_n'])
+    stopped.stopped_early = True
+    stopped.iterations = SETTINGS['setting_n'] // 2
+
+    # partial plots never share the immutable urls of a full run
+    assert result_plot_keys(INPUTS, OUTPUTS, SETTINGS, stopped) != result_plot_keys(INPUTS, OUTPUTS, SETTINGS, full)
+    assert result_plot_keys(INPUTS, OUTPUTS, SETTINGS, full) == result_plot_keys(INPUTS, OUTPUTS, SETTINGS)
+
+    # simulating a model whose run was stopped early starts a full run
+    with model.session_transaction() as session:
+        job_id = session['job_id']
+    get_job_queue().get(job_id).stopped_early = True
+    response = model.post('/simulate', headers={'Accept': 'application/json'})
+    assert response.status_code == 202
+    assert response.get_json()['id'] != job_id
+    wait_for_result(model)
+
+
+def test_worst_case_flags_inputs_cut_at_k_sigma(model):
+    # Compression depends on two normal inputs, whose tails the bounds cut
+    bounds = model.get('/worst_case').get_json()['Compression']
+    assert bounds['truncated']
+    assert '&dagger;' in model.get('/output').get_data(as_text=True)
+
+
+def test_small_runs_report_progress_between_chunks(app, monkeypatch):
+    from tolerable_app.routes import simulate_result
+
+    monkeypatch.setitem(app.config, 'SIM_CHUNK_SIZE', 500)
+    reported = []
+    samples = {}
+    with app.app_context():
+        inputs_summaries, outputs_summaries = simulate_result(
+            INPUTS, OUTPUTS, SETTINGS, progress=lambda iterations, *summaries: reported.append(iterations), samples=samples)
+
+    assert reported == [500, 1000, 1500, 2000]
+    assert outputs_summaries['Compression'].stats.count == SETTINGS['setting_n']
+    assert {name: len(data) for name, data in samples.items()} == {
+        'Gland Depth': 2000, 'Oring Chord': 2000, 'Tab Height': 2000, 'Compression': 2000}
+
+
+def test_query_reads_the_finished_simulation(model):
+    wait_for_result(model)
+    answer = model.get('/query?variable=Compression&percentile=50&usl=0.5').get_json()['Compression']
+    # the samples of a small run are kept, so its answers are exact
+    assert answer['exact']
+    assert answer['count'] == SETTINGS['setting_n']
+
+
+def test_result_shows_the_out_of_spec_fraction(model):
+    with model.session_transaction() as session:
+        session['settings'] = dict(SETTINGS, setting_spec_limits='Compression, 0.1, 0.3')
+    response = wait_for_result(model)
+    assert b'out_of_spec' in response.data
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import tolerable_app.simulate as simulate
+from tolerable_app.simulate import sim_chunks
+from tolerable_app.store import MemoryStore
+
+
+INPUTS = {
+    'inputform_0': {'input_details': {'normal_input_mean': 1.0, 'normal_input_stdev': 0.05}, 'input_name': 'Gland Depth', 'input_type': 'normal'},
+    'inputform_1': {'input_details': {'normal_input_mean': 1.0, 'normal_input_stdev': 0.08}, 'input_name': 'Oring Chord', 'input_type': 'normal'}
+}
+OUTPUTS = {
+    'outputform_0': {'output_defn': 'Gland Depth - Oring Chord', 'output_name': 'Gap', 'output_vis': True},
+    'outputform_1': {'output_defn': 'Gap / Oring Chord', 'output_name': 'Ratio', 'output_vis': True},
+    'outputform_2': {'output_defn': 'Gland Depth * 2', 'output_name': 'Depth', 'output_vis': True}
+}
+SETTINGS = {'setting_alpha': 0.05, 'setting_n': 1000, 'setting_seed': 3}
+
+
+def run(outputs, store=None):
+    return [outputs_data for __, outputs_data in sim_chunks(inputs=INPUTS, outputs=outputs, settings=SETTINGS, chunk_size=300, store=store)]
+
+
+@pytest.mark.parametrize('edits, compiler, evaluated', [
+    # editing Ratio leaves its upstream Gap alone, so Ratio alone is evaluated
+    ({'outputform_1': 'Gap / Gland Depth'}, 'compile_definition', 1),
+    # editing Gap also recomputes the downstream Ratio, in one fused kernel, but not Depth
+    ({'outputform_0': 'Gland Depth + Oring Chord'}, 'compile_fused', 2),
+])
+def test_only_outputs_downstream_of_an_edit_are_recomputed(monkeypatch, edits, compiler, evaluated):
+    store = MemoryStore()
+    run(OUTPUTS, store)
+
+    compiled = []
+    compile_original = getattr(simulate, compiler)
+    def compile_recorded(defns, args):
+        compiled.append(defns)
+        return compile_original(defns, args)
+    monkeypatch.setattr(simulate, compiler, compile_recorded)
+
+    edited = {output_id: dict(output_spec, output_defn=edits.get(output_id, output_spec['output_defn'])) for output_id, output_spec in OUTPUTS.items()}
+    chunks = run(edited, store)
+
+    # one compilation per chunk
+    assert len(compiled) == 4
+    if compiler == 'compile_fused':
+        assert all(len(defns) == evaluated for defns in compiled)
+
+    for outputs_data, expected_data in zip(chunks, run(edited)):
+        for name, expected in expected_data.items():
+            np.testing.assert_array_equal(outputs_data[name], expected)
+
+
+def test_unchanged_outputs_are_not_reevaluated(monkeypatch):
+    store = MemoryStore()
+    expected = run(OUTPUTS, store)
+
+    def compile_refused(*args):
+        raise AssertionError('an unchanged output was re-evaluated')
+    monkeypatch.setattr(simulate, 'compile_fused', compile_refused)
+    monkeypatch.setattr(simulate, 'compile_definition', compile_refused)
+
+    for outputs_data, expected_data in zip(run(OUTPUTS, store), expected):
+        for name in expected_data:
+            np.testing.assert_array_equal(outputs_data[name], expected_data[name])
@@ -0,0 +1,36 @@
+import numpy as np
+
+from tolerable_app.store import MemoryStore, SQLiteStore, array_to_bytes
+
+
+def test_memory_store_evicts_least_recently_used():
+    size = np.zeros(100).nbytes
+    store = MemoryStore(max_bytes=2 * size)
+    store.set('a', np.zeros(100))
+    store.set('b', np.ones(100))
+    store.get('a')
+    store.set('c', np.ones(100))
+
+    assert store.get('b') is None
+    assert store.get('a') is not None and store.get('c') is not None
+    assert store.size == 2 * size
+
+
+def test_sqlite_store_evicts_least_recently_used(tmp_path):
+    size = len(array_to_bytes(np.zeros(100)))
+    store = SQLiteStore(str(tmp_path / 'samples.sqlite3'), max_bytes=2 * size)
+    store.set('a', np.zeros(100))
+    store.set('b', np.ones(100))
+    store.get('a')
+    store.set('c', np.ones(100))
+
+    assert store.get('b') is None
+    np.testing.assert_array_equal(store.get('a'), np.zeros(100))
+    np.testing.assert_array_equal(store.get('c'), np.ones(100))
+    assert store.size == 2 * size
+
+
+def test_sqlite_store_is_shared_by_path(tmp_path):
+    path = str(tmp_path / 'samples.sqlite3')
+    SQLiteStore(path).set('a', np.arange(5))
+    np.testing.assert_array_equal(SQLiteStore(path).get('a'), np.arange(5))
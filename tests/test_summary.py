@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from tolerable_app.summary import SimSummary, StreamHistogram, QuantileSketch, fold_sims_data, merge_summaries
+
+
+def test_merged_chunks_match_one_update():
+    data = np.random.default_rng(0).normal(size=10 ** 4)
+    whole = SimSummary().update(data)
+    merged = SimSummary().update(data[:3000]).merge(SimSummary().update(data[3000:]))
+
+    assert merged.stats.count == whole.stats.count
+    assert merged.stats.mean == pytest.approx(whole.stats.mean)
+    assert merged.stats.stdev == pytest.approx(whole.stats.stdev)
+    assert merged.histogram.counts.sum() == 10 ** 4
+    assert merged.quantile(0.5) == pytest.approx(np.median(data), abs=0.02)
+
+
+def test_heavy_tailed_chunks_stay_bounded():
+    # a Pareto with shape 0.3 spans dozens of orders of magnitude within a few thousand samples
+    data = 2 * 0.2 * np.random.default_rng(0).random(5000) ** (-1 / 0.3)
+    histogram = StreamHistogram(max_bins=512).update(data)
+    assert len(histogram.counts) <= 512
+    assert histogram.counts.sum() == data.size
+
+    # a later chunk reaching far beyond the first chunk's bins
+    histogram.update(data * 1e12)
+    assert len(histogram.counts) <= 512
+    assert histogram.counts.sum() == 2 * data.size
+
+
+def test_far_apart_histograms_merge_bounded():
+    near = StreamHistogram().update(np.linspace(0, 1, 100))
+    far = StreamHistogram().update(np.linspace(1e15, 1e15 + 1, 100))
+    near.merge(far)
+    assert len(near.counts) <= near.max_bins
+    assert near.counts.sum() == 200
+
+
+def test_nonfinite_values_are_counted_and_dropped():
+    with np.errstate(invalid='ignore'):
+        data = np.sqrt(np.random.default_rng(0).normal(0.1, 0.05, size=5000))
+    summary = SimSummary().update(data)
+
+    finite = data[np.isfinite(data)]
+    assert summary.stats.nonfinite == data.size - finite.size > 0
+    assert summary.stats.count == finite.size
+    assert summary.stats.mean == pytest.approx(finite.mean())
+    assert summary.histogram.counts.sum() == finite.size
+    assert summary.sketch.count == finite.size
+    assert np.isfinite(summary.quantile(0.99))
+
+    nonfinite = summary.stats.nonfinite
+    assert merge_summaries({'Y': summary}, fold_sims_data({}, {'Y': np.array([np.inf, 1.0])}))['Y'].stats.nonfinite == nonfinite + 1
+
+
+def test_all_nonfinite_chunk():
+    summary = SimSummary().update(np.full(10, np.nan))
+    assert summary.stats.count == 0
+    assert summary.stats.nonfinite == 10
+    assert not len(summary.histogram.counts)
+    assert QuantileSketch().update(np.full(3, np.nan)).count == 0
+
+
+def test_undefined_outputs_are_summarized_without_errors():
+    from tolerable_app.precision import sims_intervals
+    from tolerable_app.render import sims_histograms
+    from tolerable_app.simulate import plot_sim_summaries
+
+    summaries = fold_sims_data({}, {'Defined': np.linspace(0, 1, 100), 'Undefined': np.full(100, np.nan)})
+    assert sims_intervals(summaries, 0.05)['Undefined'] == {}
+    assert [histogram['name'] for histogram in sims_histograms(summaries)] == ['Defined']
+    plot_sim_summaries(summaries)
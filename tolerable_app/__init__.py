@@ -7,6 +7,31 @@ def create_app(test_config=None):
     app.config.from_mapping(
         SECRET_KEY='dev',
         DEBUG=True,
+        KERNEL_CACHE_SIZE=256,
+        KERNEL_CACHE_DIR=os.path.join(app.instance_path, 'kernels'),
+        SIM_CHUNK_SIZE=2 ** 16,
+        SIM_STREAM_THRESHOLD=10 ** 6,
+        SIM_WORKERS=os.cpu_count(),
+        SAMPLE_STORE='memory',
+        SAMPLE_STORE_SIZE=256 * 2 ** 20,
+        SAMPLE_STORE_PATH=os.path.join(app.instance_path, 'samples.sqlite3'),
+        SAMPLE_STORE_URL=None,
+        RESULT_PLOT_FORMAT='json',
+        IMAGE_CACHE_SIZE=64 * 2 ** 20,
+        IMAGE_CACHE_SOURCES=64,
+        IMAGE_MAX_AGE=365 * 24 * 60 * 60,
+        JOB_WORKERS=2,
+        JOB_QUEUE_SIZE=16,
+        JOB_USER_LIMIT=2,
+        JOB_HISTORY=256,
+        JOB_EVENT_INTERVAL=0.5,
+        ADAPTIVE_CHUNK_SIZE=2 ** 12,
+        ADAPTIVE_MIN_ITERATIONS=2 ** 12,
+        SAMPLE_INDEX_SIZE=256 * 2 ** 20,
+        SWEEP_MAX_SCENARIOS=256,
+        SENSITIVITY_PREVIEW_SIZE=2 ** 13,
+        IMPORTANCE_SAMPLES=2 ** 15,
+        IMPORTANCE_MAX_SAMPLES=10 ** 6,
     )
 
     if test_config is None:
@@ -30,5 +55,34 @@ def create_app(test_config=None):
         from . import util
         from . import symbolic
         from . import simulate
+        from . import kernels
+        from . import store
+        from . import images
+        from . import jobs
+        from . import sample_index
+        from . import analytic
+        from . import worst_case
+
+        kernels.kernel_cache.configure(
+            maxsize=app.config['KERNEL_CACHE_SIZE'],
+            cache_dir=app.config['KERNEL_CACHE_DIR'])
+
+        store.configure_sample_store(
+            backend=app.config['SAMPLE_STORE'],
+            max_bytes=app.config['SAMPLE_STORE_SIZE'],
+            path=app.config['SAMPLE_STORE_PATH'],
+            url=app.config['SAMPLE_STORE_URL'])
+
+        images.configure_image_cache(
+            max_bytes=app.config['IMAGE_CACHE_SIZE'],
+            max_sources=app.config['IMAGE_CACHE_SOURCES'])
+
+        jobs.configure_job_queue(
+            workers=app.config['JOB_WORKERS'],
+            max_queued=app.config['JOB_QUEUE_SIZE'],
+            max_per_user=app.config['JOB_USER_LIMIT'],
+            history=app.config['JOB_HISTORY'])
+
+        sample_index.configure_index_store(max_bytes=app.config['SAMPLE_INDEX_SIZE'])
 
     return app
\ No newline at end of file
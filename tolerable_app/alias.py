@@ -0,0 +1,92 @@
+from collections import namedtuple
+import numpy as np
+
+
+# ALIAS METHOD #
+AliasTable = namedtuple('AliasTable', ('values', 'prob', 'alias', 'cdf'))
+
+
+def build_alias_table(values, weights):
+    """Builds a Walker / Vose alias table for sampling values with the given (unnormalized) weights.
+
+    Construction is O(k) in the number of categories; every sample drawn from the table
+    afterwards costs one integer draw, one uniform draw and one comparison."""
+
+    values = np.asarray(values, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    k = len(weights)
+
+    scaled = weights * k / weights.sum()
+    prob = scaled.tolist()
+    alias = list(range(k))
+
+    small = np.flatnonzero(scaled < 1).tolist()
+    large = np.flatnonzero(scaled >= 1).tolist()
+
+    while small and large:
+        small_index = small.pop()
+        large_index = large[-1]
+
+        alias[small_index] = large_index
+        prob[large_index] -= 1 - prob[small_index]
+
+        if prob[large_index] < 1:
+            large.pop()
+            small.append(large_index)
+
+    # whatever is left over is only off by rounding error
+    for index in small + large:
+        prob[index] = 1.0
+
+    cdf = np.cumsum(weights) / weights.sum()
+
+    return AliasTable(values, np.array(prob), np.array(alias, dtype=np.intp), cdf)
+
+
+def sample_alias(table, n, rng):
+    """Draws n values from an alias table in O(1) per sample."""
+
+    index = rng.integers(0, len(table.prob), size=n)
+    index = np.where(rng.random(n) < table.prob[index], index, table.alias[index])
+    return table.values[index]
+
+
+def ppf_alias(unit_samples, table):
+    """Maps unit samples through the inverse CDF of an alias table's distribution.
+
+    The alias lookup itself is not monotone, so stratified and quasi-random samples
+    are mapped with a binary search of the cumulative weights instead."""
+
+    index = np.searchsorted(table.cdf, unit_samples, side='right')
+    return table.values[np.minimum(index, len(table.values) - 1)]
+
+
+if __name__ == "__main__":
+    # ALIAS SAMPLING BENCHMARK #
+    # run as a module from the repository root: python -m tolerable_app.alias
+    import time
+
+    rng = np.random.default_rng(0)
+    n = 10 ** 6
+    repeats = 5
+
+    print('{:>8} {:>14} {:>14} {:>14} {:>8}'.format('k', 'build (ms)', 'alias (ms)', 'choice (ms)', 'speedup'))
+    for k in (10, 100, 1000, 10 ** 4, 10 ** 5):
+        values = np.linspace(0.5, 2.5, k)
+        weights = rng.random(k) ** 3
+
+        start = time.perf_counter()
+        table = build_alias_table(values, weights)
+        build_time = (time.perf_counter() - start) * 1e3
+
+        start = time.perf_counter()
+        for __ in range(repeats):
+            sample_alias(table, n, rng)
+        alias_time = (time.perf_counter() - start) / repeats * 1e3
+
+        start = time.perf_counter()
+        for __ in range(repeats):
+            rng.choice(values, size=n, p=weights / weights.sum())
+        choice_time = (time.perf_counter() - start) / repeats * 1e3
+
+        print('{:>8} {:>14.2f} {:>14.2f} {:>14.2f} {:>7.1f}x'.format(k, build_time, alias_time, choice_time, choice_time / alias_time))
@@ -0,0 +1,160 @@
+from .distributions import get_distribution
+from .graph import output_dependencies, inline_definitions, CircularDefinitionError
+from .kernels import normalize_definition
+from .symbolic import evaluate, reserved_dict
+from functools import lru_cache
+from sympy import Symbol, diff
+import numpy as np
+
+
+# INPUT MOMENTS #
+def input_moments(inputs):
+    """Returns the analytic moments of each input from the distribution registry.
+
+    - Returns a dict of the form {input id: (mean, variance)}"""
+
+    moments = {}
+    for input_id, input_spec in inputs.items():
+        distribution = get_distribution(input_spec['input_type'])
+        moments[input_id] = (float(distribution.mean(input_spec['input_details'])), float(distribution.variance(input_spec['input_details'])))
+    return moments
+
+
+# LINEARIZED MOMENTS #
+@lru_cache(maxsize=256)
+def derivative_exprs(mach_defn, arg_ids, second_order=False):
+    """Parses a machine readable definition and differentiates it with respect to each input it refers to.
+
+    - Returns (expr, (referenced arg ids), {arg id: first derivative}, {(arg id, arg id): second derivative})"""
+
+    symbols = {arg_id: Symbol(arg_id) for arg_id in arg_ids}
+    expr = evaluate(mach_defn, local_dict={**reserved_dict, **symbols})
+
+    referenced = tuple(arg_id for arg_id in arg_ids if symbols[arg_id] in expr.free_symbols)
+    gradient = {arg_id: diff(expr, symbols[arg_id]) for arg_id in referenced}
+
+    hessian = {}
+    if second_order:
+        for index, arg_id in enumerate(referenced):
+            for other_id in referenced[index:]:
+                hessian[(arg_id, other_id)] = diff(gradient[arg_id], symbols[other_id])
+
+    return expr, referenced, gradient, hessian
+
+
+def evaluate_at(expr, nominal):
+    return float(expr.xreplace(nominal).evalf())
+
+
+@lru_cache(maxsize=256)
+def linearization(mach_defn, moments):
+    """Returns the first order Taylor expansion of a definition about the input means.
+
+    - Accepts moments as a tuple of the form ((input id, (mean, variance)), ...)
+    - Returns (value at the means, {referenced input id: slope})"""
+
+    moments = dict(moments)
+    arg_ids = tuple(sorted(moments))
+    expr, referenced, gradient, __ = derivative_exprs(normalize_definition(mach_defn), arg_ids)
+
+    nominal = {Symbol(arg_id): moments[arg_id][0] for arg_id in arg_ids}
+    return evaluate_at(expr, nominal), {arg_id: evaluate_at(gradient[arg_id], nominal) for arg_id in referenced}
+
+
+def propagate_moments(mach_defn, moments, second_order=False, correlations=None):
+    """Propagates input moments through one definition by a Taylor expansion about the input means.
+
+    First order gives the classic root-sum-square estimate: mean f(mu) and variance
+    sum_i (df/dx_i)^2 var_i. Second order adds the curvature terms 1/2 sum_i d2f/dx_i2 var_i to
+    the mean and 1/2 sum_ij (d2f/dx_i dx_j)^2 var_i var_j to the variance (exact for normal inputs).
+    Correlated inputs add the first order covariance terms 2 rho_ij df/dx_i df/dx_j sd_i sd_j
+    (the second order terms still treat the inputs as independent).
+
+    - Accepts moments of the form {input id: (mean, variance)}
+    - Accepts correlations of the form {(input id, input id): coefficient}
+    - Returns a dict of the form {'mean': ..., 'stdev': ..., 'contributions': {input id: share of variance}}"""
+
+    arg_ids = tuple(sorted(moments))
+    expr, referenced, gradient, hessian = derivative_exprs(normalize_definition(mach_defn), arg_ids, second_order)
+
+    nominal = {Symbol(arg_id): moments[arg_id][0] for arg_id in arg_ids}
+    mean = evaluate_at(expr, nominal)
+
+    slopes = {arg_id: evaluate_at(gradient[arg_id], nominal) for arg_id in referenced}
+    terms = {arg_id: slope ** 2 * moments[arg_id][1] for arg_id, slope in slopes.items()}
+    variance = sum(terms.values())
+
+    for (arg_id, other_id), coefficient in (correlations or {}).items():
+        if arg_id in slopes and other_id in slopes:
+            variance += 2 * coefficient * slopes[arg_id] * slopes[other_id] * float(np.sqrt(moments[arg_id][1] * moments[other_id][1]))
+
+    for (arg_id, other_id), second_derivative in hessian.items():
+        curvature = evaluate_at(second_derivative, nominal)
+        if arg_id == other_id:
+            mean += curvature * moments[arg_id][1] / 2
+            variance += curvature ** 2 * moments[arg_id][1] ** 2 / 2
+        else:
+            # off-diagonal terms appear twice in the double sum
+            variance += curvature ** 2 * moments[arg_id][1] * moments[other_id][1]
+
+    # with correlated inputs the shares no longer add up to one, as the covariance terms are left out
+    contributions = {arg_id: term / variance if variance > 0 else 0.0 for arg_id, term in terms.items()}
+
+    return {'mean': mean, 'stdev': float(np.sqrt(variance)), 'contributions': contributions}
+
+
+def analytic_outputs(outputs, inputs, second_order=False, correlations=None):
+    """Estimates the mean and standard deviation of every output without sampling.
+
+    - Accepts outputs and inputs of the same form as sim_outputs
+    - Accepts correlations of the same form as correlation.parse_correlations
+    - Returns a dict of the form {output name: {'mean': ..., 'stdev': ..., 'contributions': {input name: ...}}}
+      where an output that cannot be expanded (e.g. an invalid or circular definition) maps to {'error': ...}"""
+
+    moments = input_moments(inputs)
+    input_names = {input_id: input_spec['input_name'] for input_id, input_spec in inputs.items()}
+    ids_by_name = {input_name: input_id for input_id, input_name in input_names.items()}
+    correlations = {(ids_by_name[name_a], ids_by_name[name_b]): coefficient
+                    for name_a, name_b, coefficient in correlations or () if name_a in ids_by_name and name_b in ids_by_name}
+
+    try:
+        mach_defns, dependencies = output_dependencies(outputs, inputs)
+        mach_defns = inline_definitions(mach_defns, dependencies)
+    except CircularDefinitionError as error:
+        return {output_spec['output_name']: {'error': str(error)} for output_spec in outputs.values()}
+
+    estimates = {}
+    for output_id, output_spec in outputs.items():
+        try:
+            estimate = propagate_moments(mach_defns[output_id], moments, second_order, correlations)
+        except Exception as error:
+            # definitions are user input, so any parse or evaluation failure is reported per output
+            estimates[output_spec['output_name']] = {'error': str(error) or type(error).__name__}
+            continue
+
+        estimate['contributions'] = {input_names[input_id]: share for input_id, share in estimate['contributions'].items()}
+        estimates[output_spec['output_name']] = estimate
+
+    return estimates
+
+
+if __name__ == "__main__":
+    # RSS AGAINST MONTE CARLO #
+    # run as a module from the repository root: python -m tolerable_app.analytic
+    from .simulate import sim_inputs, sim_outputs
+    import time
+
+    inputs = {'inputform_0': {'input_details': {'normal_input_mean': 1.0, 'normal_input_stdev': 0.05}, 'input_name': 'Gland Depth', 'input_type': 'normal'}, 'inputform_1': {'input_details': {'normal_input_mean': 1.0, 'normal_input_stdev': 0.08}, 'input_name': 'Oring Chord', 'input_type': 'normal'}, 'inputform_2': {'input_details': {'normal_input_mean': 0.25, 'normal_input_stdev': 0.05}, 'input_name': 'Tab Height', 'input_type': 'normal'}}
+    outputs = {'outputform_0': {'output_defn': '1 - (Gland Depth - Tab Height)/(Oring Chord)', 'output_name': 'O-ring Compression', 'output_vis': True}}
+    settings = {'setting_alpha': 0.05, 'setting_n': 10 ** 6, 'setting_seed': 0}
+
+    for second_order in (False, True):
+        start = time.perf_counter()
+        estimate = analytic_outputs(outputs, inputs, second_order)['O-ring Compression']
+        print('{:<18} mean {:.5f}  stdev {:.5f}  ({:.2f} ms)'.format(
+            'second order' if second_order else 'first order (RSS)', estimate['mean'], estimate['stdev'], (time.perf_counter() - start) * 1e3))
+
+    start = time.perf_counter()
+    outputs_data = sim_outputs(outputs=outputs, inputs=inputs, inputs_data=sim_inputs(inputs=inputs, settings=settings), settings=settings)
+    sampled = outputs_data['O-ring Compression']
+    print('{:<18} mean {:.5f}  stdev {:.5f}  ({:.2f} ms)'.format('monte carlo', sampled.mean(), sampled.std(ddof=1), (time.perf_counter() - start) * 1e3))
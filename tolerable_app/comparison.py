@@ -0,0 +1,80 @@
+from .precision import z_value
+import numpy as np
+
+
+# DESIGN COMPARISON TABLES #
+def comparison_table(variants_summaries, differences, alpha):
+    """Tabulates how every variant of a comparison differs from the baseline.
+
+    - Accepts variants_summaries and differences as returned by simulate.sim_compare
+    - Returns a dict of the form {variant name: {output name: {'baseline_mean': ..., 'variant_mean': ...,
+      'baseline_stdev': ..., 'variant_stdev': ..., 'difference': {'estimate': ..., 'lower': ..., 'upper': ...},
+      'significant': ..., 'independent_half_width': ..., 'variance_reduction': ...}}}
+
+    The interval is the (1 - alpha) interval on the mean paired difference. independent_half_width is
+    the interval two independent runs of the same length would give, and variance_reduction the factor
+    by which the paired design cuts the variance of the difference (how many times longer independent
+    runs would need to be)."""
+
+    baseline = next(iter(variants_summaries))
+    z = z_value(alpha)
+
+    table = {}
+    for variant_name, outputs_differences in differences.items():
+        table[variant_name] = {}
+        for output_name, difference in outputs_differences.items():
+            baseline_stats = variants_summaries[baseline][output_name].stats
+            variant_stats = variants_summaries[variant_name][output_name].stats
+
+            half_width = z * difference.stdev / np.sqrt(difference.count)
+            independent_half_width = z * np.sqrt((baseline_stats.variance + variant_stats.variance) / difference.count)
+
+            table[variant_name][output_name] = {
+                'baseline_mean': baseline_stats.mean,
+                'variant_mean': variant_stats.mean,
+                'baseline_stdev': float(baseline_stats.stdev),
+                'variant_stdev': float(variant_stats.stdev),
+                'difference': {'estimate': difference.mean, 'lower': difference.mean - half_width, 'upper': difference.mean + half_width},
+                'significant': bool(abs(difference.mean) > half_width),
+                'independent_half_width': float(independent_half_width),
+                'variance_reduction': float((independent_half_width / half_width) ** 2) if half_width > 0 else float('inf')
+            }
+
+    return table
+
+
+if __name__ == "__main__":
+    # COMMON RANDOM NUMBERS AGAINST INDEPENDENT RUNS #
+    # run as a module from the repository root: python -m tolerable_app.comparison
+    from .simulate import sim_compare, sim_stream, count_blocks
+    from .store import MemoryStore
+    import copy
+    import time
+
+    current = {'inputform_0': {'input_details': {'normal_input_mean': 1.0, 'normal_input_stdev': 0.05}, 'input_name': 'Gland Depth', 'input_type': 'normal'}, 'inputform_1': {'input_details': {'normal_input_mean': 1.0, 'normal_input_stdev': 0.08}, 'input_name': 'Oring Chord', 'input_type': 'normal'}, 'inputform_2': {'input_details': {'triangle_input_min': 0.2, 'triangle_input_mode': 0.25, 'triangle_input_max': 0.3}, 'input_name': 'Tab Height', 'input_type': 'triangle'}}
+    outputs = {'outputform_0': {'output_defn': '1 - (Gland Depth - Tab Height)/(Oring Chord)', 'output_name': 'O-ring Compression', 'output_vis': True}}
+
+    # the proposed design deepens the gland by 0.2% of its depth, a change well inside the sampling noise of a short run
+    proposed = copy.deepcopy(current)
+    proposed['inputform_0']['input_details']['normal_input_mean'] = 1.002
+
+    settings = {'setting_alpha': 0.05, 'setting_n': 10 ** 5, 'setting_seed': 0}
+    store = MemoryStore()
+
+    start = time.perf_counter()
+    variants_summaries, differences = sim_compare(variants={'Current': (current, outputs), 'Proposed': (proposed, outputs)}, settings=settings, store=store)
+    paired = comparison_table(variants_summaries, differences, 0.05)['Proposed']['O-ring Compression']
+    paired_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    independent = [sim_stream(inputs=inputs, outputs=outputs, settings=dict(settings, setting_seed=seed))[1]['O-ring Compression'].stats
+                   for seed, inputs in enumerate((current, proposed))]
+    independent_time = time.perf_counter() - start
+
+    estimate = independent[1].mean - independent[0].mean
+    half_width = 1.96 * np.sqrt((independent[0].variance + independent[1].variance) / settings['setting_n'])
+    print('paired (common random numbers): {:+.6f} [{:+.6f}, {:+.6f}] in {:.2f} s ({} arrays simulated for 2 designs x 3 inputs per chunk)'.format(
+        paired['difference']['estimate'], paired['difference']['lower'], paired['difference']['upper'], paired_time, len(store._arrays) // count_blocks(settings['setting_n'])))
+    print('independent runs:               {:+.6f} [{:+.6f}, {:+.6f}] in {:.2f} s'.format(
+        estimate, estimate - half_width, estimate + half_width, independent_time))
+    print('variance reduction of the difference: {:.0f}x'.format(paired['variance_reduction']))
@@ -0,0 +1,182 @@
+from scipy.special import ndtr, ndtri
+import numpy as np
+import re
+
+
+# CORRELATION SETTINGS #
+class CorrelationError(ValueError):
+    """Raised when correlations between inputs cannot be used (unknown inputs or not positive definite)."""
+
+
+def parse_correlations(text):
+    """Parses correlations written one pair per line (or separated by semicolons) as 'Name A, Name B, coefficient',
+    e.g. 'Gland Depth, Tab Height, 0.8'.
+
+    - Returns a tuple of the form ((name a, name b, coefficient), ...)"""
+
+    correlations = []
+    for entry in re.split(r'[;\n]+', text or ''):
+        if not entry.strip():
+            continue
+        parts = [part.strip() for part in entry.split(',')]
+        if len(parts) != 3 or not all(parts):
+            raise CorrelationError("'{}' is not of the form 'Name A, Name B, coefficient'.".format(entry.strip()))
+        try:
+            coefficient = float(parts[2])
+        except ValueError:
+            raise CorrelationError("'{}' is not a number.".format(parts[2]))
+        correlations.append((parts[0], parts[1], coefficient))
+
+    return tuple(correlations)
+
+
+def correlation_matrix(names, correlations):
+    """Builds the correlation matrix of the inputs that take part in any correlation.
+
+    - Accepts names as the input names in simulation order and correlations of the same form as parse_correlations
+    - Returns ((correlated name, ...), matrix) with the names in simulation order
+    - Raises CorrelationError for unknown or repeated pairs, coefficients outside [-1, 1] and matrices that are
+      not positive definite (e.g. A and B strongly correlated, B and C strongly correlated, but A and C not)"""
+
+    pairs = {}
+    for name_a, name_b, coefficient in correlations:
+        for name in (name_a, name_b):
+            if name not in names:
+                raise CorrelationError("'{}' is not an input.".format(name))
+        if name_a == name_b:
+            raise CorrelationError("'{}' cannot be correlated with itself.".format(name_a))
+        if not -1 <= coefficient <= 1:
+            raise CorrelationError('Correlation coefficients must be between -1 and 1.')
+        pair = frozenset((name_a, name_b))
+        if pair in pairs:
+            raise CorrelationError("'{}' and '{}' are correlated more than once.".format(name_a, name_b))
+        pairs[pair] = coefficient
+
+    correlated = tuple(name for name in names if any(name in pair for pair in pairs))
+    index = {name: position for position, name in enumerate(correlated)}
+
+    matrix = np.eye(len(correlated))
+    for pair, coefficient in pairs.items():
+        name_a, name_b = pair
+        matrix[index[name_a], index[name_b]] = matrix[index[name_b], index[name_a]] = coefficient
+
+    cholesky_factor(matrix)
+    return correlated, matrix
+
+
+def cholesky_factor(matrix):
+    """Returns the lower triangular L with L L^T = matrix, raising CorrelationError if the matrix is not positive definite."""
+
+    try:
+        return np.linalg.cholesky(matrix)
+    except np.linalg.LinAlgError:
+        raise CorrelationError('The correlations are inconsistent (the correlation matrix is not positive definite).')
+
+
+def input_correlations(inputs, settings):
+    """Returns (correlated input ids, Cholesky factor) for the setting_correlations of a run, or None if there are none."""
+
+    correlations = parse_correlations(settings.get('setting_correlations'))
+    if not correlations:
+        return None
+
+    ids_by_name = {input_spec['input_name']: input_id for input_id, input_spec in inputs.items()}
+    correlated, matrix = correlation_matrix(tuple(ids_by_name), correlations)
+    return tuple(ids_by_name[name] for name in correlated), cholesky_factor(matrix)
+
+
+def correlation_rng(seed=None, block_index=0):
+    """Returns the generator of a block's Iman-Conover scores, on its own branch of the seed's streams."""
+
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block_index, 2)))
+
+
+# CORRELATED SAMPLING #
+# samples are laid out one input per row, (d, n), so each input's samples stay contiguous
+def correlate_normal(samples, means, stdevs, factor):
+    """Correlates independent normal samples of the form (d, n) by the Cholesky factor of their correlation matrix.
+
+    Standardized independent normals Z become L Z, whose correlation is L L^T, so the result is an exact
+    multivariate normal with unchanged marginals."""
+
+    means = np.asarray(means, dtype=float)[:, np.newaxis]
+    stdevs = np.asarray(stdevs, dtype=float)[:, np.newaxis]
+
+    standardized = samples - means
+    standardized /= np.where(stdevs > 0, stdevs, 1.0)
+    correlated = factor @ standardized
+    correlated *= stdevs
+    correlated += means
+    return correlated
+
+
+def iman_conover(samples, factor, rng):
+    """Reorders independent samples of the form (d, n) of any marginals so their rank correlation follows the
+    Cholesky factor of the target matrix (Iman and Conover, 1982).
+
+    Each input's samples are sorted once and placed in the rank order of correlated normal scores,
+    so every marginal keeps exactly the values it was sampled with. The scores are drawn at random
+    rather than by permuting van der Waerden scores, which only affects their values, not the ranks
+    they impose, and is several times faster."""
+
+    score_matrix = rng.standard_normal(samples.shape)
+
+    # remove the chance correlation of the permuted scores before imposing the target; a block with no more
+    # samples than inputs (e.g. the short last chunk of a run) has a singular score correlation, so its
+    # scores are used as drawn
+    target_scores = factor @ score_matrix
+    if samples.shape[1] > samples.shape[0]:
+        try:
+            chance_factor = np.linalg.cholesky(np.corrcoef(score_matrix))
+        except np.linalg.LinAlgError:
+            pass
+        else:
+            target_scores = np.linalg.solve(chance_factor.T, factor.T).T @ score_matrix
+
+    order = np.argsort(target_scores, axis=1)
+    correlated = np.empty_like(samples, dtype=float)
+    np.put_along_axis(correlated, order, np.sort(samples, axis=1), axis=1)
+    return correlated
+
+
+def gaussian_copula(unit_samples, factor):
+    """Correlates independent unit samples of the form (n, d), as drawn by sampling.sample_unit, through a
+    Gaussian copula for use before inverse CDFs."""
+
+    correlated = ndtr(ndtri(unit_samples) @ factor.T)
+    return np.clip(correlated, np.finfo(float).tiny, 1 - np.finfo(float).epsneg)
+
+
+if __name__ == "__main__":
+    # CORRELATION OVERHEAD BENCHMARK #
+    # run as a module from the repository root: python -m tolerable_app.correlation [inputs] [iterations]
+    from .simulate import sim_chunks
+    import sys
+    import time
+
+    d = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 10 ** 7
+    chunk_size = 2 ** 16
+
+    # neighbouring parts share a fixture, so each part is correlated with the next one along the chain
+    names = ['Part {}'.format(number) for number in range(d)]
+    text = '\n'.join('{}, {}, {}'.format(names[i], names[i + 1], 0.4) for i in range(d - 1))
+
+    for input_type, details in (('normal', {'normal_input_mean': 1.0, 'normal_input_stdev': 0.05}),
+                                ('triangle', {'triangle_input_min': 0.9, 'triangle_input_mode': 1.0, 'triangle_input_max': 1.2})):
+        inputs = {'inputform_{}'.format(i): {'input_details': details, 'input_name': name, 'input_type': input_type}
+                  for i, name in enumerate(names)}
+
+        timings = {}
+        for label, correlations in (('independent', ''), ('correlated', text)):
+            settings = {'setting_alpha': 0.05, 'setting_n': n, 'setting_seed': 0, 'setting_correlations': correlations}
+            start = time.perf_counter()
+            for inputs_data, __ in sim_chunks(inputs=inputs, settings=settings, chunk_size=chunk_size):
+                last_chunk = inputs_data
+            timings[label] = time.perf_counter() - start
+
+        achieved = np.corrcoef(last_chunk[names[0]], last_chunk[names[1]])[0, 1]
+        print('{:>8} x {} inputs, {:.0e} iterations: independent {:.1f} s, correlated {:.1f} s ({:+.0%}), '
+              'neighbour correlation {:.3f} (target 0.4)'.format(
+                  input_type, d, n, timings['independent'], timings['correlated'],
+                  timings['correlated'] / timings['independent'] - 1, achieved))
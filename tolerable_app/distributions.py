@@ -0,0 +1,359 @@
+from .alias import build_alias_table, sample_alias, ppf_alias
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+from scipy.special import betaincinv, ndtr, ndtri
+from scipy.stats import binom, poisson
+import numpy as np
+import re
+
+
+# DISTRIBUTION REGISTRY #
+Distribution = namedtuple('Distribution', ('tag', 'label', 'sample', 'ppf', 'mean', 'variance', 'bounds'))
+Distribution.__doc__ = """Entry of the distribution registry.
+
+- sample(input_details, n, rng) returns n samples drawn with the numpy Generator rng
+- ppf(unit_samples, input_details) maps samples on (0, 1) through the inverse CDF
+- mean(input_details) and variance(input_details) return the analytic moments
+- bounds(input_details, k_sigma) returns the (min, max) used for worst-case analysis: the ends of the
+  support, with unbounded tails cut where a normal variable would be k_sigma standard deviations out"""
+
+distribution_registry = OrderedDict()
+
+
+def register_distribution(tag, label, sample, ppf, mean, variance, bounds=None):
+    """Adds (or replaces) an input distribution type. Input types are offered in the order registered.
+
+    Types registered without bounds take them from their ppf at the k_sigma tail probabilities."""
+
+    if bounds is None:
+        def bounds(input_details, k_sigma=3.0):
+            return tuple(float(bound) for bound in ppf(np.array(tail_probabilities(k_sigma)), input_details))
+
+    distribution_registry[tag] = Distribution(tag, label, sample, ppf, mean, variance, bounds)
+    return distribution_registry[tag]
+
+
+def get_distribution(input_type):
+    return distribution_registry[input_type]
+
+
+def tail_probabilities(k_sigma):
+    """Returns the probabilities below -k_sigma and below +k_sigma of a standard normal variable."""
+
+    return float(ndtr(-k_sigma)), float(ndtr(k_sigma))
+
+
+# CONSTANT #
+def sample_constant(input_details, n, rng):
+    return np.full(n, float(input_details['constant_input_value']))
+
+
+def ppf_constant(unit_samples, input_details):
+    return np.full(np.shape(unit_samples), float(input_details['constant_input_value']))
+
+
+def mean_constant(input_details):
+    return float(input_details['constant_input_value'])
+
+
+def variance_constant(input_details):
+    return 0.0
+
+
+def bounds_constant(input_details, k_sigma=3.0):
+    return float(input_details['constant_input_value']), float(input_details['constant_input_value'])
+
+
+# NORMAL #
+def sample_normal(input_details, n, rng):
+    return rng.normal(loc=input_details['normal_input_mean'], scale=input_details['normal_input_stdev'], size=n)
+
+
+def ppf_normal(unit_samples, input_details):
+    return input_details['normal_input_mean'] + input_details['normal_input_stdev'] * ndtri(unit_samples)
+
+
+def mean_normal(input_details):
+    return float(input_details['normal_input_mean'])
+
+
+def variance_normal(input_details):
+    return float(input_details['normal_input_stdev']) ** 2
+
+
+def bounds_normal(input_details, k_sigma=3.0):
+    mean, stdev = float(input_details['normal_input_mean']), float(input_details['normal_input_stdev'])
+    return mean - k_sigma * stdev, mean + k_sigma * stdev
+
+
+# UNIFORM #
+def sample_uniform(input_details, n, rng):
+    return rng.uniform(low=input_details['uniform_input_min'], high=input_details['uniform_input_max'], size=n)
+
+
+def ppf_uniform(unit_samples, input_details):
+    low = input_details['uniform_input_min']
+    high = input_details['uniform_input_max']
+    return low + (high - low) * unit_samples
+
+
+def mean_uniform(input_details):
+    return (input_details['uniform_input_min'] + input_details['uniform_input_max']) / 2
+
+
+def variance_uniform(input_details):
+    return (input_details['uniform_input_max'] - input_details['uniform_input_min']) ** 2 / 12
+
+
+def bounds_uniform(input_details, k_sigma=3.0):
+    return float(input_details['uniform_input_min']), float(input_details['uniform_input_max'])
+
+
+# TRIANGLE #
+def triangle_params(input_details):
+    return input_details['triangle_input_min'], input_details['triangle_input_mode'], input_details['triangle_input_max']
+
+
+def sample_triangle(input_details, n, rng):
+    return ppf_triangle(rng.random(n), input_details)
+
+
+def ppf_triangle(unit_samples, input_details):
+    low, mode, high = triangle_params(input_details)
+    if high == low:
+        return np.full(np.shape(unit_samples), float(low))
+
+    mode_cdf = (mode - low) / (high - low)
+    lower = low + np.sqrt(unit_samples * (high - low) * (mode - low))
+    upper = high - np.sqrt((1 - unit_samples) * (high - low) * (high - mode))
+    return np.where(unit_samples < mode_cdf, lower, upper)
+
+
+def mean_triangle(input_details):
+    return sum(triangle_params(input_details)) / 3
+
+
+def variance_triangle(input_details):
+    low, mode, high = triangle_params(input_details)
+    return (low ** 2 + mode ** 2 + high ** 2 - low * mode - low * high - mode * high) / 18
+
+
+def bounds_triangle(input_details, k_sigma=3.0):
+    low, __, high = triangle_params(input_details)
+    return float(low), float(high)
+
+
+# PERT #
+def pert_params(input_details):
+    """Returns (min, max, alpha, beta) of the beta distribution underlying a PERT input."""
+
+    low, mode, high = input_details['pert_input_min'], input_details['pert_input_mode'], input_details['pert_input_max']
+    width = (high - low) or 1.0
+    return low, high, 1 + 4 * (mode - low) / width, 1 + 4 * (high - mode) / width
+
+
+def sample_pert(input_details, n, rng):
+    low, high, a, b = pert_params(input_details)
+    return low + (high - low) * rng.beta(a, b, size=n)
+
+
+def ppf_pert(unit_samples, input_details):
+    low, high, a, b = pert_params(input_details)
+    return low + (high - low) * betaincinv(a, b, unit_samples)
+
+
+def mean_pert(input_details):
+    return (input_details['pert_input_min'] + 4 * input_details['pert_input_mode'] + input_details['pert_input_max']) / 6
+
+
+def variance_pert(input_details):
+    mean = mean_pert(input_details)
+    return (mean - input_details['pert_input_min']) * (input_details['pert_input_max'] - mean) / 7
+
+
+def bounds_pert(input_details, k_sigma=3.0):
+    return float(input_details['pert_input_min']), float(input_details['pert_input_max'])
+
+
+# PARETO #
+def sample_pareto(input_details, n, rng):
+    # numpy draws the Lomax (Pareto II) distribution, which is shifted by one from the classical Pareto
+    return input_details['pareto_input_scale'] * (1 + rng.pareto(input_details['pareto_input_shape'], size=n))
+
+
+def ppf_pareto(unit_samples, input_details):
+    return input_details['pareto_input_scale'] * (1 - unit_samples) ** (-1 / input_details['pareto_input_shape'])
+
+
+def mean_pareto(input_details):
+    scale, shape = input_details['pareto_input_scale'], input_details['pareto_input_shape']
+    return shape * scale / (shape - 1) if shape > 1 else np.inf
+
+
+def variance_pareto(input_details):
+    scale, shape = input_details['pareto_input_scale'], input_details['pareto_input_shape']
+    return scale ** 2 * shape / ((shape - 1) ** 2 * (shape - 2)) if shape > 2 else np.inf
+
+
+def bounds_pareto(input_details, k_sigma=3.0):
+    # bounded below by the scale, so only the upper tail is cut
+    return float(input_details['pareto_input_scale']), float(ppf_pareto(tail_probabilities(k_sigma)[1], input_details))
+
+
+# LOGNORMAL #
+def sample_lognormal(input_details, n, rng):
+    return rng.lognormal(mean=input_details['lognormal_input_mu'], sigma=input_details['lognormal_input_sigma'], size=n)
+
+
+def ppf_lognormal(unit_samples, input_details):
+    return np.exp(input_details['lognormal_input_mu'] + input_details['lognormal_input_sigma'] * ndtri(unit_samples))
+
+
+def mean_lognormal(input_details):
+    return np.exp(input_details['lognormal_input_mu'] + input_details['lognormal_input_sigma'] ** 2 / 2)
+
+
+def variance_lognormal(input_details):
+    mu, sigma = input_details['lognormal_input_mu'], input_details['lognormal_input_sigma']
+    return (np.exp(sigma ** 2) - 1) * np.exp(2 * mu + sigma ** 2)
+
+
+# DISCRETE #
+def parse_number_list(text):
+    """Parses a comma and / or whitespace separated list of numbers, e.g. '0.5, 1.0, 1.5'."""
+
+    return np.array([float(item) for item in re.split(r'[,\s]+', text.strip()) if item])
+
+
+@lru_cache(maxsize=128)
+def discrete_alias_table(values, weights):
+    """Alias table for a discrete input, cached on the raw values and weights strings of its input details."""
+
+    return build_alias_table(parse_number_list(values), parse_number_list(weights))
+
+
+def discrete_table(input_details):
+    return discrete_alias_table(input_details['discrete_input_values'], input_details['discrete_input_weights'])
+
+
+def sample_discrete(input_details, n, rng):
+    return sample_alias(discrete_table(input_details), n, rng)
+
+
+def ppf_discrete(unit_samples, input_details):
+    return ppf_alias(unit_samples, discrete_table(input_details))
+
+
+def mean_discrete(input_details):
+    table = discrete_table(input_details)
+    return float(np.dot(table.values, np.diff(table.cdf, prepend=0)))
+
+
+def variance_discrete(input_details):
+    table = discrete_table(input_details)
+    return float(np.dot((table.values - mean_discrete(input_details)) ** 2, np.diff(table.cdf, prepend=0)))
+
+
+def bounds_discrete(input_details, k_sigma=3.0):
+    values = parse_number_list(input_details['discrete_input_values'])
+    return float(values.min()), float(values.max())
+
+
+# POISSON #
+# the support is truncated where the mass left in either tail is below tail_mass
+tail_mass = 1e-12
+# wider supports are sampled directly by numpy rather than through an alias table
+max_alias_support = 2 ** 16
+
+
+def truncated_support(distribution):
+    """Returns the support of a frozen discrete scipy distribution with both tails beyond tail_mass cut off,
+    or None when it is wider than max_alias_support (or too wide for scipy to place)."""
+
+    low, high = distribution.ppf([tail_mass, 1 - tail_mass])
+    if not np.isfinite([low, high]).all() or high - low >= max_alias_support:
+        return None
+    return np.arange(max(int(low), 0), int(high) + 1)
+
+
+@lru_cache(maxsize=128)
+def poisson_alias_table(lam):
+    """Alias table for a poisson input, or None when its support is too wide to tabulate."""
+
+    support = truncated_support(poisson(lam))
+    if support is None:
+        return None
+    return build_alias_table(support, poisson.pmf(support, lam))
+
+
+def sample_poisson(input_details, n, rng):
+    lam = float(input_details['poisson_input_lambda'])
+    table = poisson_alias_table(lam)
+    if table is None:
+        return rng.poisson(lam, size=n).astype(float)
+    return sample_alias(table, n, rng)
+
+
+def ppf_poisson(unit_samples, input_details):
+    return poisson.ppf(unit_samples, input_details['poisson_input_lambda'])
+
+
+def mean_poisson(input_details):
+    return float(input_details['poisson_input_lambda'])
+
+
+def variance_poisson(input_details):
+    return float(input_details['poisson_input_lambda'])
+
+
+def bounds_poisson(input_details, k_sigma=3.0):
+    # scipy places ppf(0) of a discrete variable one below its support, so the lower bound is given directly
+    return 0.0, float(poisson.ppf(tail_probabilities(k_sigma)[1], input_details['poisson_input_lambda']))
+
+
+# BINOMIAL #
+@lru_cache(maxsize=128)
+def binomial_alias_table(trials, p):
+    """Alias table for a binomial input, or None when its support is too wide to tabulate."""
+
+    support = truncated_support(binom(trials, p))
+    if support is None:
+        return None
+    return build_alias_table(support, binom.pmf(support, trials, p))
+
+
+def sample_binomial(input_details, n, rng):
+    trials, p = int(input_details['binomial_input_trials']), float(input_details['binomial_input_p'])
+    table = binomial_alias_table(trials, p)
+    if table is None:
+        return rng.binomial(trials, p, size=n).astype(float)
+    return sample_alias(table, n, rng)
+
+
+def ppf_binomial(unit_samples, input_details):
+    return binom.ppf(unit_samples, input_details['binomial_input_trials'], input_details['binomial_input_p'])
+
+
+def mean_binomial(input_details):
+    return input_details['binomial_input_trials'] * input_details['binomial_input_p']
+
+
+def variance_binomial(input_details):
+    p = input_details['binomial_input_p']
+    return input_details['binomial_input_trials'] * p * (1 - p)
+
+
+def bounds_binomial(input_details, k_sigma=3.0):
+    return 0.0, float(input_details['binomial_input_trials'])
+
+
+register_distribution('constant', 'Constant', sample_constant, ppf_constant, mean_constant, variance_constant, bounds_constant)
+register_distribution('normal', 'Normal', sample_normal, ppf_normal, mean_normal, variance_normal, bounds_normal)
+register_distribution('uniform', 'Uniform', sample_uniform, ppf_uniform, mean_uniform, variance_uniform, bounds_uniform)
+register_distribution('triangle', 'Triangular', sample_triangle, ppf_triangle, mean_triangle, variance_triangle, bounds_triangle)
+register_distribution('pert', 'PERT', sample_pert, ppf_pert, mean_pert, variance_pert, bounds_pert)
+register_distribution('pareto', 'Pareto', sample_pareto, ppf_pareto, mean_pareto, variance_pareto, bounds_pareto)
+register_distribution('lognormal', 'Lognormal', sample_lognormal, ppf_lognormal, mean_lognormal, variance_lognormal)
+register_distribution('discrete', 'Discrete', sample_discrete, ppf_discrete, mean_discrete, variance_discrete, bounds_discrete)
+register_distribution('poisson', 'Poisson', sample_poisson, ppf_poisson, mean_poisson, variance_poisson, bounds_poisson)
+register_distribution('binomial', 'Binomial', sample_binomial, ppf_binomial, mean_binomial, variance_binomial, bounds_binomial)
@@ -0,0 +1,116 @@
+from contextlib import contextmanager
+from io import BytesIO
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import matplotlib as mpl
+import threading
+
+
+# FIGURE POOL #
+class FigurePool:
+    """Pool of reusable Agg figures for rendering plots on the server.
+
+    Figures are created directly from matplotlib.figure.Figure, so they are never registered
+    with pyplot and are cleared and returned to the pool as soon as a render finishes. Each
+    figure is checked out by a single thread at a time; matplotlib's Agg canvas guards the
+    shared font cache itself, so any number of threads can render at once.
+
+    - Accepts size as the number of figures in the pool (further renders wait for a figure to be
+      released, which bounds the memory used by rendering)"""
+
+    def __init__(self, size=4, figsize=None, dpi=None):
+        self.size = size
+        self.figsize = figsize or tuple(mpl.rcParams['figure.figsize'])
+        self.dpi = dpi or mpl.rcParams['figure.dpi']
+        self.created = 0
+        self._idle = []
+        self._lock = threading.Lock()
+        self._available = threading.BoundedSemaphore(size)
+
+    def _new_figure(self):
+        fig = Figure(figsize=self.figsize, dpi=self.dpi)
+        FigureCanvasAgg(fig)
+        self.created += 1
+        return fig
+
+    def acquire(self):
+        self._available.acquire()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            return self._new_figure()
+
+    def release(self, fig):
+        # drop everything drawn so the next render starts from a blank figure
+        fig.clear()
+        fig.set_size_inches(self.figsize)
+        fig.set_dpi(self.dpi)
+
+        with self._lock:
+            self._idle.append(fig)
+        self._available.release()
+
+    @contextmanager
+    def figure(self):
+        fig = self.acquire()
+        try:
+            yield fig
+        finally:
+            self.release(fig)
+
+
+figure_pool = FigurePool()
+
+
+def render_figure(draw, img_format='png', pool=None, **savefig_kwargs):
+    """Renders a plot to image bytes on a pooled figure.
+
+    - Accepts draw as a function of the form draw(fig) that adds axes and artists to fig
+    - Returns the image bytes in img_format (any format supported by the Agg canvas, e.g. 'png' or 'svg')"""
+
+    with (pool or figure_pool).figure() as fig:
+        draw(fig)
+        bin_buffer = BytesIO()
+        fig.savefig(bin_buffer, format=img_format, **savefig_kwargs)
+    return bin_buffer.getvalue()
+
+
+if __name__ == "__main__":
+    # FIGURE RENDERER SOAK TEST #
+    # run as a module from the repository root: python -m tolerable_app.figures
+    from concurrent.futures import ThreadPoolExecutor
+    import numpy as np
+    import resource
+    import time
+
+    def rss_mib():
+        try:
+            with open('/proc/self/statm') as statm:
+                return int(statm.read().split()[1]) * resource.getpagesize() / 2 ** 20
+        except OSError:
+            # peak rather than current usage on platforms without /proc
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+
+    rng = np.random.default_rng(0)
+    histograms = [np.histogram(rng.normal(loc=index, size=5000), bins=50, density=True) for index in range(4)]
+
+    def draw(fig):
+        ax = fig.subplots()
+        for index, (density, edges) in enumerate(histograms):
+            ax.fill_between(edges[:-1], density, step='post', alpha=0.5, label='input {}'.format(index))
+        ax.set_xlabel('Value')
+        ax.set_ylabel('PDF (%)')
+        ax.legend()
+
+    renders = 10 ** 4
+    report_every = 1000
+    threads = 8
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        for batch in range(renders // report_every):
+            sizes = list(executor.map(lambda __: len(render_figure(draw)), range(report_every)))
+            print('{:>6} renders  {:>8.1f} MiB resident  {:>6} figures created  {:>7} bytes / png'.format(
+                (batch + 1) * report_every, rss_mib(), figure_pool.created, sizes[-1]))
+
+    print('{} renders on {} threads in {:.1f} s'.format(renders, threads, time.perf_counter() - start))
@@ -1,9 +1,15 @@
 from flask_wtf import FlaskForm
 from wtforms import (
     StringField, FloatField, IntegerField, SelectField, BooleanField,
-    HiddenField, FieldList, SubmitField, FormField
+    HiddenField, FieldList, SubmitField, FormField, TextAreaField, SelectMultipleField
 )
-from wtforms.validators import ValidationError, DataRequired, NoneOf
+from wtforms.validators import ValidationError, DataRequired, NoneOf, Optional, NumberRange
+from flask import session, current_app
+from .sampling import sampling_choices
+from .correlation import parse_correlations, correlation_matrix, CorrelationError
+from .precision import parse_spec_limits, SpecLimitError
+from .scenarios import parse_sweep, SweepError
+from .input_forms import input_details_errors
 
 class SettingsForm(FlaskForm):
     setting_n = IntegerField(
@@ -19,12 +25,180 @@ class SettingsForm(FlaskForm):
     setting_alpha = FloatField(
         'Confidence Interval Alpha Level',
         default=0.05,
-        validators=[DataRequired()],
+        validators=[DataRequired(), NumberRange(min=0, max=1, message='Alpha must be between 0 and 1.')],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    setting_seed = IntegerField(
+        'Random Seed<br>(leave blank for a new seed)',
+        validators=[Optional(), NumberRange(min=0)],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    setting_parallel = BooleanField(
+        'Run on Multiple Cores',
+        default=False,
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    setting_sampling = SelectField(
+        'Sampling Strategy',
+        choices=sampling_choices,
+        default='random',
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    setting_antithetic = BooleanField(
+        'Antithetic Sampling<br>(pairs every sample with its mirror image)',
+        default=False,
         render_kw={
             'onchange': 'this.form.submit()',
             'onkeypress': 'return event.keyCode != 13;'
         }
     )
 
+    setting_control_variates = BooleanField(
+        'Control Variates<br>(adjusts each output mean by its linearized model)',
+        default=False,
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    setting_adaptive = BooleanField(
+        'Stop When Precise Enough<br>(iterations above become the upper limit)',
+        default=False,
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    setting_precision = FloatField(
+        'Target Precision<br>(confidence interval half width, in standard deviations)',
+        default=0.01,
+        validators=[DataRequired(), NumberRange(min=1e-6)],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    setting_k_sigma = FloatField(
+        'Worst-Case Bounds of Unbounded Inputs<br>(standard deviations from the mean)',
+        default=3.0,
+        validators=[DataRequired(), NumberRange(min=0.1)],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    setting_correlations = TextAreaField(
+        'Input Correlations<br>(one pair per line as: Name A, Name B, coefficient)',
+        validators=[Optional()],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'rows': 3
+        }
+    )
+
+    setting_spec_limits = TextAreaField(
+        'Output Spec Limits<br>(one output per line as: Name, lower limit, upper limit; either limit may be blank)',
+        validators=[Optional()],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'rows': 3
+        }
+    )
+
     submit_settings = SubmitField('Update Settings')
 
+    def validate_setting_alpha(form, field):
+        # an alpha of 0 or 1 leaves no interval (its percentiles are the infinite tails or the median)
+        if field.data is not None and not 0 < field.data < 1:
+            raise ValidationError('Alpha must be between 0 and 1.')
+
+    def validate_setting_correlations(form, field):
+        # checked against the inputs currently defined, including that the matrix is positive definite
+        try:
+            correlation_matrix(tuple(session.get('input_names') or ()), parse_correlations(field.data))
+        except CorrelationError as error:
+            raise ValidationError(str(error))
+
+    def validate_setting_spec_limits(form, field):
+        # checked against the outputs currently defined
+        try:
+            spec_limits = parse_spec_limits(field.data)
+        except SpecLimitError as error:
+            raise ValidationError(str(error))
+        for output_name in spec_limits:
+            if output_name not in (session.get('output_names') or ()):
+                raise ValidationError("'{}' is not an output.".format(output_name))
+
+
+
+class SweepForm(FlaskForm):
+    sweep_parameters = TextAreaField(
+        'Swept Parameters<br>(one per line as: Input Name, parameter, values or start:stop:count)',
+        validators=[DataRequired()],
+        render_kw={
+            'rows': 4
+        }
+    )
+
+    submit_sweep = SubmitField('Run Sweep')
+
+    def validate_sweep_parameters(form, field):
+        # checked against the inputs currently defined, the largest grid allowed and the input detail forms
+        try:
+            parse_sweep(field.data, session.get('inputs') or {}, current_app.config['SWEEP_MAX_SCENARIOS'], input_details_errors)
+        except SweepError as error:
+            raise ValidationError(str(error))
+
+
+# the session's unsaved model, always available to compare
+current_design = 'Current Design'
+
+
+class DesignForm(FlaskForm):
+    design_name = StringField(
+        'Save Current Design As',
+        validators=[DataRequired(), NoneOf([current_design], message='Choose another name.')]
+    )
+
+    submit_design = SubmitField('Save Design')
+
+
+class CompareForm(FlaskForm):
+    # choices are the session's saved designs, set by the route
+    compare_baseline = SelectField(
+        'Baseline Design',
+        choices=[]
+    )
+
+    compare_variants = SelectMultipleField(
+        'Compare Against',
+        choices=[]
+    )
+
+    submit_compare = SubmitField('Compare Designs')
+
+    def validate_compare_variants(form, field):
+        if not field.data:
+            raise ValidationError('Choose at least one design to compare against the baseline.')
+        if form.compare_baseline.data in field.data:
+            raise ValidationError('The baseline cannot be compared against itself.')
@@ -0,0 +1,122 @@
+from .symbolic import parse_definition
+import re
+
+
+# OUTPUT DEPENDENCY GRAPH #
+class CircularDefinitionError(ValueError):
+    """Raised when output definitions refer to each other in a cycle."""
+
+    def __init__(self, cycle):
+        self.cycle = tuple(cycle)
+        super().__init__('Circular output definitions: {}'.format(' -> '.join(self.cycle)))
+
+
+def definition_translation(inputs=None, outputs=None):
+    """Returns the translation table of human readable input and output names to their ids."""
+
+    translation = {input_spec['input_name']: input_id for input_id, input_spec in (inputs or {}).items()}
+    translation.update({output_spec['output_name']: output_id for output_id, output_spec in (outputs or {}).items()})
+    return translation
+
+
+def referenced_ids(mach_defn, ids):
+    """Returns the ids (in order of first reference) that a machine readable definition refers to."""
+
+    ids = set(ids)
+    referenced = []
+    for token in re.findall(r'[A-Za-z_]\w*', mach_defn):
+        if token in ids and token not in referenced:
+            referenced.append(token)
+    return tuple(referenced)
+
+
+def output_dependencies(outputs=None, inputs=None):
+    """Maps each output to the outputs its definition refers to.
+
+    - Accepts outputs of the form {output id: {'output_name': ..., 'output_defn': ..., 'output_vis': ...}}
+    - Returns ({output id: machine readable definition}, {output id: (referenced output id, ...)})"""
+
+    translation = definition_translation(inputs, outputs)
+
+    mach_defns = {output_id: parse_definition(output_spec['output_defn'], translation) for output_id, output_spec in outputs.items()}
+    dependencies = {output_id: referenced_ids(mach_defn, outputs) for output_id, mach_defn in mach_defns.items()}
+
+    return mach_defns, dependencies
+
+
+def find_cycle(dependencies):
+    """Returns one cycle of ids as a tuple (first id repeated at the end) or None if the graph is acyclic."""
+
+    visiting, visited = [], set()
+
+    def visit(node):
+        if node in visiting:
+            return (*visiting[visiting.index(node):], node)
+        if node in visited:
+            return None
+        visiting.append(node)
+        for dependency in dependencies.get(node, ()):
+            cycle = visit(dependency)
+            if cycle:
+                return cycle
+        visiting.pop()
+        visited.add(node)
+        return None
+
+    for node in dependencies:
+        cycle = visit(node)
+        if cycle:
+            return cycle
+
+    return None
+
+
+def topological_order(dependencies):
+    """Orders ids so that every id comes after the ids it depends on.
+
+    Ties keep the order of dependencies, so unrelated outputs stay in the order they were defined.
+    Raises CircularDefinitionError if the definitions refer to each other in a cycle."""
+
+    cycle = find_cycle(dependencies)
+    if cycle:
+        raise CircularDefinitionError(cycle)
+
+    order, placed = [], set()
+
+    def place(node):
+        if node in placed:
+            return
+        for dependency in dependencies.get(node, ()):
+            place(dependency)
+        placed.add(node)
+        order.append(node)
+
+    for node in dependencies:
+        place(node)
+
+    return order
+
+
+def downstream(dependencies, changed_ids):
+    """Returns the changed ids together with every id that directly or indirectly depends on them."""
+
+    dirty = set(changed_ids)
+    for node in topological_order(dependencies):
+        if any(dependency in dirty for dependency in dependencies[node]):
+            dirty.add(node)
+    return dirty
+
+
+def inline_definitions(mach_defns, dependencies):
+    """Substitutes referenced outputs into each machine readable definition so it only refers to inputs."""
+
+    inlined = {}
+    for output_id in topological_order(dependencies):
+        mach_defn = mach_defns[output_id]
+        if dependencies[output_id]:
+            mach_defn = re.sub(
+                r'\b({})\b'.format('|'.join(map(re.escape, dependencies[output_id]))),
+                lambda match: '({})'.format(inlined[match.group(1)]),
+                mach_defn)
+        inlined[output_id] = mach_defn
+    return {output_id: inlined[output_id] for output_id in mach_defns}
@@ -0,0 +1,149 @@
+from .figures import render_figure
+from .simulate import plot_sim_summaries
+from .store import sample_key
+from collections import OrderedDict
+from io import BytesIO
+import threading
+
+try:
+    # Pillow is optional and only needed to serve WebP images
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+# IMAGE FORMATS #
+image_mimetypes = OrderedDict((
+    ('png', 'image/png'),
+    ('svg', 'image/svg+xml'),
+))
+
+if Image is not None:
+    image_mimetypes['webp'] = 'image/webp'
+
+plot_titles = {
+    'inputs': 'Independent Variable Probably Densities',
+    'outputs': 'Dependent Variable Probably Densities',
+}
+
+
+def plot_key(inputs, outputs, settings, plot_name, plot_options=None):
+    """Returns the content address of a result plot.
+
+    Rendering is deterministic in the model, the settings (including the seed) and the plot
+    options, so the key identifies the image bytes of every format and can serve as a strong ETag."""
+
+    return sample_key(kind='plot', inputs=inputs, outputs=outputs, settings=settings,
+                      plot_name=plot_name, plot_options=plot_options or {})
+
+
+def render_plot(sims_summaries, plot_name, img_format='png'):
+    """Renders summaries of the form {name: SimSummary} to image bytes in one of image_mimetypes."""
+
+    def draw(fig):
+        ax = fig.subplots()
+        plot_sim_summaries(sims_summaries, ax=ax)
+        fig.suptitle(plot_titles[plot_name])
+        ax.legend()
+
+    if img_format == 'webp':
+        # matplotlib cannot write WebP itself, so the PNG is converted with Pillow
+        webp_buffer = BytesIO()
+        Image.open(BytesIO(render_figure(draw, 'png'))).save(webp_buffer, format='webp', lossless=True)
+        return webp_buffer.getvalue()
+
+    return render_figure(draw, img_format)
+
+
+# IMAGE CACHE #
+class ImageCache:
+    """In-process LRU cache of rendered image bytes bounded by their total size."""
+
+    def __init__(self, max_bytes=64 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            image_bytes = self._images.get(key)
+            if image_bytes is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._images.move_to_end(key)
+            return image_bytes
+
+    def set(self, key, image_bytes):
+        with self._lock:
+            if key in self._images:
+                self.size -= len(self._images.pop(key))
+            self._images[key] = image_bytes
+            self.size += len(image_bytes)
+
+            while self.size > self.max_bytes and self._images:
+                __, evicted = self._images.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class PlotSources:
+    """Count-bounded LRU of the summaries behind recently served result pages, so their images
+    can be rendered on request without re-running the simulation."""
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._sources = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            source = self._sources.get(key)
+            if source is not None:
+                self._sources.move_to_end(key)
+            return source
+
+    def set(self, key, plot_name, sims_summaries):
+        with self._lock:
+            self._sources[key] = (plot_name, sims_summaries)
+            self._sources.move_to_end(key)
+            while len(self._sources) > self.maxsize:
+                self._sources.popitem(last=False)
+
+
+image_cache = ImageCache()
+plot_sources = PlotSources()
+
+
+def configure_image_cache(max_bytes=64 * 2 ** 20, max_sources=64):
+    global image_cache, plot_sources
+    image_cache = ImageCache(max_bytes=max_bytes)
+    plot_sources = PlotSources(maxsize=max_sources)
+    return image_cache
+
+
+def remember_plot(key, plot_name, sims_summaries):
+    plot_sources.set(key, plot_name, sims_summaries)
+
+
+def get_image(key, img_format, sims_summaries=None, plot_name=None):
+    """Returns the image bytes of a plot, rendering (and caching) them on a miss.
+
+    - Returns None if the image is not cached and no summaries are known for the key"""
+
+    cache_key = '{}.{}'.format(key, img_format)
+    image_bytes = image_cache.get(cache_key)
+    if image_bytes is not None:
+        return image_bytes
+
+    if sims_summaries is None:
+        source = plot_sources.get(key)
+        if source is None:
+            return None
+        plot_name, sims_summaries = source
+
+    image_bytes = render_plot(sims_summaries, plot_name, img_format)
+    image_cache.set(cache_key, image_bytes)
+    return image_bytes
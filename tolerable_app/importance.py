@@ -0,0 +1,276 @@
+from .graph import output_dependencies, inline_definitions
+from .kernels import compile_definition, broadcast_output
+from .correlation import input_correlations
+from .precision import z_value
+from .sampling import sample_unit
+from .simulate import ppf_input
+from scipy.special import ndtr, ndtri, logsumexp
+import numpy as np
+
+
+# STANDARD NORMAL SPACE #
+# every input is written as a function of an independent standard normal variable, so one
+# shift of the sampling density (and one likelihood ratio) serves any mix of distributions
+def normal_space_transform(inputs, settings):
+    """Returns a function mapping standard normal points of the form (inputs, n) to input arrays in simulation order.
+
+    Normal inputs are mapped exactly (mean + stdev z) so their far tails keep full precision; other inputs
+    go through their inverse CDFs. Correlated inputs (setting_correlations) are coupled through a Gaussian
+    copula, as in sim_inputs_ppf."""
+
+    input_ids = list(inputs)
+    factor = np.eye(len(input_ids))
+    correlations = input_correlations(inputs, settings)
+    if correlations:
+        dims = [input_ids.index(correlated_id) for correlated_id in correlations[0]]
+        factor[np.ix_(dims, dims)] = correlations[1]
+
+    def transform(normal_points):
+        normal_points = factor @ normal_points
+        inputs_data = []
+        for dim, input_spec in enumerate(inputs.values()):
+            if input_spec['input_type'] == 'normal':
+                input_details = input_spec['input_details']
+                inputs_data.append(input_details['normal_input_mean'] + input_details['normal_input_stdev'] * normal_points[dim])
+            else:
+                unit_points = np.clip(ndtr(normal_points[dim]), np.finfo(float).tiny, 1 - np.finfo(float).epsneg)
+                inputs_data.append(ppf_input(unit_points, input_spec=input_spec))
+        return inputs_data
+
+    return transform
+
+
+def design_point(limit_state, dims, start=None, max_iterations=50, tolerance=1e-6, step=1e-4):
+    """Finds the most probable failure point of a limit state g (failure where g < 0) in standard normal space.
+
+    Hasofer-Lind-Rackwitz-Fiessler iteration: g is linearized at the current point and the point moves to
+    the closest point of the linearized limit surface to the origin. From the default start the first step
+    is the linearization about the means; the gradient is taken by finite differences, all (inputs + 1)
+    points in one evaluation.
+
+    - Accepts limit_state as a vectorized function of points of the form (dims, n)
+    - Accepts start as the point to iterate from (the origin if None)
+    - Returns the design point as an array of length dims (the origin if g has no usable gradient)"""
+
+    point = np.zeros(dims) if start is None else np.asarray(start, dtype=float)
+    for __ in range(max_iterations):
+        points = point[:, np.newaxis] + np.hstack([np.zeros((dims, 1)), step * np.eye(dims)])
+        values = limit_state(points)
+        gradient = (values[1:] - values[0]) / step
+
+        if not np.all(np.isfinite(values)) or not np.any(gradient):
+            return point if np.all(np.isfinite(point)) else np.zeros(dims)
+
+        new_point = (np.dot(gradient, point) - values[0]) / np.dot(gradient, gradient) * gradient
+        converged = np.linalg.norm(new_point - point) < tolerance * max(1.0, np.linalg.norm(new_point))
+        point = new_point
+        if converged:
+            break
+
+    return point
+
+
+def design_points(limit_state, dims, max_points=8, scan_points=81):
+    """Finds the design points of every failure region reachable from the origin, e.g. both tails of y = x^2.
+
+    A single design point misses failure regions on the far side of the means, so g is scanned along the
+    reflection of each design point found (out to twice its distance): where it fails there, the iteration
+    is restarted from the first failing point. A failure region that the restart cannot resolve into a new
+    design point (it converges back onto a known one, or off the limit surface) makes the search unreliable.
+    Limit surfaces curving all the way around the means (e.g. a circle) are not detected; there the defensive
+    component of importance_estimate keeps the estimate unbiased, but wide.
+
+    - Returns a tuple of the form (list of design points, reliable)"""
+
+    origin_value = limit_state(np.zeros((dims, 1)))[0]
+    surface_tolerance = 1e-3 * max(abs(origin_value), 1e-12) if np.isfinite(origin_value) else np.inf
+
+    def on_surface(point):
+        value = limit_state(point[:, np.newaxis])[0]
+        return np.isfinite(value) and abs(value) <= surface_tolerance
+
+    def known(point, points):
+        return any(np.linalg.norm(point - other) <= 1e-3 * max(1.0, np.linalg.norm(other)) for other in points)
+
+    points = [design_point(limit_state, dims)]
+    reliable = True
+    scanned = 0
+    while scanned < len(points) and len(points) < max_points:
+        point = points[scanned]
+        scanned += 1
+        if not np.any(point):
+            continue
+
+        steps = np.linspace(0, 2, scan_points)[1:]
+        with np.errstate(invalid='ignore'):
+            failing = np.flatnonzero(limit_state(-point[:, np.newaxis] * steps) < 0)
+        if not len(failing):
+            continue
+
+        new_point = design_point(limit_state, dims, start=-point * steps[failing[0]])
+        if not on_surface(new_point):
+            reliable = False
+        elif not known(new_point, points):
+            points.append(new_point)
+        elif known(new_point, [point]):
+            # slid back onto the point it was reflected from, so the failures on the far side are not covered
+            reliable = False
+
+    return points, reliable
+
+
+# IMPORTANCE SAMPLING #
+def importance_estimate(limit_state, shifts, unit_samples, alpha=0.05, defensive=0.1):
+    """Estimates P(g < 0) by sampling standard normal points from a mixture of normals, one centred on each
+    shift plus an unshifted (defensive) component, and weighting each failure by the likelihood ratio
+    phi(z) / q(z) with q(z) = sum of c_k phi(z - shift_k).
+
+    Samples are split between the components in the proportions c_k (defensive for the unshifted one, the
+    rest shared evenly by the shifts), which keeps the estimate unbiased whichever component a failure
+    region is reached from, and bounds every weight by 1 / defensive.
+
+    - Accepts shifts as a list of arrays of length dims (design points); the origin among them is ignored
+    - Accepts unit_samples of the form (n, dims) from sampling.sample_unit
+    - Returns a dict of the form {'probability': ..., 'standard_error': ..., 'lower': ..., 'upper': ...,
+      'failures': ..., 'effective_samples': ..., 'count': ...} with a (1 - alpha) confidence interval"""
+
+    count, dims = unit_samples.shape
+    shifts = [np.zeros(dims)] + [shift for shift in shifts if np.any(shift)]
+    if len(shifts) > 1:
+        unshifted = int(round(defensive * count))
+        sizes = [unshifted] + [len(part) for part in np.array_split(np.arange(count - unshifted), len(shifts) - 1)]
+    else:
+        sizes = [count]
+    centres = np.repeat(np.array(shifts), sizes, axis=0).T
+    proportions = np.array(sizes) / count
+
+    deviations = ndtri(unit_samples).T
+    points = centres + deviations
+    failed = limit_state(points) < 0
+
+    # log of q(z) / phi(z) = log sum of c_k exp(shift_k.z - |shift_k|^2 / 2), for the failures only
+    shifts = np.array(shifts)
+    exponents = shifts @ points[:, failed] - (shifts * shifts).sum(axis=1)[:, np.newaxis] / 2
+    weights = np.zeros(count)
+    weights[failed] = np.exp(-logsumexp(exponents, axis=0, b=proportions[:, np.newaxis]))
+
+    probability = float(weights.mean())
+    standard_error = float(weights.std(ddof=1) / np.sqrt(count)) if count > 1 else 0.0
+    half_width = z_value(alpha) * standard_error
+
+    # Kish effective sample size of the failures, a warning sign when only a few samples carry the estimate
+    effective_samples = float(weights.sum() ** 2 / np.dot(weights, weights)) if failed.any() else 0.0
+
+    return {
+        'probability': probability,
+        'standard_error': standard_error,
+        'lower': max(probability - half_width, 0.0),
+        'upper': probability + half_width,
+        'failures': int(failed.sum()),
+        'effective_samples': effective_samples,
+        'count': count
+    }
+
+
+def tail_probabilities(inputs, outputs, output_name, lsl=None, usl=None, settings=None, n=2 ** 15):
+    """Estimates the fraction of an output outside its spec limits by importance sampling, reaching
+    parts-per-million tails with 10^4 - 10^5 samples instead of the ~10^8 plain sampling needs.
+
+    Each limit gets its own sampling density, a mixture centred on the design points of that limit (see
+    design_points), and its own estimate; as the two samples are independent their variances add for the total.
+
+    - Accepts inputs, outputs and settings of the same form as sim_outputs (setting_seed, setting_sampling,
+      setting_correlations and setting_alpha are used)
+    - Accepts lsl and usl as the lower and upper spec limits (either may be None)
+    - Returns a dict of the form {'below_lsl': estimate, 'above_usl': estimate, 'out_of_spec': estimate} with
+      estimates of the form returned by importance_estimate, plus 'design_point' ({input name: value}) and
+      'reliability_index' (distance of the design point from the means in standard deviations) of the most
+      probable design point, 'design_points' (all of them) and 'reliable' (False if a failure region may have
+      been missed, in which case the probability may be underestimated) per limit"""
+
+    mach_defns, dependencies = output_dependencies(outputs, inputs)
+    mach_defns = inline_definitions(mach_defns, dependencies)
+    output_id = next(output_id for output_id, output_spec in outputs.items() if output_spec['output_name'] == output_name)
+    f = compile_definition(mach_defns[output_id], inputs.keys())
+
+    transform = normal_space_transform(inputs, settings)
+    dims = len(inputs)
+    alpha = settings.get('setting_alpha', 0.05)
+
+    def output_at(normal_points):
+        with np.errstate(all='ignore'):
+            return broadcast_output(f(*transform(normal_points)), (normal_points.shape[1],))
+
+    def input_values(normal_point):
+        return {input_spec['input_name']: float(input_data[0])
+                for input_spec, input_data in zip(inputs.values(), transform(normal_point[:, np.newaxis]))}
+
+    estimates = {}
+    for side, (limit, sign) in (('below_lsl', (lsl, 1)), ('above_usl', (usl, -1))):
+        if limit is None:
+            continue
+
+        # failure where g < 0: below the lower limit g = y - lsl, above the upper limit g = usl - y
+        def limit_state(normal_points):
+            return sign * (output_at(normal_points) - limit)
+
+        shifts, reliable = design_points(limit_state, dims)
+        unit_samples = sample_unit(
+            strategy=settings.get('setting_sampling', 'random'),
+            n=n,
+            d=dims,
+            seed=settings.get('setting_seed'),
+            block_index=len(estimates))
+
+        estimate = importance_estimate(limit_state, shifts, unit_samples, alpha)
+        nearest = min(shifts, key=np.linalg.norm)
+        estimate['reliability_index'] = float(np.linalg.norm(nearest))
+        estimate['design_point'] = input_values(nearest)
+        estimate['design_points'] = [input_values(shift) for shift in shifts]
+        estimate['reliable'] = reliable
+        estimates[side] = estimate
+
+    if estimates:
+        probability = sum(estimate['probability'] for estimate in estimates.values())
+        standard_error = float(np.sqrt(sum(estimate['standard_error'] ** 2 for estimate in estimates.values())))
+        estimates['out_of_spec'] = {
+            'probability': probability,
+            'standard_error': standard_error,
+            'lower': max(probability - z_value(alpha) * standard_error, 0.0),
+            'upper': probability + z_value(alpha) * standard_error,
+            'failures': sum(estimate['failures'] for estimate in estimates.values()),
+            'count': sum(estimate['count'] for estimate in estimates.values()),
+            'reliable': all(estimate['reliable'] for estimate in estimates.values())
+        }
+
+    return estimates
+
+
+if __name__ == "__main__":
+    # IMPORTANCE SAMPLING AGAINST PLAIN SAMPLING #
+    # run as a module from the repository root: python -m tolerable_app.importance
+    from .simulate import sim_chunks
+    import time
+
+    inputs = {'inputform_0': {'input_details': {'normal_input_mean': 1.0, 'normal_input_stdev': 0.05}, 'input_name': 'Gland Depth', 'input_type': 'normal'}, 'inputform_1': {'input_details': {'normal_input_mean': 1.0, 'normal_input_stdev': 0.08}, 'input_name': 'Oring Chord', 'input_type': 'normal'}, 'inputform_2': {'input_details': {'triangle_input_min': 0.2, 'triangle_input_mode': 0.25, 'triangle_input_max': 0.3}, 'input_name': 'Tab Height', 'input_type': 'triangle'}}
+    outputs = {'outputform_0': {'output_defn': '1 - (Gland Depth - Tab Height)/(Oring Chord)', 'output_name': 'O-ring Compression', 'output_vis': True}}
+    settings = {'setting_alpha': 0.05, 'setting_seed': 0}
+    lsl, usl = -0.25, 0.6
+
+    for n in (10 ** 4, 10 ** 5):
+        start = time.perf_counter()
+        estimate = tail_probabilities(inputs, outputs, 'O-ring Compression', lsl, usl, settings, n)['out_of_spec']
+        print('importance sampling {:.0e} samples: {:.2f} ppm [{:.2f}, {:.2f}] in {:.3f} s'.format(
+            n, estimate['probability'] * 1e6, estimate['lower'] * 1e6, estimate['upper'] * 1e6, time.perf_counter() - start))
+
+    n = 10 ** 8
+    start = time.perf_counter()
+    count = 0
+    # the samples are streamed and counted exactly, rather than read off the approximate histograms
+    for __, outputs_data in sim_chunks(inputs=inputs, outputs=outputs, settings=dict(settings, setting_n=n), chunk_size=2 ** 20):
+        compression = outputs_data['O-ring Compression']
+        count += int(np.count_nonzero((compression < lsl) | (compression > usl)))
+    probability = count / n
+    half_width = z_value(0.05) * np.sqrt(probability * (1 - probability) / n)
+    print('plain sampling      {:.0e} samples: {:.2f} ppm [{:.2f}, {:.2f}] in {:.3f} s'.format(
+        n, probability * 1e6, (probability - half_width) * 1e6, (probability + half_width) * 1e6, time.perf_counter() - start))
@@ -3,7 +3,9 @@ from wtforms import (
     StringField, FloatField, IntegerField, SelectField, BooleanField,
     HiddenField, FieldList, SubmitField, FormField
 )
-from wtforms.validators import ValidationError, DataRequired, NoneOf
+from wtforms.validators import ValidationError, DataRequired, InputRequired, NoneOf, NumberRange
+from werkzeug.datastructures import MultiDict
+from .distributions import distribution_registry, parse_number_list
 
 class EmptyInputDetailsForm(FlaskForm):
     class Meta:
@@ -48,6 +50,10 @@ class NormInputDetailsForm(FlaskForm):
         }
     )
 
+    def validate_normal_input_stdev(form, field):
+        if field.data is not None and field.data < 0:
+            raise ValidationError('St. Dev. cannot be negative.')
+
 
 class UniformInputDetailsForm(FlaskForm):
     class Meta:
@@ -71,6 +77,275 @@ class UniformInputDetailsForm(FlaskForm):
         }
     )
 
+    def validate_uniform_input_max(form, field):
+        if form.uniform_input_min.data is not None and field.data is not None and field.data < form.uniform_input_min.data:
+            raise ValidationError('Max cannot be less than Min.')
+
+
+class TriangleInputDetailsForm(FlaskForm):
+    class Meta:
+        csrf = False
+
+    triangle_input_min = FloatField(
+        'Min',
+        validators=[InputRequired(message='This field is required.')],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    triangle_input_mode = FloatField(
+        'Mode',
+        validators=[InputRequired(message='This field is required.')],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    triangle_input_max = FloatField(
+        'Max',
+        validators=[InputRequired(message='This field is required.')],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    def validate_triangle_input_mode(form, field):
+        if form.triangle_input_min.data is not None and field.data is not None and field.data < form.triangle_input_min.data:
+            raise ValidationError('Mode cannot be less than Min.')
+
+    def validate_triangle_input_max(form, field):
+        if form.triangle_input_mode.data is not None and field.data is not None and field.data < form.triangle_input_mode.data:
+            raise ValidationError('Max cannot be less than Mode.')
+
+
+class PertInputDetailsForm(FlaskForm):
+    class Meta:
+        csrf = False
+
+    pert_input_min = FloatField(
+        'Min',
+        validators=[InputRequired(message='This field is required.')],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    pert_input_mode = FloatField(
+        'Mode',
+        validators=[InputRequired(message='This field is required.')],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    pert_input_max = FloatField(
+        'Max',
+        validators=[InputRequired(message='This field is required.')],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    def validate_pert_input_mode(form, field):
+        if form.pert_input_min.data is not None and field.data is not None and field.data < form.pert_input_min.data:
+            raise ValidationError('Mode cannot be less than Min.')
+
+    def validate_pert_input_max(form, field):
+        if form.pert_input_mode.data is not None and field.data is not None and field.data < form.pert_input_mode.data:
+            raise ValidationError('Max cannot be less than Mode.')
+        if form.pert_input_min.data is not None and field.data is not None and field.data == form.pert_input_min.data:
+            raise ValidationError('Max must be greater than Min.')
+
+
+class ParetoInputDetailsForm(FlaskForm):
+    class Meta:
+        csrf = False
+
+    pareto_input_scale = FloatField(
+        'Scale (Min)',
+        validators=[InputRequired(message='This field is required.')],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    pareto_input_shape = FloatField(
+        'Shape',
+        validators=[InputRequired(message='This field is required.')],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    def validate_pareto_input_scale(form, field):
+        if field.data is not None and not field.data > 0:
+            raise ValidationError('Scale must be greater than 0.')
+
+    def validate_pareto_input_shape(form, field):
+        if field.data is not None and not field.data > 0:
+            raise ValidationError('Shape must be greater than 0.')
+
+
+class LognormalInputDetailsForm(FlaskForm):
+    class Meta:
+        csrf = False
+
+    lognormal_input_mu = FloatField(
+        'Log Mean',
+        validators=[InputRequired(message='This field is required.')],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    lognormal_input_sigma = FloatField(
+        'Log St. Dev.',
+        validators=[InputRequired(message='This field is required.')],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    def validate_lognormal_input_sigma(form, field):
+        if field.data is not None and field.data < 0:
+            raise ValidationError('Log St. Dev. cannot be negative.')
+
+
+class DiscreteInputDetailsForm(FlaskForm):
+    class Meta:
+        csrf = False
+
+    discrete_input_values = StringField(
+        'Values<br>(comma separated)',
+        validators=[InputRequired(message='This field is required.')],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    discrete_input_weights = StringField(
+        'Weights<br>(comma separated, one per value)',
+        validators=[InputRequired(message='This field is required.')],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    def validate_discrete_input_values(form, field):
+        try:
+            values = parse_number_list(field.data)
+        except ValueError:
+            raise ValidationError('Values must be numbers separated by commas.')
+        if not len(values):
+            raise ValidationError('At least one value is required.')
+
+    def validate_discrete_input_weights(form, field):
+        try:
+            weights = parse_number_list(field.data)
+        except ValueError:
+            raise ValidationError('Weights must be numbers separated by commas.')
+        if any(weights < 0) or not weights.sum() > 0:
+            raise ValidationError('Weights cannot be negative and must not all be 0.')
+        try:
+            values = parse_number_list(form.discrete_input_values.data)
+        except ValueError:
+            return
+        if not len(values) == len(weights):
+            raise ValidationError('One weight is required per value ({} values, {} weights).'.format(len(values), len(weights)))
+
+
+class PoissonInputDetailsForm(FlaskForm):
+    class Meta:
+        csrf = False
+
+    poisson_input_lambda = FloatField(
+        'Rate (Lambda)',
+        validators=[InputRequired(message='This field is required.')],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    def validate_poisson_input_lambda(form, field):
+        if field.data is not None and not field.data > 0:
+            raise ValidationError('Rate must be greater than 0.')
+
+
+class BinomialInputDetailsForm(FlaskForm):
+    class Meta:
+        csrf = False
+
+    binomial_input_trials = IntegerField(
+        'Trials',
+        validators=[
+            InputRequired(message='This field is required.'),
+            NumberRange(min=0, message='Trials cannot be negative.')
+        ],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+    binomial_input_p = FloatField(
+        'Success Probability',
+        validators=[
+            InputRequired(message='This field is required.'),
+            NumberRange(min=0, max=1, message='Probability must be between 0 and 1.')
+        ],
+        render_kw={
+            'onchange': 'this.form.submit()',
+            'onkeypress': 'return event.keyCode != 13;'
+        }
+    )
+
+
+# input detail forms keyed by distribution tag (see distributions.distribution_registry)
+input_detail_forms = {
+    'empty': EmptyInputDetailsForm,
+    'constant': ConstantInputDetailsForm,
+    'normal': NormInputDetailsForm,
+    'uniform': UniformInputDetailsForm,
+    'triangle': TriangleInputDetailsForm,
+    'pert': PertInputDetailsForm,
+    'pareto': ParetoInputDetailsForm,
+    'lognormal': LognormalInputDetailsForm,
+    'discrete': DiscreteInputDetailsForm,
+    'poisson': PoissonInputDetailsForm,
+    'binomial': BinomialInputDetailsForm
+}
+
+
+def register_input_detail_form(input_type, input_detail_form):
+    input_detail_forms[input_type] = input_detail_form
+
+
+def input_details_errors(input_type, input_details):
+    """Validates input details through their input detail form, as if they had been submitted.
+
+    - Returns a list of error messages, empty when the details are valid"""
+
+    # whole numbers are written without a decimal point so integer fields accept them
+    formdata = MultiDict((key, str(int(value)) if isinstance(value, float) and value.is_integer() else str(value))
+                         for key, value in input_details.items())
+    form = input_detail_forms[input_type](formdata=formdata)
+    form.validate()
+    return [error for errors in form.errors.values() for error in errors]
+
 
 def input_form_factory(input_type='empty', removable=False, csrf=True, none_of=tuple()):
     class InputForm(FlaskForm):
@@ -79,29 +354,21 @@ def input_form_factory(input_type='empty', removable=False, csrf=True, none_of=t
                 csrf = False
 
         # setup input type choices for drop down list
+        # (registered distributions with a matching input detail form)
         input_type_tags = (
             'empty',
-            'constant',
-            'normal',
-            'uniform'
+            *(tag for tag in distribution_registry if tag in input_detail_forms)
         )
 
         input_type_labels = (
             '',
-            'Constant',
-            'Normal',
-            'Uniform'
+            *(distribution_registry[tag].label for tag in input_type_tags[1:])
         )
 
         input_type_choices = tuple(zip(input_type_tags, input_type_labels))
 
         # setup form choices and labels for input details
-        input_detail_field_forms = (
-            EmptyInputDetailsForm,
-            ConstantInputDetailsForm,
-            NormInputDetailsForm,
-            UniformInputDetailsForm
-            )
+        input_detail_field_forms = tuple(input_detail_forms[tag] for tag in input_type_tags)
 
         input_detail_field_form_labels = tuple(
         '{} Input Details Form'.format(input_type_label) \
@@ -0,0 +1,210 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import uuid
+
+
+# JOB ERRORS #
+class JobRejected(RuntimeError):
+    """Raised when a job cannot be accepted (the caller should try again later)."""
+
+
+class QueueFull(JobRejected):
+    """Raised when the queue already holds as many waiting jobs as it allows."""
+
+
+class JobLimitReached(JobRejected):
+    """Raised when a user already has as many unfinished jobs as they are allowed."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once it has been asked to stop."""
+
+
+# JOBS #
+class Job:
+    """Simulation job tracked by a JobQueue.
+
+    A job moves from 'queued' to 'running' to one of 'finished', 'failed' or 'cancelled'.
+    Running jobs stop cooperatively: the job function reports progress with job.report,
+    which raises JobCancelled once cancellation has been requested. Each report bumps
+    job.version, so listeners can block on job.wait until there is something new."""
+
+    def __init__(self, owner, key=None, total=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.key = key
+        self.status = 'queued'
+        self.iterations = 0
+        self.total = total
+        self.partial = None
+        self.result = None
+        self.error = None
+        self.stopped_early = False
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.future = None
+        self.version = 0
+        self._cancel = threading.Event()
+        self._keep_partial = False
+        self._updated = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in ('finished', 'failed', 'cancelled')
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def report(self, iterations, partial=None):
+        """Records progress (and optionally the partial result so far), then raises JobCancelled if asked to stop."""
+
+        with self._updated:
+            self.iterations = iterations
+            if partial is not None:
+                self.partial = partial
+            self.version += 1
+            self._updated.notify_all()
+
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def set_status(self, status):
+        with self._updated:
+            self.status = status
+            if self.done:
+                self.finished = time.time()
+            self.version += 1
+            self._updated.notify_all()
+
+    def wait(self, version, timeout=None):
+        """Blocks until the job has changed since version (or finished) and returns its current version."""
+
+        with self._updated:
+            self._updated.wait_for(lambda: self.version != version or self.done, timeout)
+            return self.version
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'iterations': self.iterations,
+            'total': self.total,
+            'error': self.error,
+            'stopped_early': self.stopped_early,
+            'submitted': self.submitted,
+            'started': self.started,
+            'finished': self.finished
+        }
+
+
+class JobQueue:
+    """Runs jobs on a local pool of worker threads.
+
+    - Accepts max_queued as the number of jobs allowed to wait for a worker (further submissions
+      raise QueueFull) and max_per_user as the number of unfinished jobs a single owner may have
+      (further submissions raise JobLimitReached)
+    - Accepts history as the number of jobs (finished or not) remembered for status and results"""
+
+    def __init__(self, workers=2, max_queued=16, max_per_user=2, history=256):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_per_user = max_per_user
+        self.history = history
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tolerable-job')
+
+    def submit(self, owner, func, *args, key=None, total=None, **kwargs):
+        """Queues func(job, *args, **kwargs) and returns its Job; the return value of func becomes job.result."""
+
+        with self._lock:
+            unfinished = [job for job in self._jobs.values() if not job.done]
+            if sum(job.status == 'queued' for job in unfinished) >= self.max_queued:
+                raise QueueFull('The simulation queue is full, please try again shortly.')
+            if sum(job.owner == owner for job in unfinished) >= self.max_per_user:
+                raise JobLimitReached('You already have {} simulations running, please wait for one to finish.'.format(self.max_per_user))
+
+            job = Job(owner, key=key, total=total)
+            self._jobs[job.id] = job
+            self._trim()
+
+        job.future = self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        if job.cancel_requested:
+            job.set_status('cancelled')
+            return
+
+        job.started = time.time()
+        job.set_status('running')
+        try:
+            job.result = func(job, *args, **kwargs)
+            job.set_status('finished')
+        except JobCancelled:
+            if job._keep_partial and job.partial is not None:
+                # stopped early on purpose, so what has been simulated so far is the result
+                job.result = job.partial
+                job.stopped_early = job.iterations < job.total
+                job.set_status('finished')
+            else:
+                job.set_status('cancelled')
+        except Exception as error:
+            job.error = str(error) or type(error).__name__
+            job.set_status('failed')
+
+    def _trim(self):
+        # forget the oldest finished jobs first; unfinished jobs are never dropped
+        excess = len(self._jobs) - self.history
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done][:max(excess, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id, owner=None):
+        """Returns the job with job_id, or None if it is unknown (or belongs to a different owner)."""
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+    def cancel(self, job_id, owner=None, keep_partial=False):
+        """Asks a job to stop; with keep_partial a running job finishes with the partial result it has reported."""
+
+        job = self.get(job_id, owner)
+        if job is None or job.done:
+            return job
+
+        job._keep_partial = keep_partial
+        job._cancel.set()
+        if job.future is not None and job.future.cancel():
+            # never started, so it will not get the chance to mark itself cancelled
+            job.set_status('cancelled')
+        return job
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            for job in self._jobs.values():
+                job._cancel.set()
+        self._executor.shutdown(wait=wait)
+
+
+# CONFIGURED QUEUE #
+job_queue = None
+
+
+def configure_job_queue(workers=2, max_queued=16, max_per_user=2, history=256):
+    global job_queue
+
+    if job_queue is not None:
+        job_queue.shutdown(wait=False)
+    job_queue = JobQueue(workers=workers, max_queued=max_queued, max_per_user=max_per_user, history=history)
+    return job_queue
+
+
+def get_job_queue():
+    return job_queue
@@ -0,0 +1,230 @@
+from .symbolic import evaluate, reserved_dict
+from collections import OrderedDict
+from hashlib import sha256
+from sympy import Symbol, cse, numbered_symbols
+from sympy.printing.lambdarepr import NumPyPrinter
+from sympy.utilities.lambdify import lambdastr
+import functools
+import math
+import numpy as np
+import os
+import re
+import threading
+
+
+# COMPILED EXPRESSION CACHE #
+kernel_namespace = {'numpy': np, 'functools': functools, 'math': math}
+
+# bump when the generated source changes so stale kernels on disk are never loaded
+kernel_format = 2
+
+# elements per block when evaluating fused kernels (keeps intermediates in cache)
+fused_block_size = 2 ** 14
+
+
+def normalize_definition(mach_defn):
+    """Collapses insignificant whitespace in a machine readable definition so that
+    cosmetic edits to a definition do not produce a new kernel."""
+
+    return re.sub(r'\s+', ' ', mach_defn).strip()
+
+
+def kernel_key(mach_defns, arg_ids):
+    """Returns the cache key for one or more machine readable definitions evaluated over the ordered arg ids."""
+
+    if isinstance(mach_defns, str):
+        mach_defns = normalize_definition(mach_defns)
+    else:
+        mach_defns = tuple(normalize_definition(mach_defn) for mach_defn in mach_defns)
+
+    return sha256(repr((kernel_format, mach_defns, tuple(arg_ids))).encode('utf8')).hexdigest()
+
+
+def parse_kernel_exprs(mach_defns, arg_ids):
+    symbols = {arg_id: Symbol(arg_id) for arg_id in arg_ids}
+    exprs = [evaluate(mach_defn, local_dict={**reserved_dict, **symbols}) for mach_defn in mach_defns]
+    return tuple(symbols.values()), exprs
+
+
+def generate_kernel_source(mach_defn, arg_ids):
+    """Parses a machine readable definition and prints it as the source of a NumPy lambda
+    taking the arg ids (in order) as positional arguments."""
+
+    symbols, (expr,) = parse_kernel_exprs((normalize_definition(mach_defn),), arg_ids)
+
+    return 'kernel = {}'.format(lambdastr(symbols, expr, printer=NumPyPrinter))
+
+
+def generate_fused_source(mach_defns, arg_ids):
+    """Parses several machine readable definitions and prints them as a single NumPy function
+    returning a tuple with one result per definition.
+
+    Sub-terms shared between definitions are found with common subexpression elimination
+    and only computed once."""
+
+    symbols, exprs = parse_kernel_exprs(tuple(normalize_definition(mach_defn) for mach_defn in mach_defns), arg_ids)
+    replacements, reduced_exprs = cse(exprs, symbols=numbered_symbols('_cse'))
+
+    printer = NumPyPrinter()
+
+    lines = ['def kernel({}):'.format(', '.join(str(symbol) for symbol in symbols))]
+    for replacement_symbol, replacement_expr in replacements:
+        lines.append('    {} = {}'.format(replacement_symbol, printer.doprint(replacement_expr)))
+    lines.append('    return ({},)'.format(', '.join(printer.doprint(reduced_expr) for reduced_expr in reduced_exprs)))
+
+    return '\n'.join(lines) + '\n'
+
+
+def load_kernel_source(kernel_source):
+    namespace = dict(kernel_namespace)
+    exec(compile(kernel_source, '<kernel>', 'exec'), namespace)
+    return namespace['kernel']
+
+
+class KernelCache:
+    """LRU cache of compiled output definitions.
+
+    Kernels are kept in memory per process and, if a cache directory is configured,
+    their generated source is also written to disk so that other worker processes
+    can skip parsing and printing the definition."""
+
+    def __init__(self, maxsize=256, cache_dir=None):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._kernels = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, maxsize=None, cache_dir=None):
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if cache_dir is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                self.cache_dir = cache_dir
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._kernels.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def info(self):
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'size': len(self._kernels),
+            'maxsize': self.maxsize
+        }
+
+    def get(self, mach_defn, arg_ids, generate_source=generate_kernel_source):
+        key = kernel_key(mach_defn, arg_ids)
+
+        with self._lock:
+            kernel = self._kernels.get(key)
+            if kernel is not None:
+                self._kernels.move_to_end(key)
+                self.hits += 1
+                return kernel
+
+        kernel_source = self._read(key)
+        if kernel_source is not None:
+            self.disk_hits += 1
+        else:
+            kernel_source = generate_source(mach_defn, arg_ids)
+            self._write(key, kernel_source)
+            self.misses += 1
+
+        kernel = load_kernel_source(kernel_source)
+
+        with self._lock:
+            self._kernels[key] = kernel
+            self._evict()
+
+        return kernel
+
+    def _evict(self):
+        while len(self._kernels) > self.maxsize:
+            self._kernels.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, '{}.py'.format(key))
+
+    def _read(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), 'r') as kernel_file:
+                return kernel_file.read()
+        except OSError:
+            return None
+
+    def _write(self, key, kernel_source):
+        if not self.cache_dir:
+            return
+        # write to a temporary file first so concurrent workers never read a partial kernel
+        tmp_path = '{}.{}.tmp'.format(self._path(key), os.getpid())
+        try:
+            with open(tmp_path, 'w') as kernel_file:
+                kernel_file.write(kernel_source)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            pass
+
+
+kernel_cache = KernelCache()
+
+
+def configure_kernel_cache(maxsize=None, cache_dir=None):
+    kernel_cache.configure(maxsize=maxsize, cache_dir=cache_dir)
+
+
+def compile_definition(mach_defn, arg_ids):
+    """Returns a vectorized function evaluating the machine readable definition.
+
+    - Accepts arg_ids as the ordered input ids the returned function takes as positional arguments"""
+
+    return kernel_cache.get(mach_defn, tuple(arg_ids))
+
+
+def compile_fused(mach_defns, arg_ids):
+    """Returns a single function evaluating all machine readable definitions at once.
+
+    - Accepts mach_defns as an ordered sequence of definitions
+    - The returned function takes the arg ids as positional arguments and returns a tuple
+      with one result per definition"""
+
+    return kernel_cache.get(tuple(mach_defns), tuple(arg_ids), generate_source=generate_fused_source)
+
+
+def evaluate_blocked(kernel, args, n_results, shape, block_size=None):
+    """Evaluates a fused kernel block by block into preallocated result arrays.
+
+    The result arrays are allocated once, up front, and each block is written into its slice. The
+    block's own intermediates (and the block results before they are copied) are still temporaries of
+    the printed NumPy expressions; they are only block_size long, so they stay in cache.
+
+    - Returns a list of n_results arrays of the given shape (constant results are broadcast)"""
+
+    block_size = block_size or fused_block_size
+    results = [np.empty(shape) for __ in range(n_results)]
+
+    for start in range(0, shape[0], block_size):
+        stop = start + block_size
+        block_results = kernel(*(arg[start:stop] for arg in args))
+        for result, block_result in zip(results, block_results):
+            result[start:stop] = block_result
+
+    return results
+
+
+def broadcast_output(output_data, shape):
+    """Ensures definitions which do not depend on any input (e.g. '2 * pi') still produce an array."""
+
+    output_data = np.asarray(output_data, dtype=float)
+    if output_data.shape != shape:
+        output_data = np.full(shape, output_data)
+    return output_data
@@ -5,6 +5,7 @@ from wtforms import (
 )
 from wtforms.validators import ValidationError, DataRequired, NoneOf
 from .symbolic import find_bad_names, get_valid_names, parse_definition, evaluate
+from .graph import output_dependencies, find_cycle
 
 
 def use_valid_names(defined_names=tuple()):
@@ -131,6 +132,23 @@ def output_list_form_factory(output_forms, defined_names=tuple(), fill=False):
             self.remove_output_form_id(output_form_id)
             delattr(self, output_form_id)
 
+        def validate(self, *args, **kwargs):
+            valid = super().validate(*args, **kwargs)
+
+            # outputs may refer to other outputs, but not in a circle
+            outputs = {output_form_id: getattr(self, output_form_id).data for output_form_id in self.get_output_form_ids()}
+            __, dependencies = output_dependencies(outputs)
+            cycle = find_cycle(dependencies)
+
+            if cycle:
+                message = 'Circular reference between outputs: {}.'.format(
+                    ' -> '.join(outputs[output_form_id]['output_name'] for output_form_id in cycle))
+                for output_form_id in set(cycle):
+                    getattr(self, output_form_id).output_defn.errors.append(message)
+                valid = False
+
+            return valid
+
     removable = len(output_forms) > 1
 
     output_names = tuple(output_form_data['output_name'] for output_form_data in output_forms.values())
@@ -0,0 +1,121 @@
+from .kernels import kernel_cache, configure_kernel_cache
+from .simulate import DEFAULT_CHUNK_SIZE, count_blocks, block_size, sim_chunks, run_controls, fold_chunk
+from .summary import merge_summaries
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
+import os
+import threading
+
+
+# PROCESS POOL #
+_executor = None
+_executor_workers = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(workers=None):
+    """Returns the shared process pool, (re)creating it if the requested worker count changed.
+
+    Workers are spawned rather than forked so they do not inherit the locks of a threaded
+    WSGI server, and they share the on-disk kernel cache of the parent process."""
+
+    global _executor, _executor_workers
+
+    workers = workers or os.cpu_count() or 1
+
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=configure_kernel_cache,
+                initargs=(kernel_cache.maxsize, kernel_cache.cache_dir))
+            _executor_workers = workers
+
+    return _executor
+
+
+def shutdown_executor():
+    global _executor, _executor_workers
+
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = None
+        _executor_workers = None
+
+
+# SHARDED SIMULATION #
+def sim_blocks(inputs=None, outputs=None, settings=None, block_indices=tuple(), chunk_size=DEFAULT_CHUNK_SIZE):
+    """Simulates a shard of blocks and summarizes each block on its own.
+
+    - Returns a list of the form [(block index, {input name: SimSummary}, {output name: SimSummary}), ...]"""
+
+    blocks_summaries = []
+    controls = run_controls(inputs, outputs, settings)
+
+    chunks = sim_chunks(inputs=inputs, outputs=outputs, settings=settings, chunk_size=chunk_size, block_indices=block_indices)
+    for block_index, (inputs_data, outputs_data) in zip(block_indices, chunks):
+        blocks_summaries.append((block_index, *fold_chunk(inputs_data, outputs_data, settings, controls)))
+
+    return blocks_summaries
+
+
+def shard_blocks(n_blocks, workers, shards_per_worker=4):
+    """Splits block indices into contiguous shards, a few per worker so uneven shards balance out."""
+
+    n_shards = max(1, min(n_blocks, workers * shards_per_worker))
+    return [tuple(shard) for shard in np.array_split(np.arange(n_blocks), n_shards) if len(shard)]
+
+
+def sim_parallel(inputs=None, outputs=None, settings=None, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None, stop=None):
+    """Simulates inputs and outputs across a process pool and merges the summaries of each shard.
+
+    - Accepts inputs, outputs, settings, progress and stop of the same form as sim_stream (progress
+      and stop are called after every shard)
+    - Returns summaries of the form ({input name: SimSummary}, {output name: SimSummary})
+
+    *Each block of chunk_size iterations draws from its own stream spawned from setting_seed and
+    block summaries are merged in block order, so a given seed and chunk_size give the same
+    result for any number of workers.*"""
+
+    if not settings:
+        settings = {'setting_alpha': 0.05, 'setting_n': 100}
+
+    if settings.get('setting_seed') is None:
+        settings = dict(settings, setting_seed=np.random.SeedSequence().entropy)
+
+    shards = shard_blocks(count_blocks(settings['setting_n'], chunk_size), workers or os.cpu_count() or 1)
+
+    executor = get_executor(workers)
+    futures = [
+        executor.submit(sim_blocks, inputs, outputs, settings, [int(block_index) for block_index in shard], chunk_size)
+        for shard in shards
+    ]
+
+    inputs_summaries = {}
+    outputs_summaries = {}
+
+    iterations = 0
+
+    try:
+        # shards are contiguous and submitted in order, so merging in submission order keeps block order
+        for future in futures:
+            for block_index, block_inputs_summaries, block_outputs_summaries in future.result():
+                merge_summaries(inputs_summaries, block_inputs_summaries)
+                merge_summaries(outputs_summaries, block_outputs_summaries)
+                iterations += block_size(settings['setting_n'], block_index, chunk_size)
+
+            if progress:
+                progress(iterations, inputs_summaries, outputs_summaries)
+            if stop and stop(iterations, inputs_summaries, outputs_summaries):
+                break
+    finally:
+        # drop the shards that have not started yet (if the run was stopped or failed)
+        for future in futures:
+            future.cancel()
+
+    return inputs_summaries, outputs_summaries
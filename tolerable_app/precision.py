@@ -0,0 +1,166 @@
+from scipy.special import ndtri
+import numpy as np
+import re
+
+
+# SPEC LIMITS #
+class SpecLimitError(ValueError):
+    """Raised when spec limits cannot be parsed."""
+
+
+def parse_spec_limits(text):
+    """Parses spec limits written one output per line (or separated by semicolons) as 'Name, lower, upper',
+    where either limit may be left blank, e.g. 'O-ring Compression, 0.1, 0.4' or 'Stack Height, , 5.2'.
+
+    - Returns a dict of the form {output name: (lsl or None, usl or None)}"""
+
+    spec_limits = {}
+    for entry in re.split(r'[;\n]+', text or ''):
+        if not entry.strip():
+            continue
+        parts = [part.strip() for part in entry.split(',')]
+        if len(parts) != 3 or not parts[0] or not (parts[1] or parts[2]):
+            raise SpecLimitError("'{}' is not of the form 'Name, lower limit, upper limit'.".format(entry.strip()))
+        try:
+            lsl, usl = (float(part) if part else None for part in parts[1:])
+        except ValueError:
+            raise SpecLimitError("The limits of '{}' are not numbers.".format(parts[0]))
+        if lsl is not None and usl is not None and not lsl < usl:
+            raise SpecLimitError("The lower limit of '{}' must be below its upper limit.".format(parts[0]))
+        if parts[0] in spec_limits:
+            raise SpecLimitError("'{}' has limits more than once.".format(parts[0]))
+        spec_limits[parts[0]] = (lsl, usl)
+
+    return spec_limits
+
+
+# CONFIDENCE INTERVALS #
+def z_value(alpha):
+    """Returns the two sided standard normal critical value at alpha (1.96 for alpha = 0.05)."""
+
+    return float(ndtri(1 - alpha / 2))
+
+
+def tolerance_percentiles(alpha):
+    """Returns the percentiles bounding the central 1 - alpha of a variable, e.g. (2.5, 97.5) for alpha = 0.05."""
+
+    return 100 * alpha / 2, 100 * (1 - alpha / 2)
+
+
+def mean_interval(sim_summary, alpha):
+    # antithetic and control variate runs carry a variance reduced estimate of the mean
+    reduction = sim_summary.reduction
+    if reduction is not None and reduction.count > 2:
+        estimate, standard_error = reduction.estimate, reduction.standard_error
+    else:
+        stats = sim_summary.stats
+        estimate, standard_error = stats.mean, stats.stdev / np.sqrt(stats.count)
+
+    half_width = z_value(alpha) * standard_error
+    return {'estimate': estimate, 'lower': estimate - half_width, 'upper': estimate + half_width}
+
+
+def percentile_interval(sim_summary, percentile, alpha):
+    """Distribution-free interval for a percentile: the binomial interval on its rank mapped through the quantile sketch."""
+
+    p = percentile / 100
+    rank_half_width = z_value(alpha) * np.sqrt(p * (1 - p) / sim_summary.stats.count)
+    return {
+        'estimate': sim_summary.quantile(p),
+        'lower': sim_summary.quantile(max(p - rank_half_width, 0.0)),
+        'upper': sim_summary.quantile(min(p + rank_half_width, 1.0))
+    }
+
+
+def fraction_interval(sim_summary, lsl, usl, alpha):
+    """Wilson score interval for the fraction of a variable outside its spec limits (either may be None).
+
+    Unlike the normal approximation it stays inside [0, 1] and keeps a nonzero upper end when no sample
+    has fallen outside yet. Its precision is the half width relative to the fraction itself (infinite
+    while the fraction is zero), as an absolute half width says little about a fraction of a few ppm."""
+
+    count = sim_summary.stats.count
+    fraction = (sim_summary.fraction_below(lsl) if lsl is not None else 0.0) + \
+               (1 - sim_summary.fraction_below(usl) if usl is not None else 0.0)
+    fraction = min(max(float(fraction), 0.0), 1.0)
+
+    z = z_value(alpha)
+    denominator = 1 + z ** 2 / count
+    centre = (fraction + z ** 2 / (2 * count)) / denominator
+    half_width = z / denominator * np.sqrt(fraction * (1 - fraction) / count + z ** 2 / (4 * count ** 2))
+
+    return {
+        'estimate': fraction,
+        'lower': max(centre - half_width, 0.0),
+        'upper': min(centre + half_width, 1.0),
+        'precision': half_width / fraction if fraction > 0 else np.inf
+    }
+
+
+def summary_intervals(sim_summary, alpha, spec_limits=None):
+    """Returns {statistic: {'estimate': ..., 'lower': ..., 'upper': ..., 'precision': ...}} for the mean and the
+    tolerance_percentiles of one SimSummary at confidence level 1 - alpha, and for the fraction outside spec
+    limits ('out_of_spec', see fraction_interval) if spec_limits of the form (lsl, usl) are given.
+
+    Precision is the interval's half width relative to the variable's standard deviation, so a single
+    target applies to every variable whatever its units (constant variables are exactly known)."""
+
+    if not sim_summary.stats.count:
+        # every sample was undefined, so there is nothing to estimate
+        return {}
+
+    intervals = {'mean': mean_interval(sim_summary, alpha)}
+    for percentile in tolerance_percentiles(alpha):
+        intervals['p{:g}'.format(percentile)] = percentile_interval(sim_summary, percentile, alpha)
+
+    stdev = sim_summary.stats.stdev
+    for interval in intervals.values():
+        half_width = (interval['upper'] - interval['lower']) / 2
+        interval['precision'] = half_width / stdev if stdev > 0 else 0.0
+
+    if spec_limits is not None:
+        intervals['out_of_spec'] = fraction_interval(sim_summary, *spec_limits, alpha)
+
+    return intervals
+
+
+def sims_intervals(sims_summaries, alpha, spec_limits=None):
+    """Returns {name: summary_intervals} for summaries of the form {name: SimSummary}.
+
+    - Accepts spec_limits of the form returned by parse_spec_limits"""
+
+    spec_limits = spec_limits or {}
+    return {sim_name: summary_intervals(sim_summary, alpha, spec_limits.get(sim_name))
+            for sim_name, sim_summary in sims_summaries.items()}
+
+
+# ADAPTIVE STOPPING #
+def precise_enough(sims_summaries, alpha, precision, spec_limits=None):
+    """True once every statistic of every summary, including the fraction outside any spec_limits, is known
+    to the target precision at confidence 1 - alpha."""
+
+    return all(
+        interval['precision'] <= precision
+        for intervals in sims_intervals(sims_summaries, alpha, spec_limits).values()
+        for interval in intervals.values()
+    )
+
+
+def adaptive_stop(settings, min_iterations=1000):
+    """Returns a stop function (for sim_stream and sim_parallel) that ends a run once the outputs, or the
+    inputs if there are no outputs, are precise enough.
+
+    - Accepts settings of the form {'setting_alpha': ..., 'setting_precision': ..., 'setting_spec_limits': ..., ...}
+      where the fraction outside the spec limits must also reach the target precision (relative to itself)
+    - Accepts min_iterations as the number of iterations run before the normal approximations are trusted"""
+
+    alpha = settings['setting_alpha']
+    precision = settings['setting_precision']
+    spec_limits = parse_spec_limits(settings.get('setting_spec_limits'))
+
+    def stop(iterations, inputs_summaries, outputs_summaries):
+        if iterations < min_iterations:
+            return False
+        return precise_enough(outputs_summaries or inputs_summaries, alpha, precision, spec_limits)
+
+    return stop
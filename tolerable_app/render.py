@@ -0,0 +1,54 @@
+from .summary import fold_sims_data
+from base64 import b64encode
+import json
+import numpy as np
+
+
+# HISTOGRAM JSON #
+def encode_typed_array(array):
+    """Encodes an array as base64 little-endian bytes that the browser can view as a JS typed array.
+
+    - Returns a dict of the form {'dtype': 'uint32' or 'float64', 'data': base64 string}"""
+
+    array = np.asarray(array)
+    if np.issubdtype(array.dtype, np.integer) and (not array.size or array.max() < 2 ** 32):
+        dtype = 'uint32'
+    else:
+        dtype = 'float64'
+
+    return {
+        'dtype': dtype,
+        'data': b64encode(array.astype('<u4' if dtype == 'uint32' else '<f8').tobytes()).decode('ascii')
+    }
+
+
+def sims_histograms(sims_summaries=None):
+    """Converts summaries of the form {name: SimSummary} into histograms for client-side plotting.
+
+    - Returns a list of the form [{'name': ..., 'start': ..., 'width': ..., 'total': ..., 'constant': ..., 'counts': {...}, 'stats': {...}}]"""
+
+    histograms = []
+    for sim_name, sim_summary in sims_summaries.items():
+        if not sim_summary.stats.count:
+            # nothing but undefined values, so there is nothing to plot
+            continue
+        histogram = sim_summary.histogram
+        histograms.append({
+            'name': sim_name,
+            'start': float(histogram.edges[0]) if not sim_summary.is_constant else sim_summary.stats.min - histogram.bin_width / 2,
+            'width': float(histogram.bin_width),
+            'total': int(sim_summary.stats.count),
+            'constant': bool(sim_summary.is_constant),
+            'counts': encode_typed_array(histogram.counts),
+            'stats': sim_summary.stats.to_dict()
+        })
+    return histograms
+
+
+def sims_histograms_json(sims_data=None, sims_summaries=None):
+    """Returns the JSON histograms of either simulated data {name: array-like data} or summaries {name: SimSummary}."""
+
+    if sims_summaries is None:
+        sims_summaries = fold_sims_data({}, sims_data or {})
+    # escaped so the JSON can be embedded in a <script> block as is
+    return json.dumps(sims_histograms(sims_summaries)).replace('<', '\\u003c')
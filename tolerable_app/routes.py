@@ -1,7 +1,7 @@
 import copy
-from .forms import SettingsForm
+from .forms import SettingsForm, SweepForm, DesignForm, CompareForm, current_design
 from flask import current_app as app
-from flask import render_template, request, url_for, session, redirect, send_file
+from flask import render_template, request, url_for, session, redirect, send_file, abort, flash, jsonify, Response
 from .input_forms import input_list_form_factory
 from .output_forms import output_list_form_factory
 from .util import (
@@ -14,10 +14,28 @@ from .util import (
     capture_output_list_form_items,
     update_session_outputs,
     capture_settings,
-    fig_to_base64
+    generate_seed
 )
-from .simulate import sim_inputs, sim_outputs, plot_sim_data
-import matplotlib.pyplot as plt
+from .simulate import sim_inputs, sim_outputs, sim_stream, sim_sweep, sim_sobol, sim_compare
+from .render import sims_histograms, sims_histograms_json
+from .images import plot_key, image_mimetypes, remember_plot, get_image
+from .summary import copy_summaries
+from .precision import adaptive_stop, sims_intervals, parse_spec_limits
+from .analytic import analytic_outputs
+from .correlation import parse_correlations, input_correlations, CorrelationError
+from .worst_case import worst_case_outputs
+from .scenarios import parse_sweep, sweep_scenarios, sweep_table
+from .sensitivity import sobol_table, rank_correlations
+from .importance import tail_probabilities
+from .variance_reduction import reduction_report
+from .comparison import comparison_table
+from .sample_index import build_sample_indexes, get_sample_index, query_index
+from .jobs import get_job_queue, JobRejected, QueueFull
+from .parallel import sim_parallel
+from .store import get_sample_store, sample_key
+from uuid import uuid4
+import json
+import time
 
 
 # TODO / NOTES #
@@ -138,12 +156,17 @@ def output():
 
         print(output_list_form.data)
     
-    return render_template('output.html', form=output_list_form, inputs=session['input_forms'])
+    # instant moment estimates of the outputs defined so far, recomputed on every edit
+    estimates = analytic_preview(session.get('inputs'), session['output_forms'])
+    worst_cases = worst_case_preview(session.get('inputs'), session['output_forms'])
+
+    return render_template('output.html', form=output_list_form, inputs=session['input_forms'],
+                           analytic=estimates, worst_case=worst_cases)
 
 
 @app.route('/settings', methods=['POST', 'GET'])
 def settings():
-    settings_form = SettingsForm()
+    settings_form = SettingsForm(data=session.get('settings'))
 
     if settings_form.validate_on_submit():
         session['settings'] = capture_settings(settings_form)
@@ -152,9 +175,560 @@ def settings():
     return render_template('settings.html', form=settings_form)
 
 
-@app.route('/simulate')
+def simulate_result(inputs, outputs, settings, progress=None, samples=None):
+    """Simulates the model and returns ({input name: SimSummary}, {output name: SimSummary}).
+
+    - Accepts progress of the same form as sim_stream
+    - Accepts samples as a dict that is filled with {name: array-like data} when the run is small enough
+      to hold every sample in memory (it is left empty for streamed and parallel runs)"""
+
+    parallel = settings.get('setting_parallel') and settings['setting_n'] > app.config['SIM_CHUNK_SIZE']
+
+    # adaptive runs check their precision between batches, so they are always simulated in chunks
+    stop = adaptive_stop(settings, app.config['ADAPTIVE_MIN_ITERATIONS']) if settings.get('setting_adaptive') else None
+
+    if parallel:
+        return sim_parallel(
+            inputs=inputs, outputs=outputs, settings=settings,
+            workers=app.config['SIM_WORKERS'], chunk_size=app.config['SIM_CHUNK_SIZE'], progress=progress, stop=stop)
+
+    if stop:
+        return sim_stream(
+            inputs=inputs, outputs=outputs, settings=settings, chunk_size=app.config['ADAPTIVE_CHUNK_SIZE'],
+            store=get_sample_store(), progress=progress, stop=stop)
+
+    # runs are simulated in chunks, so progress is reported (and a cancel or stop takes effect) between them;
+    # only small runs keep their samples, large ones are folded into running summaries to bound memory
+    keep_samples = samples is not None and settings['setting_n'] <= app.config['SIM_STREAM_THRESHOLD']
+    return sim_stream(
+        inputs=inputs, outputs=outputs, settings=settings, chunk_size=app.config['SIM_CHUNK_SIZE'],
+        store=get_sample_store(), progress=progress, samples=samples if keep_samples else None)
+
+
+# SIMULATION JOBS #
+def session_owner():
+    # anonymous id of the browser session, used to apply the per user job limit
+    if not session.get('owner_id'):
+        session['owner_id'] = uuid4().hex
+    return session['owner_id']
+
+
+def result_key(inputs, outputs, settings):
+    return sample_key(kind='result', inputs=inputs, outputs=outputs, settings=settings)
+
+
+def simulation_job(job, flask_app, inputs, outputs, settings):
+    # runs on a job queue worker thread, outside of any request
+    def progress(iterations, inputs_summaries, outputs_summaries):
+        # the running summaries keep changing, so listeners are handed a copy
+        job.report(iterations, (copy_summaries(inputs_summaries), copy_summaries(outputs_summaries)))
+
+    with flask_app.app_context():
+        samples = {}
+        sims_summaries = simulate_result(inputs, outputs, settings, progress=progress, samples=samples)
+        # sorted once here so report queries never sort or scan the samples again
+        build_sample_indexes(job.key, samples)
+        return sims_summaries
+
+
+def session_job(inputs=None, outputs=None, settings=None):
+    """Returns the session's latest job if it simulates the given model (or any model if none is given)."""
+
+    job = get_job_queue().get(session.get('job_id'), session_owner())
+    if job is not None and inputs is not None and job.key != result_key(inputs, outputs, settings):
+        return None
+    return job
+
+
+def submit_simulation(inputs, outputs, settings):
+    """Queues a simulation of the model for the session (raises JobRejected if the queue refuses it)."""
+
+    job = get_job_queue().submit(
+        session_owner(), simulation_job, app._get_current_object(), inputs, outputs, settings,
+        key=result_key(inputs, outputs, settings), total=settings['setting_n'])
+    session['job_id'] = job.id
+    return job
+
+
+def job_rejected_status(error):
+    # a full queue clears by itself, while a user at their limit has to wait for their own jobs
+    return 503 if isinstance(error, QueueFull) else 429
+
+
+def job_rejected_response(error):
+    response = jsonify({'error': str(error)})
+    response.status_code = job_rejected_status(error)
+    response.headers['Retry-After'] = '5'
+    return response
+
+
+def wants_json():
+    return request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html
+
+
+@app.route('/simulate', methods=['POST'])
 def simulate():
-    pass
+    inputs = session.get('inputs')
+    outputs = session.get('outputs')
+    settings = session.get('settings')
+
+    if not (inputs and settings):
+        abort(400)
+
+    job = session_job(inputs, outputs, settings)
+    if job is None or job.status in ('failed', 'cancelled') or job.stopped_early:
+        # a run stopped early is shown until the model changes, but asking to simulate again runs it in full
+        try:
+            job = submit_simulation(inputs, outputs, settings)
+        except JobRejected as error:
+            if wants_json():
+                return job_rejected_response(error)
+            flash(str(error))
+            return redirect(url_for('result'))
+
+    if wants_json():
+        response = jsonify(job.to_dict())
+        response.status_code = 202
+        response.headers['Location'] = url_for('simulation_status', job_id=job.id)
+        return response
+
+    return redirect(url_for('result'))
+
+
+@app.route('/simulate/<job_id>')
+def simulation_status(job_id):
+    job = get_job_queue().get(job_id, session_owner())
+    if job is None:
+        abort(404)
+    return jsonify(job.to_dict())
+
+
+@app.route('/simulate/<job_id>/cancel', methods=['POST'])
+def simulation_cancel(job_id):
+    job = get_job_queue().cancel(job_id, session_owner())
+    if job is None:
+        abort(404)
+    if wants_json():
+        return jsonify(job.to_dict())
+    return redirect(url_for('result'))
+
+
+@app.route('/simulate/<job_id>/stop', methods=['POST'])
+def simulation_stop(job_id):
+    # unlike cancelling, stopping keeps what has been simulated so far as the result
+    job = get_job_queue().cancel(job_id, session_owner(), keep_partial=True)
+    if job is None:
+        abort(404)
+    if wants_json():
+        return jsonify(job.to_dict())
+    return redirect(url_for('result'))
+
+
+def job_event(job):
+    job_data = job.to_dict()
+    summaries = job.result if job.status == 'finished' else job.partial
+    if summaries is not None:
+        job_data['inputs'], job_data['outputs'] = (sims_histograms(sims_summaries) for sims_summaries in summaries)
+
+    event_type = 'done' if job.done else 'progress'
+    return 'event: {}\ndata: {}\n\n'.format(event_type, json.dumps(job_data).replace('\n', ''))
+
+
+@app.route('/simulate/<job_id>/events')
+def simulation_events(job_id):
+    job = get_job_queue().get(job_id, session_owner())
+    if job is None:
+        abort(404)
+
+    interval = app.config['JOB_EVENT_INTERVAL']
+
+    def events():
+        # at most one event per interval, however often the job reports, and a comment line to keep idle connections open
+        version = None
+        while True:
+            current_version = job.wait(version, timeout=15)
+            if current_version == version and not job.done:
+                yield ': keep-alive\n\n'
+                continue
+
+            version = current_version
+            yield job_event(job)
+            if job.done:
+                return
+            time.sleep(interval)
+
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/simulate/<job_id>/result')
+def simulation_result(job_id):
+    job = get_job_queue().get(job_id, session_owner())
+    if job is None:
+        abort(404)
+    if job.status != 'finished':
+        response = jsonify(job.to_dict())
+        response.status_code = 409
+        return response
+
+    inputs_summaries, outputs_summaries = job.result
+    return jsonify({'inputs': sims_histograms(inputs_summaries), 'outputs': sims_histograms(outputs_summaries)})
+
+
+# ANALYTIC ESTIMATES #
+def defined_outputs(output_forms):
+    # outputs still being edited may be incomplete, so only the named and defined ones are expanded
+    return {output_id: output_data for output_id, output_data in (output_forms or {}).items()
+            if output_data.get('output_name') and output_data.get('output_defn')}
+
+
+def analytic_preview(inputs, output_forms, second_order=False):
+    outputs = defined_outputs(output_forms)
+    if not inputs or not outputs:
+        return {}
+    try:
+        correlations = parse_correlations((session.get('settings') or {}).get('setting_correlations'))
+    except CorrelationError:
+        correlations = None
+    return analytic_outputs(outputs, inputs, second_order, correlations)
+
+
+def worst_case_preview(inputs, output_forms, k_sigma=None):
+    outputs = defined_outputs(output_forms)
+    if not inputs or not outputs:
+        return {}
+    if k_sigma is None:
+        k_sigma = (session.get('settings') or {}).get('setting_k_sigma') or 3.0
+    return worst_case_outputs(outputs, inputs, k_sigma)
+
+
+@app.route('/analytic')
+def analytic():
+    """Returns root-sum-square (or with ?second_order=1, second order) mean and standard deviation estimates
+    of the session's outputs, computed from their symbolic derivatives without sampling."""
+
+    inputs = session.get('inputs')
+    if not inputs:
+        abort(404)
+
+    second_order = request.args.get('second_order', '').lower() in ('1', 'true', 'yes')
+    return jsonify(analytic_preview(inputs, session.get('outputs'), second_order))
+
+
+@app.route('/worst_case')
+def worst_case():
+    """Returns the worst-case min and max of the session's outputs by interval arithmetic, with unbounded
+    inputs cut at setting_k_sigma (or ?k_sigma=...) standard deviations."""
+
+    inputs = session.get('inputs')
+    if not inputs:
+        abort(404)
+
+    try:
+        k_sigma = float(request.args['k_sigma']) if request.args.get('k_sigma') else None
+    except ValueError:
+        abort(400)
+    if k_sigma is not None and not k_sigma > 0:
+        abort(400)
+
+    return jsonify(worst_case_preview(inputs, session.get('outputs'), k_sigma))
+
+
+# QUERIES #
+@app.route('/query')
+def query():
+    """Answers percentile and spec limit questions about the session's finished simulation, e.g.
+    /query?variable=Compression&percentile=2.5&percentile=97.5&lsl=0.1&usl=0.4
+
+    Every variable is answered if none is given; with no outputs defined the inputs are queried."""
+
+    inputs = session.get('inputs')
+    outputs = session.get('outputs')
+    settings = session.get('settings')
+    job = session_job(inputs, outputs, settings) if inputs and settings else None
+    if job is None or job.status != 'finished':
+        abort(404)
+
+    try:
+        percentiles = [float(percentile) for percentile in request.args.getlist('percentile')]
+        lsl, usl = (float(request.args[limit]) if request.args.get(limit) else None for limit in ('lsl', 'usl'))
+    except ValueError:
+        abort(400)
+    if any(not 0 <= percentile <= 100 for percentile in percentiles):
+        abort(400)
+
+    inputs_summaries, outputs_summaries = job.result
+    sims_summaries = dict(inputs_summaries, **outputs_summaries)
+    variables = request.args.getlist('variable') or list(outputs_summaries or inputs_summaries)
+    if any(variable not in sims_summaries for variable in variables):
+        abort(404)
+
+    return jsonify({
+        variable: query_index(get_sample_index(job.key, variable, sims_summaries[variable]), percentiles, lsl, usl)
+        for variable in variables
+    })
+
+
+def tail_job(job, flask_app, inputs, outputs, variable, lsl, usl, settings, n):
+    # runs on a job queue worker thread, outside of any request
+    with flask_app.app_context():
+        return tail_probabilities(inputs, outputs, variable, lsl, usl, settings, n)
+
+
+@app.route('/tail')
+def tail():
+    """Estimates the fraction of an output outside its spec limits by importance sampling, for yields in the
+    parts-per-million range that plain simulation would need ~10^8 iterations to resolve, e.g.
+    /tail?variable=Compression&lsl=0.1&usl=0.4&n=50000
+
+    Does not need a finished simulation; samples are drawn around the most probable failure point of each limit.
+    The estimate is computed on the job queue: until it is ready the job is returned (202) with its status url,
+    and asking again returns the estimate."""
+
+    inputs = session.get('inputs')
+    outputs = session.get('outputs')
+    settings = session.get('settings') or {'setting_alpha': 0.05}
+
+    variable = request.args.get('variable')
+    if not inputs or not outputs or variable not in {output_spec['output_name'] for output_spec in outputs.values()}:
+        abort(404)
+
+    try:
+        lsl, usl = (float(request.args[limit]) if request.args.get(limit) else None for limit in ('lsl', 'usl'))
+        n = int(request.args.get('n', app.config['IMPORTANCE_SAMPLES']))
+    except ValueError:
+        abort(400)
+    if (lsl is None and usl is None) or not 2 <= n <= app.config['IMPORTANCE_MAX_SAMPLES']:
+        abort(400)
+    try:
+        # correlations saved before the inputs were renamed or removed no longer apply
+        input_correlations(inputs, settings)
+    except CorrelationError:
+        abort(400)
+
+    key = sample_key(kind='tail', inputs=inputs, outputs=outputs, settings=settings, variable=variable, lsl=lsl, usl=usl, n=n)
+    job = get_job_queue().get(session.get('tail_job_id'), session_owner())
+    if job is None or job.key != key or job.status in ('failed', 'cancelled'):
+        try:
+            job = get_job_queue().submit(
+                session_owner(), tail_job, app._get_current_object(), inputs, outputs, variable, lsl, usl, settings, n,
+                key=key, total=n)
+            session['tail_job_id'] = job.id
+        except JobRejected as error:
+            return job_rejected_response(error)
+
+    if job.status == 'finished':
+        return jsonify(job.result)
+
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers['Location'] = url_for('simulation_status', job_id=job.id)
+    return response
+
+
+# SCENARIO SWEEPS #
+def sweep_job(job, flask_app, inputs, outputs, settings, sweep):
+    # runs on a job queue worker thread, outside of any request
+    with flask_app.app_context():
+        scenarios = sweep_scenarios(sweep)
+        # every scenario is simulated in each chunk, so chunks are shortened to hold about as many samples as a single run's
+        chunk_size = max(2 ** 10, app.config['SIM_CHUNK_SIZE'] // len(scenarios))
+        scenarios_summaries = sim_sweep(
+            inputs=inputs, outputs=outputs, settings=settings, scenarios=scenarios, chunk_size=chunk_size, progress=job.report)
+        return sweep_table(inputs, scenarios, scenarios_summaries, settings['setting_alpha'])
+
+
+@app.route('/sweep', methods=['POST', 'GET'])
+def sweep():
+    """Simulates a grid of variants of the model (e.g. nominal dimensions or tolerances swept over a range) as one
+    run from common random numbers, and tabulates the statistics of every variant."""
+
+    inputs = session.get('inputs')
+    outputs = session.get('outputs')
+    settings = session.get('settings')
+
+    if not inputs:
+        abort(404)
+    if not settings:
+        settings = {'setting_alpha': 0.05, 'setting_n': 5000, 'setting_seed': generate_seed()}
+        session['settings'] = settings
+
+    sweep_form = SweepForm(data={'sweep_parameters': session.get('sweep_parameters')})
+
+    if sweep_form.validate_on_submit():
+        session['sweep_parameters'] = sweep_form.sweep_parameters.data
+        sweep_spec = parse_sweep(sweep_form.sweep_parameters.data, inputs, app.config['SWEEP_MAX_SCENARIOS'])
+        try:
+            job = get_job_queue().submit(
+                session_owner(), sweep_job, app._get_current_object(), inputs, outputs, settings, sweep_spec,
+                key=sample_key(kind='sweep', inputs=inputs, outputs=outputs, settings=settings, sweep=sweep_spec),
+                total=settings['setting_n'])
+            session['sweep_job_id'] = job.id
+        except JobRejected as error:
+            if wants_json():
+                return job_rejected_response(error)
+            flash(str(error))
+        return redirect(url_for('sweep'))
+
+    job = get_job_queue().get(session.get('sweep_job_id'), session_owner())
+    table = job.result if job is not None and job.status == 'finished' else None
+
+    if wants_json():
+        if job is None:
+            abort(404)
+        return jsonify(dict(job.to_dict(), table=table))
+
+    return render_template('sweep.html', form=sweep_form, job=job, table=table)
+
+
+# DESIGN COMPARISON #
+def compare_job(job, flask_app, variants, settings):
+    # runs on a job queue worker thread, outside of any request
+    with flask_app.app_context():
+        # every variant is simulated in each chunk, so chunks are shortened to hold about as many samples as a single run's
+        chunk_size = max(2 ** 10, app.config['SIM_CHUNK_SIZE'] // len(variants))
+        variants_summaries, differences = sim_compare(
+            variants=variants, settings=settings, chunk_size=chunk_size, store=get_sample_store(), progress=job.report)
+        return comparison_table(variants_summaries, differences, settings['setting_alpha'])
+
+
+def session_designs():
+    """Returns the session's saved designs, and the current model as current_design, of the form {design name: (inputs, outputs)}."""
+
+    designs = {design_name: (design['inputs'], design['outputs']) for design_name, design in (session.get('designs') or {}).items()}
+    if session.get('inputs'):
+        designs[current_design] = (session['inputs'], session.get('outputs') or {})
+    return designs
+
+
+@app.route('/compare', methods=['POST', 'GET'])
+def compare():
+    """Compares saved designs (e.g. the current design against a proposed one) on common random numbers and
+    reports the paired differences of their outputs with confidence intervals at setting_alpha."""
+
+    settings = session.get('settings')
+    if not settings:
+        settings = {'setting_alpha': 0.05, 'setting_n': 5000, 'setting_seed': generate_seed()}
+        session['settings'] = settings
+
+    designs = session_designs()
+    design_form = DesignForm()
+    compare_form = CompareForm()
+    compare_form.compare_baseline.choices = compare_form.compare_variants.choices = [(design_name, design_name) for design_name in designs]
+
+    if design_form.submit_design.data and design_form.validate_on_submit():
+        if not session.get('inputs'):
+            abort(400)
+        # reassigned rather than updated in place so the session is saved
+        session['designs'] = dict(session.get('designs') or {}, **{
+            design_form.design_name.data: {'inputs': session['inputs'], 'outputs': session.get('outputs') or {}}})
+        return redirect(url_for('compare'))
+
+    if compare_form.submit_compare.data and compare_form.validate_on_submit():
+        variants = {design_name: designs[design_name] for design_name in [compare_form.compare_baseline.data, *compare_form.compare_variants.data]}
+        try:
+            job = get_job_queue().submit(
+                session_owner(), compare_job, app._get_current_object(), variants, settings,
+                key=sample_key(kind='comparison', variants=variants, settings=settings), total=settings['setting_n'])
+            session['compare_job_id'] = job.id
+        except JobRejected as error:
+            if wants_json():
+                return job_rejected_response(error)
+            flash(str(error))
+        return redirect(url_for('compare'))
+
+    job = get_job_queue().get(session.get('compare_job_id'), session_owner())
+    table = job.result if job is not None and job.status == 'finished' else None
+
+    if wants_json():
+        if job is None:
+            abort(404)
+        return jsonify(dict(job.to_dict(), table=table))
+
+    return render_template('compare.html', design_form=design_form, compare_form=compare_form, designs=designs,
+                           job=job, table=table, settings=settings)
+
+
+@app.route('/compare/<design_name>/delete', methods=['POST'])
+def compare_delete(design_name):
+    designs = dict(session.get('designs') or {})
+    if designs.pop(design_name, None) is None:
+        abort(404)
+    session['designs'] = designs
+    return redirect(url_for('compare'))
+
+
+# SENSITIVITY ANALYSIS #
+def sobol_job(job, flask_app, inputs, outputs, settings):
+    # runs on a job queue worker thread, outside of any request
+    with flask_app.app_context():
+        # every base sample is evaluated inputs + 2 times, so chunks are shortened to hold about as many samples as a single run's
+        chunk_size = max(2 ** 8, app.config['SIM_CHUNK_SIZE'] // (len(inputs) + 2))
+        outputs_sums = sim_sobol(inputs=inputs, outputs=outputs, settings=settings, chunk_size=chunk_size, progress=job.report)
+        return sobol_table(inputs, outputs_sums, settings['setting_alpha'])
+
+
+def rank_preview(inputs, outputs, settings):
+    # a short ordinary run is enough to rank the inputs
+    preview_settings = dict(settings, setting_n=min(settings['setting_n'], app.config['SENSITIVITY_PREVIEW_SIZE']))
+    inputs_data = sim_inputs(inputs=inputs, settings=preview_settings, store=get_sample_store())
+    outputs_data = sim_outputs(outputs=outputs, inputs=inputs, inputs_data=inputs_data, settings=preview_settings)
+    return rank_correlations(inputs_data, outputs_data)
+
+
+@app.route('/sensitivity', methods=['POST', 'GET'])
+def sensitivity():
+    """Shows which inputs drive the variance of each output: a rank correlation preview from a short run, and
+    on request (POST) first and total order Sobol indices computed on the job queue."""
+
+    inputs = session.get('inputs')
+    outputs = session.get('outputs')
+    settings = session.get('settings')
+
+    if not inputs or not outputs:
+        abort(404)
+    if not settings:
+        settings = {'setting_alpha': 0.05, 'setting_n': 5000, 'setting_seed': generate_seed()}
+        session['settings'] = settings
+
+    if request.method == 'POST':
+        try:
+            job = get_job_queue().submit(
+                session_owner(), sobol_job, app._get_current_object(), inputs, outputs, settings,
+                key=sample_key(kind='sobol', inputs=inputs, outputs=outputs, settings=settings), total=settings['setting_n'])
+            session['sobol_job_id'] = job.id
+        except JobRejected as error:
+            if wants_json():
+                return job_rejected_response(error)
+            flash(str(error))
+        return redirect(url_for('sensitivity'))
+
+    job = get_job_queue().get(session.get('sobol_job_id'), session_owner())
+    if job is not None and job.key != sample_key(kind='sobol', inputs=inputs, outputs=outputs, settings=settings):
+        # indices of a model that has since been edited
+        job = None
+    sobol = job.result if job is not None and job.status == 'finished' else None
+    ranks = rank_preview(inputs, outputs, settings)
+
+    if wants_json():
+        return jsonify({'rank': ranks, 'sobol': sobol, 'job': job.to_dict() if job is not None else None})
+
+    return render_template('sensitivity.html', ranks=ranks, sobol=sobol, job=job, settings=settings)
+
+
+# RESULTS #
+def result_plot_keys(inputs, outputs, settings, job=None):
+    # one plot of the inputs and, if there are any, one of the outputs
+    plot_names = ('inputs', 'outputs') if outputs else ('inputs',)
+    if job is not None and job.stopped_early:
+        # only part of the model's result, so its plots are addressed by the job (and point) that stopped
+        settings = dict(settings, stopped_job=job.id, stopped_at=job.iterations)
+    return {plot_name: plot_key(inputs, outputs, settings, plot_name, {'normalize': True}) for plot_name in plot_names}
+
+
+def remember_result_plots(inputs, outputs, settings, job):
+    for plot_name, key in result_plot_keys(inputs, outputs, settings, job).items():
+        remember_plot(key, plot_name, dict(zip(('inputs', 'outputs'), job.result))[plot_name])
+
 
 @app.route('/result')
 def result():
@@ -163,26 +737,93 @@ def result():
     settings = session.get('settings')
 
     if not settings:
-        settings = {'setting_alpha': 0.05, 'setting_n': 5000}
+        settings = {'setting_alpha': 0.05, 'setting_n': 5000, 'setting_seed': generate_seed()}
+        session['settings'] = settings
 
-    inputs_plot_b64 = None
-    outputs_plot_b64 = None
+    plot_format = request.args.get('plots', app.config['RESULT_PLOT_FORMAT'])
 
+    job = None
     if inputs:
-        inputs_data = sim_inputs(inputs=inputs, settings=settings)
-        fig, ax = plot_sim_data(inputs_data)
-        fig.suptitle('Independent Variable Probably Densities')
-        ax.legend()
-        inputs_plot_b64 = fig_to_base64(fig)
-        if outputs:
-            outputs_data = sim_outputs(outputs=outputs, inputs=inputs, inputs_data=inputs_data, settings=settings)
-            fig, ax = plot_sim_data(outputs_data)
-            fig.suptitle('Dependent Variable Probably Densities')
-            ax.legend()
-            outputs_plot_b64 = fig_to_base64(fig)
-
-
-    return render_template('result.html', inputs_plot_b64=inputs_plot_b64.decode('utf8'), outputs_plot_b64=outputs_plot_b64.decode('utf8'))
+        # results are computed by the job queue; this page only shows them once they are ready
+        job = session_job(inputs, outputs, settings)
+        if job is None:
+            try:
+                job = submit_simulation(inputs, outputs, settings)
+            except JobRejected as error:
+                flash(str(error))
+                return render_template('pending.html', job=None, plot_format=plot_format), job_rejected_status(error), {'Retry-After': '5'}
+
+        if job.status != 'finished':
+            return render_template('pending.html', job=job, plot_format=plot_format)
+
+    inputs_plot = outputs_plot = None
+    intervals = iterations = estimates = worst_cases = reductions = None
+
+    if inputs:
+        # confidence intervals at setting_alpha, and the iterations it took (fewer than setting_n if stopped early)
+        inputs_summaries, outputs_summaries = job.result
+        intervals = sims_intervals(outputs_summaries or inputs_summaries, settings['setting_alpha'],
+                                   parse_spec_limits(settings.get('setting_spec_limits')))
+        iterations = next(iter(inputs_summaries.values())).stats.count if inputs_summaries else 0
+        reductions = reduction_report(outputs_summaries)
+
+        # the root-sum-square estimates as a sanity check against the sampled moments
+        estimates = {output_name: dict(estimate, sampled=outputs_summaries[output_name].stats)
+                    for output_name, estimate in analytic_preview(inputs, outputs).items()
+                    if output_name in outputs_summaries}
+        worst_cases = worst_case_preview(inputs, outputs, settings.get('setting_k_sigma'))
+
+    if not inputs:
+        pass
+    elif plot_format == 'png':
+        # images are served (and cached by the browser) from their own content addressed urls
+        plot_keys = result_plot_keys(inputs, outputs, settings, job)
+        remember_result_plots(inputs, outputs, settings, job)
+
+        inputs_plot = plot_keys['inputs']
+        outputs_plot = plot_keys.get('outputs')
+    else:
+        # ship binned histograms and let the browser draw them
+        inputs_plot = sims_histograms_json(sims_summaries=inputs_summaries)
+        if outputs_summaries:
+            outputs_plot = sims_histograms_json(sims_summaries=outputs_summaries)
+
+    return render_template('result.html', plot_format=plot_format, inputs_plot=inputs_plot, outputs_plot=outputs_plot,
+                           image_formats=image_mimetypes, job=job, seed=settings.get('setting_seed'),
+                           settings=settings, intervals=intervals, iterations=iterations,
+                           analytic=estimates, worst_case=worst_cases, reductions=reductions)
+
+
+@app.route('/plot/<key>.<img_format>')
+def result_plot(key, img_format):
+    if img_format not in image_mimetypes:
+        abort(404)
+
+    # the key addresses the image content, so it doubles as a strong ETag
+    etag = '{}.{}'.format(key, img_format)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        image_bytes = get_image(key, img_format)
+
+        if image_bytes is None:
+            # not rendered by this worker (or since evicted), so fall back on the session's finished simulation
+            inputs = session.get('inputs')
+            outputs = session.get('outputs')
+            settings = session.get('settings')
+            job = session_job(inputs, outputs, settings) if inputs and settings else None
+
+            if job is None or job.status != 'finished' or key not in result_plot_keys(inputs, outputs, settings, job).values():
+                abort(404)
+
+            remember_result_plots(inputs, outputs, settings, job)
+            image_bytes = get_image(key, img_format)
+
+        response = Response(image_bytes, mimetype=image_mimetypes[img_format])
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age={}, immutable'.format(app.config['IMAGE_MAX_AGE'])
+    return response
 
 
 @app.route('/report')
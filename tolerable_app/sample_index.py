@@ -0,0 +1,129 @@
+from .store import MemoryStore, sample_key
+import numpy as np
+
+
+# SAMPLE INDEXES #
+class SampleIndex:
+    """Sorted, read-only copy of one variable's samples.
+
+    Built once per run in O(n log n); afterwards a percentile is an O(1) lookup and a tail
+    probability an O(log n) binary search, so spec limits can be queried as often as needed."""
+
+    exact = True
+
+    def __init__(self, sorted_samples, mean=None, stdev=None):
+        self.samples = sorted_samples
+        self.count = len(sorted_samples)
+        self.mean = float(np.mean(sorted_samples)) if mean is None else mean
+        self.stdev = float(np.std(sorted_samples, ddof=1)) if stdev is None else stdev
+
+    @classmethod
+    def from_samples(cls, samples, mean=None, stdev=None):
+        sorted_samples = np.sort(np.asarray(samples, dtype=float).ravel())
+        sorted_samples.setflags(write=False)
+        return cls(sorted_samples, mean, stdev)
+
+    def percentile(self, percentile):
+        # linear interpolation between order statistics, as numpy.percentile
+        position = percentile / 100 * (self.count - 1)
+        lower = int(np.floor(position))
+        upper = min(lower + 1, self.count - 1)
+        return float(self.samples[lower] + (position - lower) * (self.samples[upper] - self.samples[lower]))
+
+    def fraction_below(self, limit):
+        return np.searchsorted(self.samples, limit, side='left') / self.count
+
+    def fraction_above(self, limit):
+        return 1 - np.searchsorted(self.samples, limit, side='right') / self.count
+
+
+class SummaryIndex:
+    """Approximate stand-in for SampleIndex built from a SimSummary, for runs whose samples were never
+    held in memory at once (streamed or parallel runs). Answers come from the summary's quantile sketch."""
+
+    exact = False
+
+    def __init__(self, sim_summary):
+        self.summary = sim_summary
+        self.count = sim_summary.stats.count
+        self.mean = sim_summary.stats.mean
+        self.stdev = sim_summary.stats.stdev
+
+    def percentile(self, percentile):
+        return self.summary.quantile(percentile / 100)
+
+    def fraction_below(self, limit):
+        return self.summary.fraction_below(limit)
+
+    def fraction_above(self, limit):
+        # the sketch is continuous, so the fraction at exactly the limit is negligible
+        return 1 - self.summary.fraction_below(limit)
+
+
+def query_index(index, percentiles=(), lsl=None, usl=None):
+    """Answers percentile and spec limit questions about one variable.
+
+    - Accepts lsl and usl as the lower and upper spec limits (either may be None)
+    - Returns a dict of the form {'exact': ..., 'count': ..., 'mean': ..., 'stdev': ..., 'percentiles': {...},
+      'fraction_below_lsl': ..., 'fraction_above_usl': ..., 'yield': ..., 'cpk': ...}"""
+
+    answer = {
+        'exact': index.exact,
+        'count': index.count,
+        'mean': index.mean,
+        'stdev': index.stdev,
+        'percentiles': {'{:g}'.format(percentile): index.percentile(percentile) for percentile in percentiles}
+    }
+
+    if lsl is None and usl is None:
+        return answer
+
+    below = index.fraction_below(lsl) if lsl is not None else 0.0
+    above = index.fraction_above(usl) if usl is not None else 0.0
+
+    # process capability against whichever limits are given
+    capabilities = []
+    if index.stdev > 0:
+        if usl is not None:
+            capabilities.append((usl - index.mean) / (3 * index.stdev))
+        if lsl is not None:
+            capabilities.append((index.mean - lsl) / (3 * index.stdev))
+
+    answer.update({
+        'fraction_below_lsl': below,
+        'fraction_above_usl': above,
+        'yield': 1 - below - above,
+        'cpk': min(capabilities) if capabilities else None
+    })
+    return answer
+
+
+# CONFIGURED INDEX STORE #
+# sorted samples are held in process (never in the shared sample store) so every query stays a memory lookup
+index_store = MemoryStore()
+
+
+def configure_index_store(max_bytes=256 * 2 ** 20):
+    global index_store
+    index_store = MemoryStore(max_bytes=max_bytes)
+    return index_store
+
+
+def index_key(result_key, sim_name):
+    return sample_key(kind='index', result=result_key, name=sim_name)
+
+
+def build_sample_indexes(result_key, sims_data):
+    """Sorts and stores the samples of a run of the form {name: array-like data} for later queries."""
+
+    for sim_name, sim_data in sims_data.items():
+        index_store.set(index_key(result_key, sim_name), SampleIndex.from_samples(sim_data).samples)
+
+
+def get_sample_index(result_key, sim_name, sim_summary):
+    """Returns the SampleIndex of a run's variable, or a SummaryIndex of its summary if no samples were kept."""
+
+    sorted_samples = index_store.get(index_key(result_key, sim_name))
+    if sorted_samples is None:
+        return SummaryIndex(sim_summary)
+    return SampleIndex(sorted_samples, sim_summary.stats.mean, sim_summary.stats.stdev)
@@ -0,0 +1,56 @@
+from scipy.stats import qmc
+import numpy as np
+import warnings
+
+
+# SAMPLING STRATEGIES #
+sampling_tags = (
+    'random',
+    'lhs',
+    'sobol',
+    'halton'
+)
+
+sampling_labels = (
+    'Pseudo-Random',
+    'Latin Hypercube',
+    'Scrambled Sobol',
+    'Scrambled Halton'
+)
+
+sampling_choices = tuple(zip(sampling_tags, sampling_labels))
+
+
+def strategy_rng(seed=None, block_index=0, stream=0):
+    """Returns the generator used to scramble (or stratify) the unit samples of a block.
+
+    Streams are spawned from the seed on a separate branch from the pseudo-random
+    block streams so that changing the strategy never reuses their draws."""
+
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block_index, 1, stream)))
+
+
+def sample_unit(strategy='random', n=100, d=1, seed=None, block_index=0, chunk_size=None):
+    """Returns an (n, d) array of samples on the open unit hypercube.
+
+    - Accepts strategy as one of sampling_tags
+    - Low-discrepancy sequences ('sobol', 'halton') share one scrambling per seed and are
+      fast-forwarded to block_index * chunk_size so that chunked runs continue the sequence
+    - Latin Hypercube samples are stratified within each block"""
+
+    if strategy in ('sobol', 'halton'):
+        engine_class = qmc.Sobol if strategy == 'sobol' else qmc.Halton
+        engine = engine_class(d, scramble=True, seed=strategy_rng(seed))
+        if block_index and chunk_size:
+            engine.fast_forward(block_index * chunk_size)
+        with warnings.catch_warnings():
+            # Sobol' balance warnings for n that are not powers of two are expected for user chosen n
+            warnings.simplefilter('ignore')
+            unit_samples = engine.random(n)
+    elif strategy == 'lhs':
+        unit_samples = qmc.LatinHypercube(d, seed=strategy_rng(seed, block_index)).random(n)
+    else:
+        unit_samples = strategy_rng(seed, block_index).random((n, d))
+
+    # keep samples away from 0 and 1 so inverse CDFs of unbounded distributions stay finite
+    return np.clip(unit_samples, np.finfo(float).tiny, 1 - np.finfo(float).epsneg)
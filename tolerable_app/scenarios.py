@@ -0,0 +1,172 @@
+from .precision import tolerance_percentiles
+from itertools import product
+import numpy as np
+import re
+
+
+# SCENARIO SWEEPS #
+class SweepError(ValueError):
+    """Raised when a scenario sweep cannot be applied to the inputs."""
+
+
+def parse_sweep_values(text):
+    """Parses the values of one swept parameter, either listed ('0.95 1.0 1.05') or as an
+    evenly spaced range written start:stop:count ('0.95:1.05:11')."""
+
+    text = text.strip()
+    try:
+        if ':' in text:
+            start, stop, count = text.split(':')
+            if int(count) < 1:
+                raise SweepError('A range needs at least one value.')
+            return tuple(float(value) for value in np.linspace(float(start), float(stop), int(count)))
+        return tuple(float(value) for value in text.split())
+    except ValueError:
+        raise SweepError("'{}' is not a list of numbers or a start:stop:count range.".format(text))
+
+
+def parse_sweep(text, inputs, max_scenarios=None, details_errors=None):
+    """Parses a sweep written one parameter per line as 'Input Name, parameter, values', e.g.
+    'Gland Depth, mean, 0.95:1.05:5' where parameter is an input detail without its type prefix.
+
+    - Accepts inputs of the same form as sim_inputs
+    - Accepts details_errors as a function of (input type, input details) returning a list of error messages,
+      which every swept input of every scenario is checked against
+    - Returns a tuple of the form ((input id, input details key, (value, ...)), ...)
+    - Raises SweepError for unknown inputs or parameters, for grids larger than max_scenarios and
+      for scenarios with invalid input details"""
+
+    ids_by_name = {input_spec['input_name']: input_id for input_id, input_spec in inputs.items()}
+
+    sweep = []
+    for line in re.split(r'[;\n]+', text or ''):
+        if not line.strip():
+            continue
+        parts = [part.strip() for part in line.split(',', 2)]
+        if len(parts) != 3:
+            raise SweepError("'{}' is not of the form 'Input Name, parameter, values'.".format(line.strip()))
+
+        input_name, parameter, values = parts
+        if input_name not in ids_by_name:
+            raise SweepError("'{}' is not an input.".format(input_name))
+
+        input_spec = inputs[ids_by_name[input_name]]
+        details_key = '{}_input_{}'.format(input_spec['input_type'], parameter)
+        numeric_keys = [key for key, value in input_spec['input_details'].items() if isinstance(value, (int, float))]
+        if details_key not in numeric_keys:
+            parameters = ', '.join(key.split('_input_', 1)[-1] for key in numeric_keys)
+            raise SweepError("'{}' has no numeric parameter '{}' (it has: {}).".format(input_name, parameter, parameters))
+        if any(swept_id == ids_by_name[input_name] and swept_key == details_key for swept_id, swept_key, __ in sweep):
+            raise SweepError("'{}' {} is swept more than once.".format(input_name, parameter))
+
+        sweep.append((ids_by_name[input_name], details_key, parse_sweep_values(values)))
+
+    if max_scenarios is not None and count_scenarios(sweep) > max_scenarios:
+        raise SweepError('The sweep has {} scenarios, more than the {} allowed.'.format(count_scenarios(sweep), max_scenarios))
+
+    if details_errors is not None:
+        check_scenarios(inputs, sweep, details_errors)
+
+    return tuple(sweep)
+
+
+def check_scenarios(inputs, sweep, details_errors):
+    """Raises SweepError for the first scenario whose swept inputs have invalid details (e.g. a negative stdev)."""
+
+    swept_ids = {input_id for input_id, __, __ in sweep}
+    for scenario in sweep_scenarios(sweep):
+        for input_id, input_spec in scenario_inputs(inputs, scenario).items():
+            if input_id not in swept_ids:
+                continue
+            errors = details_errors(input_spec['input_type'], input_spec['input_details'])
+            if errors:
+                values = ', '.join('{} {} = {:g}'.format(inputs[swept_id]['input_name'], details_key.split('_input_', 1)[-1], value)
+                                   for (swept_id, details_key), value in scenario.items())
+                raise SweepError("'{}' is invalid where {}: {}".format(input_spec['input_name'], values, ' '.join(errors)))
+
+
+def count_scenarios(sweep):
+    return int(np.prod([len(values) for __, __, values in sweep])) if sweep else 0
+
+
+def sweep_scenarios(sweep):
+    """Expands a sweep into its grid of scenarios, varying the last parameter fastest.
+
+    - Returns a list of the form [{(input id, input details key): value, ...}, ...]"""
+
+    keys = [(input_id, details_key) for input_id, details_key, __ in sweep]
+    return [dict(zip(keys, values)) for values in product(*(values for __, __, values in sweep))]
+
+
+def scenario_inputs(inputs, scenario):
+    """Returns a copy of inputs with the details of one scenario applied."""
+
+    scenario_inputs = {input_id: dict(input_spec, input_details=dict(input_spec['input_details'])) for input_id, input_spec in inputs.items()}
+    for (input_id, details_key), value in scenario.items():
+        scenario_inputs[input_id]['input_details'][details_key] = value
+    return scenario_inputs
+
+
+# SCENARIO TABLES #
+def sweep_table(inputs, scenarios, scenarios_summaries, alpha):
+    """Tabulates the summaries of every scenario of a sweep.
+
+    - Accepts scenarios_summaries as a list with one {name: SimSummary} per scenario
+    - Returns a dict of the form {'parameters': [label, ...], 'statistics': [label, ...],
+      'rows': [{'values': [...], 'variables': {name: {statistic: value}}}, ...]}"""
+
+    keys = list(scenarios[0]) if scenarios else []
+    parameters = ['{} {}'.format(inputs[input_id]['input_name'], details_key.split('_input_', 1)[-1]) for input_id, details_key in keys]
+    lower, upper = tolerance_percentiles(alpha)
+
+    rows = []
+    for scenario, sims_summaries in zip(scenarios, scenarios_summaries):
+        variables = {}
+        for sim_name, sim_summary in sims_summaries.items():
+            stats = sim_summary.stats
+            variables[sim_name] = {
+                'mean': stats.mean,
+                'stdev': stats.stdev,
+                'p{:g}'.format(lower): sim_summary.quantile(lower / 100),
+                'p{:g}'.format(upper): sim_summary.quantile(upper / 100),
+                'min': stats.min,
+                'max': stats.max
+            }
+        rows.append({'values': [scenario[key] for key in keys], 'variables': variables})
+
+    statistics = ['mean', 'stdev', 'p{:g}'.format(lower), 'p{:g}'.format(upper), 'min', 'max']
+    return {'parameters': parameters, 'statistics': statistics, 'rows': rows}
+
+
+if __name__ == "__main__":
+    # SWEEP AGAINST SEPARATE RUNS #
+    # run as a module from the repository root: python -m tolerable_app.scenarios
+    from .simulate import sim_stream, sim_sweep
+    import time
+
+    inputs = {'inputform_0': {'input_details': {'normal_input_mean': 1.0, 'normal_input_stdev': 0.05}, 'input_name': 'Gland Depth', 'input_type': 'normal'}, 'inputform_1': {'input_details': {'normal_input_mean': 1.0, 'normal_input_stdev': 0.08}, 'input_name': 'Oring Chord', 'input_type': 'normal'}, 'inputform_2': {'input_details': {'normal_input_mean': 0.25, 'normal_input_stdev': 0.05}, 'input_name': 'Tab Height', 'input_type': 'normal'}}
+    outputs = {'outputform_0': {'output_defn': '1 - (Gland Depth - Tab Height)/(Oring Chord)', 'output_name': 'O-ring Compression', 'output_vis': True}}
+    settings = {'setting_alpha': 0.05, 'setting_n': 20000, 'setting_seed': 0}
+
+    # 50 variants: ten nominal gland depths by five chord tolerances
+    sweep = parse_sweep('Gland Depth, mean, 0.95:1.05:10\nOring Chord, stdev, 0.04:0.08:5', inputs)
+    scenarios = sweep_scenarios(sweep)
+
+    start = time.perf_counter()
+    swept = sim_sweep(inputs=inputs, outputs=outputs, settings=settings, scenarios=scenarios, chunk_size=2 ** 12)
+    sweep_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # separate runs as they are made through the forms, each with a new seed
+    separate = [sim_stream(inputs=scenario_inputs(inputs, scenario), outputs=outputs, settings=dict(settings, setting_seed=index))[1]
+                for index, scenario in enumerate(scenarios)]
+    separate_time = time.perf_counter() - start
+
+    print('{} scenarios x {} iterations: one sweep {:.2f} s, separate runs {:.2f} s'.format(
+        len(scenarios), settings['setting_n'], sweep_time, separate_time))
+
+    # the mean is close to linear in the gland depth, so its second differences along the depth are
+    # sampling noise; common random numbers cancel most of it
+    for label, runs in (('sweep', swept), ('separate runs', separate)):
+        means = np.array([summaries['O-ring Compression'].stats.mean for summaries in runs]).reshape(10, 5)
+        print('{:>14}: mean |second difference| of the mean along gland depth {:.2e}'.format(label, np.abs(np.diff(means, n=2, axis=0)).mean()))
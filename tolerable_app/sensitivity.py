@@ -0,0 +1,178 @@
+from .precision import z_value
+from scipy.stats import rankdata
+import numpy as np
+
+
+# SOBOL INDICES #
+class SobolSums:
+    """Running sums of the Saltelli (first order) and Jansen (total order) estimators of one output.
+
+    Each chunk of evaluations is of the form (inputs + 2, n): row 0 evaluated at sample A, row 1 at
+    sample B and row 2 + i at AB_i (A with input i taken from B). With V the variance of the output,
+        first order  S_i  = mean(f(B) (f(AB_i) - f(A))) / V
+        total order  ST_i = mean((f(A) - f(AB_i))^2) / 2V
+    Both are means of per-sample terms, so only sums (and sums of squares, for intervals) are kept."""
+
+    def __init__(self, dims):
+        self.count = 0
+        self.shift = None
+        self.value_sum = 0.0
+        self.value_squares = 0.0
+        self.first_sum = np.zeros(dims)
+        self.first_squares = np.zeros(dims)
+        self.total_sum = np.zeros(dims)
+        self.total_squares = np.zeros(dims)
+
+    def add(self, values):
+        # samples where any evaluation is undefined (e.g. a division by zero) are left out of every sum
+        values = values[:, np.isfinite(values).all(axis=0)]
+        if not values.shape[1]:
+            return
+
+        if self.shift is None:
+            # centering on an early estimate of the mean avoids cancellation in the variance and
+            # reduces the variance of the first order estimator, whose expectation it does not change
+            self.shift = float(np.mean(values[0]))
+
+        f_a = values[0] - self.shift
+        f_b = values[1] - self.shift
+        f_ab = values[2:] - self.shift
+
+        first_terms = f_b * (f_ab - f_a)
+        total_terms = (f_a - f_ab) ** 2 / 2
+
+        self.count += values.shape[1]
+        self.value_sum += float(f_a.sum() + f_b.sum())
+        self.value_squares += float(np.dot(f_a, f_a) + np.dot(f_b, f_b))
+        self.first_sum += first_terms.sum(axis=1)
+        self.first_squares += (first_terms ** 2).sum(axis=1)
+        self.total_sum += total_terms.sum(axis=1)
+        self.total_squares += (total_terms ** 2).sum(axis=1)
+
+    @property
+    def variance(self):
+        # from both independent samples A and B
+        if self.count < 2:
+            return 0.0
+        values = 2 * self.count
+        return max((self.value_squares - self.value_sum ** 2 / values) / (values - 1), 0.0)
+
+    def indices(self, alpha=0.05):
+        """Returns a dict of the form {'count': ..., 'variance': ..., 'first': array, 'first_half_width': array,
+        'total': array, 'total_half_width': array} with half widths of (1 - alpha) confidence intervals
+        (normal approximations that neglect the uncertainty of the variance)."""
+
+        dims = len(self.first_sum)
+        variance = self.variance
+        if variance <= 0:
+            # a constant output has nothing to apportion
+            zeros = np.zeros(dims)
+            return {'count': self.count, 'variance': variance, 'first': zeros, 'first_half_width': zeros,
+                    'total': zeros, 'total_half_width': zeros}
+
+        estimates = {'count': self.count, 'variance': variance}
+        for order, term_sum, term_squares in (('first', self.first_sum, self.first_squares), ('total', self.total_sum, self.total_squares)):
+            mean = term_sum / self.count
+            term_variance = np.maximum(term_squares / self.count - mean ** 2, 0) * self.count / max(self.count - 1, 1)
+            estimates[order] = mean / variance
+            estimates[order + '_half_width'] = z_value(alpha) * np.sqrt(term_variance / self.count) / variance
+
+        return estimates
+
+
+def sobol_table(inputs, outputs_sums, alpha):
+    """Tabulates the Sobol indices of every output by input.
+
+    - Accepts outputs_sums of the form {output name: SobolSums} as returned by simulate.sim_sobol
+    - Returns a dict of the form {output name: {'count': ..., 'variance': ..., 'inputs': {input name:
+      {'first': ..., 'first_half_width': ..., 'total': ..., 'total_half_width': ...}}}}"""
+
+    input_names = [input_spec['input_name'] for input_spec in inputs.values()]
+
+    table = {}
+    for output_name, sobol_sums in outputs_sums.items():
+        estimates = sobol_sums.indices(alpha)
+        table[output_name] = {
+            'count': estimates['count'],
+            'variance': estimates['variance'],
+            'inputs': {
+                input_name: {key: float(estimates[key][index]) for key in ('first', 'first_half_width', 'total', 'total_half_width')}
+                for index, input_name in enumerate(input_names)
+            }
+        }
+    return table
+
+
+# RANK CORRELATION PREVIEW #
+def rank_correlations(inputs_data, outputs_data):
+    """Spearman rank correlation of every output with every input, as a quick sensitivity preview.
+
+    Cheap (one ordinary run) and robust to monotone nonlinearity, but blind to interactions and to
+    non-monotone effects, for which the Sobol indices are needed. The shares are the squared
+    correlations normalized to one.
+
+    - Accepts inputs_data and outputs_data of the form {name: array-like data} from the same run
+    - Returns a dict of the form {output name: {input name: {'correlation': ..., 'share': ...}}}"""
+
+    def standardized_ranks(data):
+        ranks = rankdata(np.asarray(data, dtype=float))
+        ranks -= ranks.mean()
+        norm = np.sqrt(np.dot(ranks, ranks))
+        return ranks / norm if norm > 0 else ranks
+
+    inputs_ranks = {input_name: standardized_ranks(input_data) for input_name, input_data in inputs_data.items()}
+
+    preview = {}
+    for output_name, output_data in outputs_data.items():
+        finite = np.isfinite(output_data)
+        if finite.all():
+            output_ranks = standardized_ranks(output_data)
+            correlations = {input_name: float(np.dot(ranks, output_ranks)) for input_name, ranks in inputs_ranks.items()}
+        else:
+            output_ranks = standardized_ranks(output_data[finite])
+            correlations = {input_name: float(np.dot(standardized_ranks(np.asarray(inputs_data[input_name])[finite]), output_ranks))
+                            for input_name in inputs_ranks}
+
+        total = sum(correlation ** 2 for correlation in correlations.values())
+        preview[output_name] = {
+            input_name: {'correlation': correlation, 'share': correlation ** 2 / total if total > 0 else 0.0}
+            for input_name, correlation in correlations.items()
+        }
+    return preview
+
+
+if __name__ == "__main__":
+    # SOBOL COST AGAINST THE NUMBER OF INPUTS #
+    # run as a module from the repository root: python -m tolerable_app.sensitivity [base samples]
+    from .simulate import sim_sobol, sim_inputs, sim_outputs
+    import sys
+    import time
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2 ** 13
+    settings = {'setting_alpha': 0.05, 'setting_n': n, 'setting_seed': 0}
+
+    # a linear stack of parts whose tolerances double along the stack, so the true indices are known:
+    # S_i = ST_i = stdev_i^2 / sum of stdev_j^2
+    for d in (3, 10, 30, 100):
+        names = ['Part {}'.format(number) for number in range(d)]
+        stdevs = [0.01 * 2 ** (4 * number / d) for number in range(d)]
+        inputs = {'inputform_{}'.format(i): {'input_details': {'normal_input_mean': 1.0, 'normal_input_stdev': stdevs[i]}, 'input_name': name, 'input_type': 'normal'}
+                  for i, name in enumerate(names)}
+        outputs = {'outputform_0': {'output_defn': ' + '.join(names), 'output_name': 'Stack', 'output_vis': True}}
+
+        start = time.perf_counter()
+        sobol = sobol_table(inputs, sim_sobol(inputs=inputs, outputs=outputs, settings=settings, chunk_size=max(2 ** 8, 2 ** 16 // (d + 2))), 0.05)['Stack']
+        sobol_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        inputs_data = sim_inputs(inputs=inputs, settings=settings)
+        rank = rank_correlations(inputs_data, sim_outputs(outputs=outputs, inputs=inputs, inputs_data=inputs_data, settings=settings))['Stack']
+        rank_time = time.perf_counter() - start
+
+        exact = np.square(stdevs) / np.sum(np.square(stdevs))
+        first_error = max(abs(sobol['inputs'][name]['first'] - exact[i]) for i, name in enumerate(names))
+        total_error = max(abs(sobol['inputs'][name]['total'] - exact[i]) for i, name in enumerate(names))
+        share_error = max(abs(rank[name]['share'] - exact[i]) for i, name in enumerate(names))
+        print('{:>3} inputs, {} evaluations: sobol {:.2f} s (max error first {:.3f}, total {:.3f}), '
+              'rank preview {:.3f} s (max share error {:.3f})'.format(
+                  d, n * (d + 2), sobol_time, first_error, total_error, rank_time, share_error))
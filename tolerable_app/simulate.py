@@ -1,120 +1,399 @@
-from .symbolic import parse_definition
+from .graph import output_dependencies, topological_order, downstream, inline_definitions
+from .kernels import compile_definition, compile_fused, evaluate_blocked, broadcast_output, normalize_definition
+from .summary import RunningStats, fold_sims_data, merge_summaries
+from .variance_reduction import linear_controls, fold_reductions
+from .sampling import sample_unit
+from .distributions import get_distribution
+from .correlation import input_correlations, correlation_rng, correlate_normal, iman_conover, gaussian_copula
+from .sensitivity import SobolSums
+from .store import sample_key
 import numpy as np
-from sympy import lambdify
-import matplotlib.pyplot as plt
+import zlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import matplotlib as mpl
+
+# RANDOM STREAMS #
+def input_rng(seed=None, block_index=0, input_id=''):
+    """Returns the random generator for one input within one block of iterations.
+
+    Every (block, input) pair draws from its own stream spawned from the seed, so the samples
+    of an input only depend on (seed, block_index, input_id): not on which process simulates
+    the block, and not on the other inputs (editing one input never changes another's samples)."""
+
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block_index, zlib.crc32(input_id.encode('utf8')))))
+
+
+def input_sample_key(input_id, input_spec, settings, block_index=0, chunk_size=None, dim=None, dims=None, correlations=None, antithetic=False):
+    """Returns the content address of an input's samples for the sample store."""
+
+    key_fields = {'correlations': correlations} if correlations else {}
+    if antithetic:
+        key_fields['antithetic'] = True
+    return sample_key(
+        input_id=input_id,
+        input_type=input_spec['input_type'],
+        input_details=input_spec['input_details'],
+        n=settings['setting_n'],
+        seed=settings.get('setting_seed'),
+        sampling=settings.get('setting_sampling', 'random'),
+        block_index=block_index,
+        chunk_size=chunk_size,
+        dim=dim,
+        dims=dims,
+        **key_fields)
+
 
 # DISTRIBUTION SIMULATION #
-def sim_constant(input_details=None, settings=None):
-    """Simulates constant inputs.
+def sim_input(input_spec=None, settings=None, rng=None):
+    """Simulates one input by drawing from its registered distribution.
 
-    - Accepts input_details of the form {'constant_input_value': ...}
+    - Accepts input_spec of the form {'input_name': ..., 'input_type': ..., 'input_details': {...}}
     - Accepts settings of the form {'setting_alpha': ..., 'setting_n': ...}"""
 
-    return np.full(
-                shape=(settings['setting_n']),
-                fill_value=input_details['constant_input_value'])
+    if rng is None:
+        rng = np.random.default_rng()
 
+    distribution = get_distribution(input_spec['input_type'])
+    return distribution.sample(input_spec['input_details'], settings['setting_n'], rng)
 
-def sim_normal(input_details=None, settings=None):
-    """Simulates normal inputs.
 
-    - Accepts input_details of the form {'normal_input_mean': ..., 'normal_input_stdev': ...}
-    - Accepts settings of the form {'setting_alpha': ..., 'setting_n': ...}"""
+def ppf_input(unit_samples, input_spec=None):
+    """Maps unit samples to one input through the inverse CDF of its registered distribution."""
 
-    return np.random.normal(
-                        loc=input_details['normal_input_mean'],
-                        scale=input_details['normal_input_stdev'],
-                        size=(settings['setting_n']))
+    distribution = get_distribution(input_spec['input_type'])
+    return distribution.ppf(unit_samples, input_spec['input_details'])
 
 
-def sim_uniform(input_details=None, settings=None):
-    """Simulates uniform inputs.
+def sim_inputs(inputs=None, settings=None, rng=None, block_index=0, chunk_size=None, store=None):
+    """Simulates inputs according to the input type and details.
 
-    - Accepts input_details of the form {'uniform_input_min': ..., 'uniform_input_max': ...}
-    - Accepts settings of the form {'setting_alpha': ..., 'setting_n': ...}"""
+    - Accepts inputs of the form {input id: {'input_name': ..., 'input_type': ..., 'input_details': {...}}}
+        - Valid input types: any tag in distributions.distribution_registry
+    - Accepts settings of the form {'setting_alpha': ..., 'setting_n': ..., 'setting_seed': ..., 'setting_sampling': ...}
+        - Valid sampling strategies: 'random', 'lhs', 'sobol', 'halton'
+    - Accepts rng as a numpy Generator shared by all inputs (defaults to one stream per input from setting_seed)
+    - Accepts block_index and chunk_size to place the samples within a chunked run
+    - Accepts store as a SampleStore; inputs whose samples are already stored are not re-simulated
+    - Antithetic runs (setting_antithetic) are always sampled through inverse CDFs, see sim_unit
 
-    return np.random.uniform(
-                        low=input_details['uniform_input_min'],
-                        high=input_details['uniform_input_max'],
-                        size=(settings['setting_n']))
+    *Inputs named in setting_correlations are sampled independently as above and then correlated
+    (see correlate_inputs), so the samples of uncorrelated inputs never depend on the correlations.*"""
 
+    if not settings:
+        settings = {'setting_alpha': 0.05, 'setting_n': 100}
 
-def sim_triangle():
-    pass
+    if rng is not None or settings.get('setting_seed') is None:
+        # samples are only reproducible (and so only worth storing) with per-input streams of a known seed
+        store = None
 
+    if inputs and (settings.get('setting_sampling', 'random') != 'random' or settings.get('setting_antithetic')):
+        return sim_inputs_ppf(inputs=inputs, settings=settings, block_index=block_index, chunk_size=chunk_size, store=store)
 
-def sim_pareto():
-    pass
+    if inputs:
+        inputs_data = {}
 
+        for input_id, input_spec in inputs.items():
+            input_data = None
+            if store is not None:
+                key = input_sample_key(input_id, input_spec, settings, block_index, chunk_size)
+                input_data = store.get(key)
+
+            if input_data is None:
+                input_data = sim_input(
+                    input_spec=input_spec,
+                    settings=settings,
+                    rng=rng if rng is not None else input_rng(settings.get('setting_seed'), block_index, input_id))
+                if store is not None:
+                    store.set(key, input_data)
+            
+            inputs_data.setdefault(input_spec['input_name'], input_data)
 
-def sim_poisson():
-    pass
+        correlations = input_correlations(inputs, settings)
+        if correlations:
+            correlate_inputs(inputs, inputs_data, correlations, correlation_rng(settings.get('setting_seed'), block_index))
 
+        return inputs_data
 
-def sim_binomial():
-    pass
+    return None
 
 
-def sim_pert():
-    pass
+def correlate_inputs(inputs, inputs_data, correlations, rng):
+    """Replaces the independent samples of correlated inputs in inputs_data with correlated ones.
+
+    - Accepts correlations of the form ((correlated input id, ...), Cholesky factor of their correlation matrix)
+    - All-normal groups are correlated exactly through the Cholesky factor; groups with any other
+      marginals are reordered with Iman-Conover, which keeps each input's sampled values"""
 
+    input_ids, factor = correlations
+    names = [inputs[input_id]['input_name'] for input_id in input_ids]
+    samples = np.stack([inputs_data[name] for name in names])
 
-def sim_discrete():
-    pass
+    if all(inputs[input_id]['input_type'] == 'normal' for input_id in input_ids):
+        details = [inputs[input_id]['input_details'] for input_id in input_ids]
+        correlated = correlate_normal(
+            samples,
+            np.array([input_details['normal_input_mean'] for input_details in details], dtype=float),
+            np.array([input_details['normal_input_stdev'] for input_details in details], dtype=float),
+            factor)
+    else:
+        correlated = iman_conover(samples, factor, rng)
 
+    for name, input_data in zip(names, correlated):
+        inputs_data[name] = input_data
 
-def sim_inputs(inputs=None, settings=None):
-    """Simulates inputs according to the input type and details.
 
-    - Accepts inputs of the form {input id: {'input_name': ..., 'input_type': ..., 'input_details': {...}}}
-        - Valid input types: 'constant', 'normal', 'uniform'
-    - Accepts settings of the form {'setting_alpha': ..., 'setting_n': ...}"""
+def sim_unit(settings=None, d=1, block_index=0, chunk_size=None):
+    """Draws the (n, d) unit samples of one block with the setting_sampling strategy.
 
-    if not settings:
-        settings = {'setting_alpha': 0.05, 'setting_n': 100}
-    
-    if inputs:
-        sim_input = {'constant': sim_constant, 'normal': sim_normal, 'uniform': sim_uniform}
-        inputs_data = {}
+    With setting_antithetic only the first ceil(n / 2) samples are drawn and the rest are their
+    reflections 1 - u, so sample i is paired with sample i + ceil(n / 2). The pairs are negatively
+    correlated for any output that is monotone in its inputs, which cancels much of the variance of the
+    mean (see variance_reduction.antithetic_units). A reflected Gaussian copula stays reflected, so
+    correlated inputs keep their pairing."""
 
-        for input_id, input_spec in inputs.items():
-            input_data = sim_input[input_spec['input_type']](input_details=input_spec['input_details'],
-                                                            settings=settings)
-            
-            inputs_data.setdefault(input_spec['input_name'], input_data)
+    n = settings['setting_n']
+    antithetic = settings.get('setting_antithetic')
+    unit_samples = sample_unit(
+        strategy=settings.get('setting_sampling', 'random'),
+        n=-(-n // 2) if antithetic else n,
+        d=d,
+        seed=settings.get('setting_seed'),
+        block_index=block_index,
+        chunk_size=chunk_size)
 
-        return inputs_data
+    if antithetic:
+        # reflected samples are clipped again, as 1 - tiny rounds to exactly 1
+        unit_samples = np.clip(np.concatenate((unit_samples, 1 - unit_samples))[:n], np.finfo(float).tiny, 1 - np.finfo(float).epsneg)
+    return unit_samples
 
-    return None
+
+def sim_inputs_ppf(inputs=None, settings=None, block_index=0, chunk_size=None, store=None):
+    """Simulates inputs by mapping stratified or low-discrepancy unit samples through inverse CDFs.
+
+    - Accepts inputs, settings and store of the same form as sim_inputs
+    - Each input is assigned its own dimension of the unit hypercube; correlated inputs are coupled
+      through a Gaussian copula before the inverse CDFs, which keeps the points evenly spread"""
+
+    inputs_data = {}
+    unit_samples = None
+
+    correlations = input_correlations(inputs, settings)
+    correlated_ids = correlations[0] if correlations else ()
+
+    for dim, (input_id, input_spec) in enumerate(inputs.items()):
+        input_data = None
+        if store is not None:
+            key = input_sample_key(input_id, input_spec, settings, block_index, chunk_size, dim=dim, dims=len(inputs),
+                                   correlations=settings.get('setting_correlations') if input_id in correlated_ids else None,
+                                   antithetic=settings.get('setting_antithetic'))
+            input_data = store.get(key)
+
+        if input_data is None:
+            if unit_samples is None:
+                unit_samples = sim_unit(settings=settings, d=len(inputs), block_index=block_index, chunk_size=chunk_size)
+                if correlations:
+                    dims = [list(inputs).index(correlated_id) for correlated_id in correlated_ids]
+                    unit_samples[:, dims] = gaussian_copula(unit_samples[:, dims], correlations[1])
+
+            input_data = ppf_input(unit_samples[:, dim], input_spec=input_spec)
+            if store is not None:
+                store.set(key, input_data)
+
+        inputs_data.setdefault(input_spec['input_name'], input_data)
+
+    return inputs_data
 
 
-def sim_outputs(outputs=None, inputs=None, inputs_data=None, settings=None):
+def output_sample_key(inlined_defn, inputs, settings, block_index=0, chunk_size=None):
+    """Returns the content address of an output's samples for the sample store.
+
+    The definition is keyed with every output it references substituted in, so editing a definition
+    changes the key of that output and of every output downstream of it, and of no other. All inputs
+    are part of the key, as correlations and low-discrepancy sampling couple their samples."""
+
+    return sample_key(
+        kind='output',
+        definition=normalize_definition(inlined_defn),
+        inputs=inputs,
+        n=settings['setting_n'],
+        seed=settings.get('setting_seed'),
+        sampling=settings.get('setting_sampling', 'random'),
+        antithetic=bool(settings.get('setting_antithetic')),
+        correlations=settings.get('setting_correlations') or None,
+        block_index=block_index,
+        chunk_size=chunk_size)
+
+
+def sim_outputs(outputs=None, inputs=None, inputs_data=None, settings=None, fused=True, store=None, block_index=0, chunk_size=None):
     """Simulates outputs according to the output definition.
 
     - Accepts outputs of the form {output id: {'output_name': ..., 'output_defn': ..., 'output_vis': ...}}
     - Accepts inputs_data of the form {input name: array-like input data}
     - Accepts settings of the form {'setting_alpha': ..., 'setting_n': ...}
+    - Accepts fused to evaluate all outputs in one kernel, sharing common subexpressions
+    - Accepts store as a SampleStore, with block_index and chunk_size as in sim_inputs; outputs whose samples
+      are already stored are not re-evaluated, so after an edit only the edited definitions and the outputs
+      downstream of them are
     
-    *Variables referenced in output definition will be simulated if they have not been already."""
+    *Output definitions may refer to other outputs; outputs are evaluated in dependency order
+    and each referenced output is computed once and passed on to the outputs that use it.*"""
 
     if not settings:
         settings = {'setting_alpha': 0.05, 'setting_n': 100}
     
     if outputs:
+        mach_defns, dependencies = output_dependencies(outputs, inputs)
+        # referenced outputs are substituted in so shared terms are found by the fused kernel's cse
+        inlined_defns = inline_definitions(mach_defns, dependencies)
+        shape = np.shape(next(iter(inputs_data.values())))
+
+        computed = {}
+        keys = {}
+        if store is not None and settings.get('setting_seed') is not None:
+            keys = {output_id: output_sample_key(inlined_defns[output_id], inputs, settings, block_index, chunk_size) for output_id in outputs}
+            for output_id, key in keys.items():
+                output_data = store.get(key)
+                if output_data is not None:
+                    computed[output_id] = output_data
+
+        dirty_ids = downstream(dependencies, [output_id for output_id in outputs if output_id not in computed])
+        evaluated = [output_id for output_id in outputs if output_id in dirty_ids]
+        for output_id in evaluated:
+            computed.pop(output_id, None)
+
+        if fused and len(evaluated) > 1:
+            f = compile_fused(tuple(inlined_defns[output_id] for output_id in evaluated), inputs.keys())
+            fused_data = evaluate_blocked(f, tuple(inputs_data.values()), len(evaluated), shape)
+            computed.update(zip(evaluated, fused_data))
+        else:
+            for output_id in topological_order(dependencies):
+                if output_id in computed:
+                    continue
+                f = compile_definition(mach_defns[output_id], (*inputs.keys(), *dependencies[output_id]))
+                output_data = f(*inputs_data.values(), *(computed[dependency] for dependency in dependencies[output_id]))
+                computed[output_id] = broadcast_output(output_data, shape)
+
+        for output_id in evaluated:
+            if output_id in keys:
+                store.set(keys[output_id], computed[output_id])
+
         outputs_data = {}
-        translation = {input_spec['input_name']: input_id for input_id, input_spec in inputs.items()}
         for output_id, output_spec in outputs.items():
-            hum_defn = output_spec['output_defn']
-            mach_defn = parse_definition(hum_defn, translation)
-            f = lambdify(inputs.keys(), mach_defn, 'numpy')
-            output_data = f(*inputs_data.values())
-
-            outputs_data.setdefault(output_spec['output_name'], output_data)
+            outputs_data.setdefault(output_spec['output_name'], computed[output_id])
 
         return outputs_data
 
     return None
 
+
+# STREAMING SIMULATION #
+DEFAULT_CHUNK_SIZE = 2 ** 16
+
+
+def count_blocks(n, chunk_size=DEFAULT_CHUNK_SIZE):
+    return -(-n // chunk_size)
+
+
+def block_size(n, block_index, chunk_size=DEFAULT_CHUNK_SIZE):
+    return min(chunk_size, n - block_index * chunk_size)
+
+
+def sim_chunks(inputs=None, outputs=None, settings=None, chunk_size=DEFAULT_CHUNK_SIZE, block_indices=None, store=None):
+    """Simulates inputs and outputs chunk by chunk, yielding (inputs_data, outputs_data) for each chunk.
+
+    - Accepts inputs, outputs, settings and store of the same form as sim_inputs and sim_outputs
+    - Accepts block_indices as the blocks (chunks) of setting_n to simulate (defaults to all of them)
+    - Only one chunk of input and output data is held in memory at a time"""
+
+    if not settings:
+        settings = {'setting_alpha': 0.05, 'setting_n': 100}
+
+    if block_indices is None:
+        block_indices = range(count_blocks(settings['setting_n'], chunk_size))
+
+    if settings.get('setting_seed') is None:
+        # without a seed the blocks only need to be independent of each other
+        settings = dict(settings, setting_seed=np.random.SeedSequence().entropy)
+
+    for block_index in block_indices:
+        chunk_settings = dict(settings, setting_n=block_size(settings['setting_n'], block_index, chunk_size))
+        inputs_data = sim_inputs(inputs=inputs, settings=chunk_settings, block_index=block_index, chunk_size=chunk_size, store=store)
+        outputs_data = None
+        if inputs_data and outputs:
+            outputs_data = sim_outputs(outputs=outputs, inputs=inputs, inputs_data=inputs_data, settings=chunk_settings,
+                                       store=store, block_index=block_index, chunk_size=chunk_size)
+
+        yield inputs_data, outputs_data
+
+
+def run_controls(inputs=None, outputs=None, settings=None):
+    """Returns the control variates of a run (see variance_reduction.linear_controls), or None if setting_control_variates is off."""
+
+    if not (settings.get('setting_control_variates') and inputs and outputs):
+        return None
+    return linear_controls(outputs, inputs)
+
+
+def fold_chunk(inputs_data=None, outputs_data=None, settings=None, controls=None):
+    """Summarizes one chunk of simulated data, including the variance reduced means of the outputs when
+    the run is antithetic or uses control variates.
+
+    - Accepts controls of the form returned by run_controls
+    - Returns summaries of the form ({input name: SimSummary}, {output name: SimSummary})"""
+
+    inputs_summaries = fold_sims_data({}, inputs_data or {})
+    outputs_summaries = fold_sims_data({}, outputs_data or {})
+
+    if outputs_data and (settings.get('setting_antithetic') or controls):
+        fold_reductions(outputs_summaries, outputs_data, inputs_data, controls, settings.get('setting_antithetic'))
+
+    return inputs_summaries, outputs_summaries
+
+
+def sim_stream(inputs=None, outputs=None, settings=None, chunk_size=DEFAULT_CHUNK_SIZE, store=None, progress=None, stop=None, samples=None):
+    """Simulates inputs and outputs in fixed size chunks and folds each chunk into running summaries.
+
+    - Accepts inputs, outputs, settings and store of the same form as sim_inputs and sim_outputs
+    - Accepts progress as a function of the form progress(iterations done, inputs_summaries, outputs_summaries)
+      called after every chunk (an exception raised by progress stops the simulation)
+    - Accepts stop as a function of the same form returning True once the simulation can end early
+      (setting_n is then only an upper limit)
+    - Accepts samples as a dict that is filled with {name: array-like data} of every chunk once the
+      simulation ends (which keeps every sample in memory)
+    - Returns summaries of the form ({input name: SimSummary}, {output name: SimSummary})
+
+    *Peak memory depends on chunk_size rather than setting_n, unless samples are kept."""
+
+    inputs_summaries = {}
+    outputs_summaries = {}
+    iterations = 0
+    controls = run_controls(inputs, outputs, settings or {})
+    chunks_data = {}
+
+    for inputs_data, outputs_data in sim_chunks(inputs=inputs, outputs=outputs, settings=settings, chunk_size=chunk_size, store=store):
+        # each chunk is summarized on its own before merging so the result matches sim_parallel exactly
+        chunk_inputs_summaries, chunk_outputs_summaries = fold_chunk(inputs_data, outputs_data, settings or {}, controls)
+        if inputs_data:
+            merge_summaries(inputs_summaries, chunk_inputs_summaries)
+            iterations += len(next(iter(inputs_data.values())))
+        if outputs_data:
+            merge_summaries(outputs_summaries, chunk_outputs_summaries)
+        if samples is not None:
+            for sim_name, sim_data in {**(inputs_data or {}), **(outputs_data or {})}.items():
+                chunks_data.setdefault(sim_name, []).append(sim_data)
+
+        if progress:
+            progress(iterations, inputs_summaries, outputs_summaries)
+        if stop and stop(iterations, inputs_summaries, outputs_summaries):
+            break
+
+    if samples is not None:
+        samples.update({sim_name: np.concatenate(sim_data) for sim_name, sim_data in chunks_data.items()})
+
+    return inputs_summaries, outputs_summaries
+
+
 def sim(inputs=None, outputs=None, settings=None):
     """Simulates inputs and outputs according to the input type and details and output definition.
 
@@ -123,36 +402,49 @@ def sim(inputs=None, outputs=None, settings=None):
     - Accepts settings of the form {'setting_alpha': ..., 'setting_n': ...}"""
 
 
-def plot_sim_data(sims_data=None, normalize=True, bin_width=None):
-    if not bin_width:
-        # Generate bin edges for each input
-        all_bin_edges = []
-        for sim_data in sims_data.values():
-            all_bin_edges.append(np.histogram_bin_edges(sim_data, bins='fd'))
+def new_axes(ax=None):
+    # figures are built without pyplot so plotting never touches its global figure registry
+    if ax is None:
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
+    return ax.figure, ax
+
+
+def plot_sim_data(sims_data=None, normalize=True, bin_width=None, ax=None):
+    """Plots simulated data of the form {name: array-like data} on ax (a new Agg figure if no ax is given).
+
+    The data is folded into summaries chunk by chunk, so bins are never fitted to the full arrays."""
+
+    sims_summaries = {}
+    for start in range(0, max((len(sim_data) for sim_data in sims_data.values()), default=0), DEFAULT_CHUNK_SIZE):
+        merge_summaries(sims_summaries, fold_sims_data(
+            {}, {sim_name: sim_data[start:start + DEFAULT_CHUNK_SIZE] for sim_name, sim_data in sims_data.items()}, bin_width))
 
-        # Discover bin intervals for each input
-        all_bin_widths = []
-        for input_bin_edges in all_bin_edges:
-            all_bin_widths.append(input_bin_edges[1] - input_bin_edges[0])
+    return plot_sim_summaries(sims_summaries, normalize=normalize, ax=ax)
 
-        # Determine max bin interval
-        bin_width = max(all_bin_widths)
 
-    fig, ax = plt.subplots()
+def plot_sim_summaries(sims_summaries=None, normalize=True, ax=None):
+    """Plots summaries of the form {name: SimSummary} produced by sim_stream on ax (a new Agg figure if no ax is given)."""
 
-    prop_iter = iter(plt.rcParams['axes.prop_cycle'])
+    fig, ax = new_axes(ax)
 
-    for sim_name, sim_data in sims_data.items():
-        # if input type is constant (all values in array match), plot as bar, not histogram
-        if not all(sim_data == sim_data[0]):
-            # Create bin edges for each input using calculated max bin interval
-            input_bin_edges = np.arange(min(sim_data), max(sim_data), bin_width)
-            ax.hist(sim_data, bins=input_bin_edges, density=normalize, color=next(prop_iter)['color'], alpha=0.5, label=sim_name)
+    prop_iter = iter(mpl.rcParams['axes.prop_cycle'])
+
+    for sim_name, sim_summary in sims_summaries.items():
+        if not sim_summary.stats.count:
+            # nothing but undefined values, so there is nothing to plot
+            continue
+        histogram = sim_summary.histogram
+        # if input type is constant (all values match), plot as bar, not histogram
+        if not sim_summary.is_constant:
+            edges = histogram.edges
+            ax.hist(edges[:-1], bins=edges, weights=histogram.counts, density=normalize, color=next(prop_iter)['color'], alpha=0.5, label=sim_name)
         else:
             if normalize:
-                ax.bar(sim_data[0], 1.0, bin_width, color=next(prop_iter)['color'], alpha=0.5, label=sim_name)
+                ax.bar(sim_summary.stats.min, 1.0, histogram.bin_width, color=next(prop_iter)['color'], alpha=0.5, label=sim_name)
             else:
-                ax.bar(sim_data[0], len(sim_data), bin_width, color=next(prop_iter)['color'], alpha=0.5, label=sim_name)
+                ax.bar(sim_summary.stats.min, sim_summary.stats.count, histogram.bin_width, color=next(prop_iter)['color'], alpha=0.5, label=sim_name)
 
     ax.set_ylabel('PDF (%)')
     ax.set_xlabel('Value')
@@ -160,31 +452,294 @@ def plot_sim_data(sims_data=None, normalize=True, bin_width=None):
     return fig, ax
 
 
-# TODO #
+# SCENARIO MODELING #
+def sim_sweep_inputs(inputs=None, scenarios=None, settings=None, block_index=0, chunk_size=None):
+    """Simulates the inputs of every scenario of a sweep from common random numbers.
+
+    - Accepts inputs and settings of the same form as sim_inputs
+    - Accepts scenarios of the form returned by scenarios.sweep_scenarios
+    - Returns {input name: data} where unswept inputs have shape (n,) and swept inputs (scenarios, n)
+
+    *Every scenario maps the same unit samples through its own inverse CDFs, so differences between
+    scenarios come from the swept parameters rather than from sampling noise.*"""
+
+    unit_samples = sim_unit(settings=settings, d=len(inputs), block_index=block_index, chunk_size=chunk_size)
+
+    correlations = input_correlations(inputs, settings)
+    if correlations:
+        dims = [list(inputs).index(correlated_id) for correlated_id in correlations[0]]
+        unit_samples[:, dims] = gaussian_copula(unit_samples[:, dims], correlations[1])
+
+    swept_keys = list(scenarios[0]) if scenarios else []
+    inputs_data = {}
+
+    for dim, (input_id, input_spec) in enumerate(inputs.items()):
+        details_keys = [details_key for swept_id, details_key in swept_keys if swept_id == input_id]
+        if not details_keys:
+            input_data = ppf_input(unit_samples[:, dim], input_spec=input_spec)
+        else:
+            # scenarios repeat each combination of this input's parameters, which are only mapped once
+            variants = {}
+            for scenario in scenarios:
+                values = tuple(scenario[(input_id, details_key)] for details_key in details_keys)
+                if values not in variants:
+                    variant_details = dict(input_spec['input_details'], **dict(zip(details_keys, values)))
+                    variants[values] = ppf_input(unit_samples[:, dim], input_spec=dict(input_spec, input_details=variant_details))
+            input_data = np.stack([
+                variants[tuple(scenario[(input_id, details_key)] for details_key in details_keys)] for scenario in scenarios])
+
+        inputs_data.setdefault(input_spec['input_name'], input_data)
+
+    return inputs_data
+
+
+def sim_sweep(inputs=None, outputs=None, settings=None, scenarios=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Simulates every scenario of a sweep at once, broadcasting (scenarios, n) input arrays through one fused kernel.
+
+    - Accepts inputs, outputs and settings of the same form as sim_stream
+    - Accepts scenarios of the form returned by scenarios.sweep_scenarios
+    - Accepts chunk_size as the iterations per scenario simulated at a time (a chunk holds scenarios x chunk_size samples)
+    - Accepts progress as a function of the form progress(iterations done per scenario)
+    - Returns a list with one {output name: SimSummary} per scenario ({input name: SimSummary} if there are no outputs)"""
+
+    if settings.get('setting_seed') is None:
+        settings = dict(settings, setting_seed=np.random.SeedSequence().entropy)
+
+    kernel = None
+    if outputs:
+        mach_defns, dependencies = output_dependencies(outputs, inputs)
+        kernel = compile_fused(tuple(inline_definitions(mach_defns, dependencies).values()), inputs.keys())
+
+    scenarios_summaries = [{} for __ in scenarios]
+    iterations = 0
+
+    for block_index in range(count_blocks(settings['setting_n'], chunk_size)):
+        chunk_settings = dict(settings, setting_n=block_size(settings['setting_n'], block_index, chunk_size))
+        shape = (len(scenarios), chunk_settings['setting_n'])
+
+        inputs_data = sim_sweep_inputs(inputs=inputs, scenarios=scenarios, settings=chunk_settings, block_index=block_index, chunk_size=chunk_size)
+        if kernel is not None:
+            results = kernel(*inputs_data.values())
+            sims_data = {output_spec['output_name']: broadcast_output(result, shape) for output_spec, result in zip(outputs.values(), results)}
+        else:
+            sims_data = {input_name: np.broadcast_to(input_data, shape) for input_name, input_data in inputs_data.items()}
+
+        for index, scenario_summaries in enumerate(scenarios_summaries):
+            merge_summaries(scenario_summaries, fold_sims_data({}, {sim_name: sim_data[index] for sim_name, sim_data in sims_data.items()}))
+
+        iterations += chunk_settings['setting_n']
+        if progress:
+            progress(iterations)
+
+    return scenarios_summaries
+
+
+# DESIGN COMPARISON #
+def sim_compare_inputs(variants=None, settings=None, block_index=0, chunk_size=None, store=None):
+    """Simulates the inputs of every variant of a design comparison from common random numbers.
+
+    - Accepts variants of the form {variant name: (inputs, outputs)} with inputs and outputs of the same form as sim_outputs
+    - Accepts settings and store of the same form as sim_inputs
+    - Returns a dict of the form {variant name: {input name: data}}
+
+    *Inputs are matched across variants by name: each name has one column of unit samples, mapped through
+    each variant's own inverse CDF, and an input whose spec is identical in several variants is one shared
+    array (and one stored array across runs).*"""
+
+    names = list(dict.fromkeys(input_spec['input_name'] for inputs, __ in variants.values() for input_spec in inputs.values()))
+    unit_samples = None
+    shared = {}
+
+    variants_data = {}
+    for variant_name, (inputs, __) in variants.items():
+        inputs_data = {}
+        for input_spec in inputs.values():
+            spec_key = sample_key(
+                kind='compare', input_name=input_spec['input_name'], input_type=input_spec['input_type'],
+                input_details=input_spec['input_details'], names=names, n=settings['setting_n'],
+                seed=settings.get('setting_seed'), sampling=settings.get('setting_sampling', 'random'),
+                antithetic=settings.get('setting_antithetic'), correlations=settings.get('setting_correlations'),
+                block_index=block_index, chunk_size=chunk_size)
+
+            if spec_key not in shared and store is not None:
+                input_data = store.get(spec_key)
+                if input_data is not None:
+                    shared[spec_key] = input_data
+
+            if spec_key not in shared:
+                if unit_samples is None:
+                    unit_samples = sim_unit(settings=settings, d=len(names), block_index=block_index, chunk_size=chunk_size)
+                    # correlations are between names, so they hold in every variant that has the named inputs
+                    correlations = input_correlations({name: {'input_name': name} for name in names}, settings)
+                    if correlations:
+                        dims = [names.index(correlated_name) for correlated_name in correlations[0]]
+                        unit_samples[:, dims] = gaussian_copula(unit_samples[:, dims], correlations[1])
+
+                shared[spec_key] = ppf_input(unit_samples[:, names.index(input_spec['input_name'])], input_spec=input_spec)
+                if store is not None:
+                    store.set(spec_key, shared[spec_key])
+
+            inputs_data.setdefault(input_spec['input_name'], shared[spec_key])
+        variants_data[variant_name] = inputs_data
+
+    return variants_data
+
+
+def sim_compare(variants=None, settings=None, chunk_size=DEFAULT_CHUNK_SIZE, store=None, progress=None):
+    """Simulates every variant of a design comparison on the same input streams and accumulates the paired
+    differences of their outputs from the first (baseline) variant.
+
+    - Accepts variants of the same form as sim_compare_inputs, baseline first
+    - Accepts progress as a function of the form progress(iterations done)
+    - Returns (variants_summaries, differences) of the form ({variant name: {output name: SimSummary}},
+      {variant name: {output name: RunningStats of variant - baseline}}) where differences cover the outputs
+      every variant defines
+
+    *Sampling noise common to both designs cancels in each paired difference, so a small change in design
+    is resolved with far fewer iterations than two independent runs need.*"""
+
+    if settings.get('setting_seed') is None:
+        settings = dict(settings, setting_seed=np.random.SeedSequence().entropy)
+
+    baseline, *others = variants
+    output_names = [
+        output_spec['output_name'] for output_spec in variants[baseline][1].values()
+        if all(output_spec['output_name'] in {other_spec['output_name'] for other_spec in outputs.values()} for __, outputs in variants.values())
+    ]
+
+    variants_summaries = {variant_name: {} for variant_name in variants}
+    differences = {variant_name: {output_name: RunningStats() for output_name in output_names} for variant_name in others}
+    iterations = 0
+
+    for block_index in range(count_blocks(settings['setting_n'], chunk_size)):
+        chunk_settings = dict(settings, setting_n=block_size(settings['setting_n'], block_index, chunk_size))
+        variants_inputs = sim_compare_inputs(variants=variants, settings=chunk_settings, block_index=block_index, chunk_size=chunk_size, store=store)
+
+        variants_outputs = {}
+        for variant_name, (inputs, outputs) in variants.items():
+            variants_outputs[variant_name] = sim_outputs(
+                outputs=outputs, inputs=inputs, inputs_data=variants_inputs[variant_name], settings=chunk_settings) or {}
+            merge_summaries(variants_summaries[variant_name], fold_sims_data({}, variants_outputs[variant_name]))
+
+        for variant_name in others:
+            for output_name in output_names:
+                differences[variant_name][output_name].update(variants_outputs[variant_name][output_name] - variants_outputs[baseline][output_name])
+
+        iterations += chunk_settings['setting_n']
+        if progress:
+            progress(iterations)
+
+    return variants_summaries, differences
+
+
 # SENSITIVITY ANALYSIS #
+def sim_saltelli_inputs(inputs=None, settings=None, block_index=0, chunk_size=None):
+    """Simulates one block of the Saltelli sample matrices, stacked so every matrix is evaluated in one call.
 
-# SCENARIO MODELING #
+    - Accepts inputs and settings of the same form as sim_inputs
+    - Returns {input name: data} of shape (inputs + 2, n), where row 0 is sample A, row 1 is sample B
+      and row 2 + i is AB_i (sample A with input i taken from sample B)
+
+    *A and B are the two halves of one (n, 2 x inputs) draw of the sampling strategy, mapped through
+    the inverse CDFs. Sobol indices assume independent inputs, so setting_correlations are ignored.*"""
+
+    dims = len(inputs)
+    unit_samples = sample_unit(
+        strategy=settings.get('setting_sampling', 'random'),
+        n=settings['setting_n'],
+        d=2 * dims,
+        seed=settings.get('setting_seed'),
+        block_index=block_index,
+        chunk_size=chunk_size)
+
+    inputs_data = {}
+    for dim, (input_id, input_spec) in enumerate(inputs.items()):
+        input_data = np.empty((dims + 2, settings['setting_n']))
+        input_data[:] = ppf_input(unit_samples[:, dim], input_spec=input_spec)
+        input_data[1] = input_data[2 + dim] = ppf_input(unit_samples[:, dims + dim], input_spec=input_spec)
+        inputs_data.setdefault(input_spec['input_name'], input_data)
+
+    return inputs_data
+
+
+def sim_sobol(inputs=None, outputs=None, settings=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Estimates first and total order Sobol indices of every output, evaluating the A, B and AB_i samples of
+    each chunk as one (inputs + 2, chunk_size) batch through the fused output kernel.
+
+    - Accepts inputs, outputs and settings of the same form as sim_stream (setting_n base samples cost
+      setting_n x (inputs + 2) evaluations)
+    - Accepts chunk_size as the base samples simulated at a time (a chunk holds (inputs + 2) x chunk_size samples per input)
+    - Accepts progress as a function of the form progress(base samples done)
+    - Returns a dict of the form {output name: sensitivity.SobolSums}"""
+
+    if settings.get('setting_seed') is None:
+        settings = dict(settings, setting_seed=np.random.SeedSequence().entropy)
+
+    mach_defns, dependencies = output_dependencies(outputs, inputs)
+    kernel = compile_fused(tuple(inline_definitions(mach_defns, dependencies).values()), inputs.keys())
+    outputs_sums = {output_spec['output_name']: SobolSums(len(inputs)) for output_spec in outputs.values()}
+    iterations = 0
+
+    for block_index in range(count_blocks(settings['setting_n'], chunk_size)):
+        chunk_settings = dict(settings, setting_n=block_size(settings['setting_n'], block_index, chunk_size))
+        shape = (len(inputs) + 2, chunk_settings['setting_n'])
+
+        inputs_data = sim_saltelli_inputs(inputs=inputs, settings=chunk_settings, block_index=block_index, chunk_size=chunk_size)
+        for output_sums, result in zip(outputs_sums.values(), kernel(*inputs_data.values())):
+            output_sums.add(broadcast_output(result, shape))
+
+        iterations += chunk_settings['setting_n']
+        if progress:
+            progress(iterations)
 
-# CORRELATION PARAMETERS #
-# (Relate independent variables to each other -- some go down as others go up)
-# May be able to do via dependent variables -> dependent = Norm(mean, std.dev = f(independent_value))
-# I.e. define a dependent distribution with a std. dev. dependent on corresponding value of another distribution (independent or dependent)
+    return outputs_sums
 
 
 if __name__ == "__main__":
-    from symbolic import parse_definition
+    # run as a module from the repository root: python -m tolerable_app.simulate
+    from .sampling import sampling_tags
+    import matplotlib.pyplot as plt
+    import time
 
     inputs = {'inputform_0': {'input_details': {'normal_input_mean': 1.0, 'normal_input_stdev': 0.05}, 'input_name': 'Gland Depth', 'input_type': 'normal'}, 'inputform_1': {'input_details': {'normal_input_mean': 1.0, 'normal_input_stdev': 0.08}, 'input_name': 'Oring Chord', 'input_type': 'normal'}, 'inputform_2': {'input_details': {'normal_input_mean': 0.25, 'normal_input_stdev': 0.05}, 'input_name': 'Tab Height', 'input_type': 'normal'}}
     outputs = {'outputform_0': {'output_defn': '1 - (Gland Depth - Tab Height)/(Oring Chord)', 'output_name': 'O-ring Compression', 'output_vis': True}}
     settings = {'setting_alpha': 0.05, 'setting_n': 5000}
 
     inputs_data = sim_inputs(inputs=inputs, settings=settings)
-    fig, ax = plot_sim_data(inputs_data)
+    fig, ax = plot_sim_data(inputs_data, ax=plt.subplots()[1])
     ax.legend()
     plt.show()
 
     outputs_data = sim_outputs(outputs=outputs, inputs=inputs, inputs_data=inputs_data, settings=settings)
-    fig, ax = plot_sim_data(outputs_data)
+    fig, ax = plot_sim_data(outputs_data, ax=plt.subplots()[1])
     ax.legend()
     plt.show()
 
+    # SAMPLING CONVERGENCE BENCHMARK #
+    # RMSE of the mean and of the 0.1 / 99.9 percentiles of O-ring compression over replicate seeds,
+    # measured against a large pseudo-random reference run
+    output_name = 'O-ring Compression'
+    percentiles = (0.1, 99.9)
+    replicates = 20
+
+    reference_settings = dict(settings, setting_n=2 ** 22, setting_seed=0, setting_sampling='random')
+    reference_data = sim_outputs(outputs=outputs, inputs=inputs,
+                                 inputs_data=sim_inputs(inputs=inputs, settings=reference_settings),
+                                 settings=reference_settings)[output_name]
+    reference = np.array((reference_data.mean(), *np.percentile(reference_data, percentiles)))
+
+    print('{:>8} {:>8} {:>12} {:>12} {:>12} {:>10}'.format('strategy', 'n', 'rmse mean', 'rmse p0.1', 'rmse p99.9', 'ms / run'))
+    for strategy in sampling_tags:
+        for n in (2 ** 8, 2 ** 10, 2 ** 12, 2 ** 14):
+            estimates = []
+            start = time.perf_counter()
+            for seed in range(1, replicates + 1):
+                run_settings = dict(settings, setting_n=n, setting_seed=seed, setting_sampling=strategy)
+                output_data = sim_outputs(outputs=outputs, inputs=inputs,
+                                          inputs_data=sim_inputs(inputs=inputs, settings=run_settings),
+                                          settings=run_settings)[output_name]
+                estimates.append((output_data.mean(), *np.percentile(output_data, percentiles)))
+            elapsed = (time.perf_counter() - start) / replicates * 1e3
+
+            rmse = np.sqrt(np.mean((np.array(estimates) - reference) ** 2, axis=0))
+            print('{:>8} {:>8} {:>12.2e} {:>12.2e} {:>12.2e} {:>10.2f}'.format(strategy, n, *rmse, elapsed))
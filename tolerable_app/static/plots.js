@@ -0,0 +1,48 @@
+// Draws the binned histograms computed by the server (see render.py) as overlaid densities.
+
+function decodeTypedArray(encoded) {
+    var binary = atob(encoded.data);
+    var bytes = new Uint8Array(binary.length);
+    for (var i = 0; i < binary.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    return encoded.dtype === 'uint32' ? new Uint32Array(bytes.buffer) : new Float64Array(bytes.buffer);
+}
+
+function histogramTrace(histogram) {
+    var counts = decodeTypedArray(histogram.counts);
+    var x = new Float64Array(counts.length);
+    var y = new Float64Array(counts.length);
+    for (var i = 0; i < counts.length; i++) {
+        x[i] = histogram.start + (i + 0.5) * histogram.width;
+        // constant variables are drawn as a single bar of unit height like the matplotlib plots
+        y[i] = histogram.constant ? 1 : counts[i] / (histogram.total * histogram.width);
+    }
+    return {
+        type: 'bar',
+        name: histogram.name,
+        x: Array.from(x),
+        y: Array.from(y),
+        width: histogram.width,
+        opacity: 0.5
+    };
+}
+
+function plotHistograms(plotId, dataId, title) {
+    drawHistograms(plotId, JSON.parse(document.getElementById(dataId).textContent), title);
+}
+
+function drawHistograms(plotId, histograms, title) {
+    if (!histograms || !histograms.length) {
+        return;
+    }
+    // react redraws in place, so progressive updates do not rebuild the plot
+    Plotly.react(plotId, histograms.map(histogramTrace), {
+        title: title,
+        barmode: 'overlay',
+        bargap: 0,
+        xaxis: {title: 'Value'},
+        yaxis: {title: 'PDF (%)'},
+        legend: {orientation: 'h'}
+    }, {responsive: true});
+}
@@ -0,0 +1,227 @@
+from collections import OrderedDict
+from hashlib import sha256
+from io import BytesIO
+import json
+import numpy as np
+import os
+import sqlite3
+import threading
+import time
+
+
+# SAMPLE KEYS #
+def sample_key(**key_spec):
+    """Returns the content address of simulated data described by key_spec (any JSON serializable values)."""
+
+    return sha256(json.dumps(key_spec, sort_keys=True, default=str).encode('utf8')).hexdigest()
+
+
+def array_to_bytes(array):
+    bin_buffer = BytesIO()
+    np.save(bin_buffer, np.asarray(array), allow_pickle=False)
+    return bin_buffer.getvalue()
+
+
+def bytes_to_array(array_bytes):
+    return np.load(BytesIO(array_bytes), allow_pickle=False)
+
+
+# SAMPLE STORES #
+class SampleStore:
+    """Content-addressed store of simulated arrays.
+
+    Backends implement get_bytes / set_bytes (and optionally delete); arrays are serialized
+    with np.save so any backend that can hold bytes can hold samples."""
+
+    def get(self, key):
+        array_bytes = self.get_bytes(key)
+        if array_bytes is None:
+            return None
+        return bytes_to_array(array_bytes)
+
+    def set(self, key, array):
+        self.set_bytes(key, array_to_bytes(array))
+
+    def get_bytes(self, key):
+        raise NotImplementedError
+
+    def set_bytes(self, key, array_bytes):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class MemoryStore(SampleStore):
+    """In-process store holding arrays (not bytes) with LRU eviction bounded by total array size."""
+
+    def __init__(self, max_bytes=256 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._arrays = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            array = self._arrays.get(key)
+            if array is not None:
+                self._arrays.move_to_end(key)
+            return array
+
+    def set(self, key, array):
+        array = np.array(array)
+        # stored arrays are shared between requests, so they must never be modified in place
+        array.setflags(write=False)
+
+        with self._lock:
+            if key in self._arrays:
+                self.size -= self._arrays.pop(key).nbytes
+            self._arrays[key] = array
+            self.size += array.nbytes
+
+            while self.size > self.max_bytes and self._arrays:
+                __, evicted = self._arrays.popitem(last=False)
+                self.size -= evicted.nbytes
+
+    def get_bytes(self, key):
+        array = self.get(key)
+        return None if array is None else array_to_bytes(array)
+
+    def set_bytes(self, key, array_bytes):
+        self.set(key, bytes_to_array(array_bytes))
+
+    def delete(self, key):
+        with self._lock:
+            array = self._arrays.pop(key, None)
+            if array is not None:
+                self.size -= array.nbytes
+
+
+class SQLiteStore(SampleStore):
+    """Local file store shared by every worker process on a host, with LRU eviction bounded by the total
+    size of the stored arrays (max_bytes, None for no bound)."""
+
+    def __init__(self, path, max_bytes=256 * 2 ** 20):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS samples (key TEXT PRIMARY KEY, data BLOB NOT NULL)')
+            columns = {row[1] for row in connection.execute('PRAGMA table_info(samples)')}
+            # stores created before eviction lack the bookkeeping columns
+            if 'size' not in columns:
+                connection.execute('ALTER TABLE samples ADD COLUMN size INTEGER NOT NULL DEFAULT 0')
+                connection.execute('UPDATE samples SET size = length(data)')
+            if 'used' not in columns:
+                connection.execute('ALTER TABLE samples ADD COLUMN used REAL NOT NULL DEFAULT 0')
+            connection.execute('CREATE INDEX IF NOT EXISTS samples_used ON samples (used)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_bytes(self, key):
+        with self._connect() as connection:
+            row = connection.execute('SELECT data FROM samples WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                connection.execute('UPDATE samples SET used = ? WHERE key = ?', (time.time(), key))
+        return None if row is None else bytes(row[0])
+
+    def set_bytes(self, key, array_bytes):
+        with self._connect() as connection:
+            connection.execute('INSERT OR REPLACE INTO samples (key, data, size, used) VALUES (?, ?, ?, ?)',
+                               (key, sqlite3.Binary(array_bytes), len(array_bytes), time.time()))
+            if self.max_bytes is not None:
+                self._evict(connection)
+
+    def _evict(self, connection):
+        # least recently used first, in the same transaction as the insert so concurrent writers never over-delete
+        excess = connection.execute('SELECT COALESCE(SUM(size), 0) FROM samples').fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+
+        evicted = []
+        for key, size in connection.execute('SELECT key, size FROM samples ORDER BY used'):
+            evicted.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        connection.executemany('DELETE FROM samples WHERE key = ?', evicted)
+
+    @property
+    def size(self):
+        with self._connect() as connection:
+            return connection.execute('SELECT COALESCE(SUM(size), 0) FROM samples').fetchone()[0]
+
+    def delete(self, key):
+        with self._connect() as connection:
+            connection.execute('DELETE FROM samples WHERE key = ?', (key,))
+
+
+class RedisStore(SampleStore):
+    """Store backed by any client with Redis' get / set / delete interface (e.g. redis.Redis).
+
+    - Accepts ttl as the number of seconds samples are kept (None keeps them until evicted by Redis)"""
+
+    def __init__(self, client, prefix='tolerable:samples:', ttl=24 * 60 * 60):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get_bytes(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set_bytes(self, key, array_bytes):
+        self.client.set(self.prefix + key, array_bytes, ex=self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+class LocalRedis:
+    """Minimal in-process stand-in for a Redis client (get / set / delete, expiry ignored) for development."""
+
+    def __init__(self):
+        self._data = {}
+
+    def get(self, key):
+        return self._data.get(key)
+
+    def set(self, key, value, ex=None):
+        self._data[key] = bytes(value)
+        return True
+
+    def delete(self, *keys):
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+
+# CONFIGURED STORE #
+sample_store = None
+
+
+def configure_sample_store(backend=None, max_bytes=256 * 2 ** 20, path=None, url=None):
+    """Sets up the store used by the app.
+
+    - Accepts backend as one of None (no store), 'memory', 'sqlite' (at path) or 'redis' (at url, or a
+      LocalRedis stand-in if no url is given)
+    - Accepts max_bytes as the size the memory and sqlite stores evict down to (Redis evicts by its own policy)"""
+
+    global sample_store
+
+    if backend == 'memory':
+        sample_store = MemoryStore(max_bytes=max_bytes)
+    elif backend == 'sqlite':
+        sample_store = SQLiteStore(path, max_bytes=max_bytes)
+    elif backend == 'redis':
+        if url:
+            import redis
+            sample_store = RedisStore(redis.Redis.from_url(url))
+        else:
+            sample_store = RedisStore(LocalRedis())
+    else:
+        sample_store = None
+
+    return sample_store
+
+
+def get_sample_store():
+    return sample_store
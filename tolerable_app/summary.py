@@ -0,0 +1,358 @@
+import numpy as np
+
+
+# RUNNING SUMMARIES #
+class RunningStats:
+    """Count, mean, variance, min and max of a sample folded in one chunk at a time.
+
+    Chunks are combined with the parallel form of Welford's algorithm (Chan et al.) so
+    that merging two RunningStats gives the same result as updating one with both chunks.
+    Undefined and infinite values (e.g. the square root of a negative output) are left out
+    of every statistic and counted in nonfinite instead."""
+
+    def __init__(self):
+        self.count = 0
+        self.nonfinite = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, data):
+        data = np.asarray(data, dtype=float).ravel()
+        finite = np.isfinite(data)
+        if not finite.all():
+            self.nonfinite += int(data.size - np.count_nonzero(finite))
+            data = data[finite]
+        if not data.size:
+            return self
+
+        other = RunningStats()
+        other.count = data.size
+        other.mean = float(data.mean())
+        other.m2 = float(np.sum((data - other.mean) ** 2))
+        other.min = float(data.min())
+        other.max = float(data.max())
+
+        return self.merge(other)
+
+    def merge(self, other):
+        self.nonfinite += other.nonfinite
+        if not other.count:
+            return self
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self):
+        return np.sqrt(self.variance)
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'nonfinite': self.nonfinite,
+            'mean': self.mean,
+            'stdev': self.stdev,
+            'min': self.min,
+            'max': self.max
+        }
+
+
+class StreamHistogram:
+    """Histogram with a fixed bin width that grows to cover new data.
+
+    Bin widths are powers of two and bins are aligned to zero, so two histograms can
+    always be merged exactly by coarsening the finer one. When the number of bins
+    would exceed max_bins, adjacent bins are paired up and the width is doubled, before
+    any counts are allocated, so a heavy tailed chunk never needs more than max_bins
+    counts however far it reaches. Non-finite values have no bin and are skipped."""
+
+    def __init__(self, bin_width=None, max_bins=512):
+        self.bin_width = bin_width
+        self.max_bins = max_bins
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    @staticmethod
+    def choose_bin_width(data):
+        """Rounds the Freedman-Diaconis bin width of data up to a power of two."""
+
+        # the width is worked out directly, as numpy's 'fd' edges would allocate every bin over the range
+        q25, q75 = np.percentile(data, (25, 75))
+        width = 2 * (q75 - q25) / np.cbrt(data.size)
+        if not width > 0:
+            width = max(abs(float(data[0])), 1.0) * 1e-3
+        return 2.0 ** np.ceil(np.log2(width))
+
+    def update(self, data):
+        data = np.asarray(data, dtype=float).ravel()
+        data = data[np.isfinite(data)]
+        if not data.size:
+            return self
+
+        if self.bin_width is None:
+            self.bin_width = self.choose_bin_width(data)
+
+        # widen the bins until the chunk spans at most max_bins of them (and its indices fit in an int64)
+        low, high = float(data.min()), float(data.max())
+        while (high - low) / self.bin_width > self.max_bins or max(abs(low), abs(high)) / self.bin_width > 2 ** 52:
+            self._coarsen()
+
+        indices = np.floor(data / self.bin_width).astype(np.int64)
+        self._add(indices.min(), np.bincount(indices - indices.min()))
+        self._limit()
+
+        return self
+
+    def merge(self, other):
+        if other.bin_width is None:
+            return self
+        if self.bin_width is None:
+            self.bin_width = other.bin_width
+
+        other = other.copy()
+        while other.bin_width < self.bin_width:
+            other._coarsen()
+        while self.bin_width < other.bin_width:
+            self._coarsen()
+
+        self._add(other.offset, other.counts)
+        self._limit()
+
+        return self
+
+    def copy(self):
+        histogram = StreamHistogram(bin_width=self.bin_width, max_bins=self.max_bins)
+        histogram.offset = self.offset
+        histogram.counts = self.counts.copy()
+        return histogram
+
+    @property
+    def edges(self):
+        return (self.offset + np.arange(len(self.counts) + 1)) * self.bin_width
+
+    def _add(self, offset, counts):
+        if not len(self.counts):
+            self.offset, self.counts = offset, counts.astype(np.int64)
+            return
+
+        # histograms far apart are coarsened together before the bins between them are allocated
+        while max(self.offset + len(self.counts), offset + len(counts)) - min(self.offset, offset) > self.max_bins:
+            self._coarsen()
+            offset, counts = coarsen_counts(offset, counts)
+
+        start = min(self.offset, offset)
+        stop = max(self.offset + len(self.counts), offset + len(counts))
+
+        merged = np.zeros(stop - start, dtype=np.int64)
+        merged[self.offset - start:self.offset - start + len(self.counts)] += self.counts
+        merged[offset - start:offset - start + len(counts)] += counts
+
+        self.offset, self.counts = start, merged
+
+    def _coarsen(self):
+        self.offset, self.counts = coarsen_counts(self.offset, self.counts)
+        self.bin_width *= 2
+
+    def _limit(self):
+        while len(self.counts) > self.max_bins:
+            self._coarsen()
+
+
+def coarsen_counts(offset, counts):
+    """Pairs up adjacent bins of counts starting at bin offset, returning the (offset, counts) at twice the width."""
+
+    # bins are paired on even indices so coarsened histograms stay aligned to zero
+    if offset % 2:
+        counts = np.concatenate(([0], counts))
+    if len(counts) % 2:
+        counts = np.concatenate((counts, [0]))
+
+    return int(np.floor_divide(offset, 2)), counts.reshape(-1, 2).sum(axis=1)
+
+
+class QuantileSketch:
+    """Mergeable t-digest of a sample for quantile and CDF estimates with bounded memory.
+
+    Samples are kept as weighted centroids. A centroid may only cover a span of at most one on
+    the arcsine scale k(q) = compression / (2 pi) * asin(2q - 1), which is steep near q = 0 and 1,
+    so centroids in the tails hold very few samples and extreme percentiles stay accurate. At most
+    about compression / 2 centroids are kept, however many samples or merges there are.
+
+    Compression is fully vectorized and deterministic, so merging per chunk summaries in a fixed
+    order gives the same sketch however the chunks were spread over workers. Non-finite values are
+    skipped (RunningStats counts them)."""
+
+    def __init__(self, compression=500):
+        self.compression = compression
+        self.means = np.zeros(0)
+        self.weights = np.zeros(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def update(self, data):
+        data = np.asarray(data, dtype=float).ravel()
+        data = data[np.isfinite(data)]
+        if not data.size:
+            return self
+
+        self.min = min(self.min, float(data.min()))
+        self.max = max(self.max, float(data.max()))
+        return self._compress(np.concatenate((self.means, data)), np.concatenate((self.weights, np.ones(data.size))))
+
+    def merge(self, other):
+        if not len(other.weights):
+            return self
+
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self._compress(np.concatenate((self.means, other.means)), np.concatenate((self.weights, other.weights)))
+
+    def copy(self):
+        return QuantileSketch(self.compression).merge(self)
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='mergesort')
+        means, weights = means[order], weights[order]
+
+        # group neighbouring centroids by the unit span of the scale function their midpoint falls in
+        cumulative = np.cumsum(weights)
+        q = (cumulative - weights / 2) / cumulative[-1]
+        k = np.floor(self.compression / (2 * np.pi) * np.arcsin(2 * q - 1))
+        starts = np.flatnonzero(np.concatenate(([True], k[1:] != k[:-1])))
+
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+        return self
+
+    def quantile(self, q):
+        """Estimates the q quantile (0 <= q <= 1, scalar or array) by interpolating between centroids."""
+
+        cumulative = np.cumsum(self.weights)
+        positions = np.concatenate(([0.0], (cumulative - self.weights / 2) / cumulative[-1], [1.0]))
+        values = np.concatenate(([self.min], self.means, [self.max]))
+        return np.interp(q, positions, values)
+
+    def cdf(self, x):
+        """Estimates the fraction of the sample at or below x (scalar or array)."""
+
+        cumulative = np.cumsum(self.weights)
+        positions = np.concatenate(([0.0], (cumulative - self.weights / 2) / cumulative[-1], [1.0]))
+        values = np.concatenate(([self.min], self.means, [self.max]))
+        return np.interp(x, values, positions, left=0.0, right=1.0)
+
+
+class SimSummary:
+    """Running statistics, histogram and quantile sketch of one simulated input or output.
+
+    Every part is built per chunk (or per worker) and merged, so plots and percentiles never
+    need the full sample array."""
+
+    def __init__(self, max_bins=512, bin_width=None):
+        self.stats = RunningStats()
+        self.histogram = StreamHistogram(bin_width=bin_width, max_bins=max_bins)
+        self.sketch = QuantileSketch()
+        # variance reduced estimate of the mean (a variance_reduction.ControlledMean), if the run used one
+        self.reduction = None
+
+    def update(self, data):
+        self.stats.update(data)
+        self.histogram.update(data)
+        self.sketch.update(data)
+        return self
+
+    def merge(self, other):
+        self.stats.merge(other.stats)
+        self.histogram.merge(other.histogram)
+        self.sketch.merge(other.sketch)
+        if other.reduction is not None:
+            if self.reduction is None:
+                self.reduction = type(other.reduction)(other.reduction.control_mean, other.reduction.paired)
+            self.reduction.merge(other.reduction)
+        return self
+
+    @property
+    def is_constant(self):
+        return self.stats.min == self.stats.max
+
+    def quantile(self, q):
+        if self.is_constant:
+            return self.stats.min
+        return float(self.sketch.quantile(q))
+
+    def fraction_below(self, x):
+        if self.is_constant:
+            return float(self.stats.min < x)
+        return float(self.sketch.cdf(x))
+
+
+def fold_sims_data(summaries, sims_data, bin_width=None):
+    """Folds a chunk of simulated data of the form {name: array-like data}
+    into summaries of the form {name: SimSummary}."""
+
+    for sim_name, sim_data in sims_data.items():
+        summaries.setdefault(sim_name, SimSummary(bin_width=bin_width)).update(sim_data)
+
+    return summaries
+
+
+def merge_summaries(summaries, other_summaries):
+    """Merges summaries of the form {name: SimSummary} into each other by name."""
+
+    for sim_name, other_summary in other_summaries.items():
+        if sim_name in summaries:
+            summaries[sim_name].merge(other_summary)
+        else:
+            summaries[sim_name] = other_summary
+
+    return summaries
+
+
+def copy_summaries(summaries):
+    """Returns an independent copy of summaries of the form {name: SimSummary}."""
+
+    return {sim_name: SimSummary(summary.histogram.max_bins).merge(summary) for sim_name, summary in summaries.items()}
+
+
+if __name__ == "__main__":
+    # QUANTILE SKETCH ACCURACY #
+    # run as a module from the repository root: python -m tolerable_app.summary
+    # percentiles of merged per chunk sketches against exact percentiles of the full sample
+    rng = np.random.default_rng(0)
+    n = 2 ** 22
+    chunk_size = 2 ** 16
+    percentiles = np.array([0.135, 2.5, 25, 50, 75, 97.5, 99.865])
+
+    samples = {
+        'normal': rng.normal(size=n),
+        'lognormal': rng.lognormal(sigma=1.0, size=n),
+        'uniform': rng.uniform(size=n)
+    }
+
+    print('{:>10} {}'.format('', ' '.join('{:>9}'.format('p{:g}'.format(percentile)) for percentile in percentiles)))
+    for sample_name, sample in samples.items():
+        summary = SimSummary()
+        for start in range(0, n, chunk_size):
+            summary.merge(SimSummary().update(sample[start:start + chunk_size]))
+
+        exact = np.percentile(sample, percentiles)
+        ranks = np.searchsorted(np.sort(sample), summary.sketch.quantile(percentiles / 100)) / n * 100
+        print('{:>10} {}  (rank error in percentage points, {} centroids)'.format(
+            sample_name, ' '.join('{:>9.4f}'.format(error) for error in ranks - percentiles), len(summary.sketch.weights)))
@@ -122,10 +122,21 @@ def update_session_outputs(output_list_form):
     return session_output_forms, shape_mod_update_made
 
 
+def generate_seed():
+    from secrets import randbelow
+    return randbelow(2 ** 32)
+
+
 def capture_settings(settings_form):
-    return {setting_name: setting_value for setting_name, setting_value in settings_form.data.items() \
+    settings = {setting_name: setting_value for setting_name, setting_value in settings_form.data.items() \
         if 'setting_' in setting_name}
 
+    # always record a seed so every result can be reproduced
+    if settings.get('setting_seed') is None:
+        settings['setting_seed'] = generate_seed()
+
+    return settings
+
 
 def fig_to_bin(fig, img_format='png'):
     from io import BytesIO
@@ -0,0 +1,204 @@
+from .analytic import input_moments, linearization
+from .graph import output_dependencies, inline_definitions
+import numpy as np
+
+
+# REDUCED MEAN ESTIMATES #
+class ControlledMean:
+    """Mean of one output estimated from independent units, optionally adjusted by a control variate.
+
+    A unit is one sample, or the mean of an antithetic pair. With a control C of known mean the
+    estimate is mean(Y) - beta (mean(C) - E[C]) with beta = cov(Y, C) / var(C), whose variance is
+    the residual variance of Y regressed on C. Co-moments are merged as in RunningStats, so chunks
+    and workers combine exactly."""
+
+    def __init__(self, control_mean=None, paired=False):
+        self.control_mean = control_mean
+        self.paired = paired
+        self.count = 0
+        self.mean_y = 0.0
+        self.mean_c = 0.0
+        self.m2_y = 0.0
+        self.m2_c = 0.0
+        self.c_yc = 0.0
+
+    def update(self, units, control_units=None):
+        if control_units is None:
+            control_units = np.zeros_like(units)
+        if not len(units):
+            return self
+
+        other = ControlledMean(self.control_mean, self.paired)
+        other.count = len(units)
+        other.mean_y = float(units.mean())
+        other.mean_c = float(control_units.mean())
+        deviations_y = units - other.mean_y
+        deviations_c = control_units - other.mean_c
+        other.m2_y = float(np.dot(deviations_y, deviations_y))
+        other.m2_c = float(np.dot(deviations_c, deviations_c))
+        other.c_yc = float(np.dot(deviations_y, deviations_c))
+
+        return self.merge(other)
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        if self.control_mean is None:
+            self.control_mean = other.control_mean
+        self.paired = self.paired or other.paired
+
+        count = self.count + other.count
+        delta_y = other.mean_y - self.mean_y
+        delta_c = other.mean_c - self.mean_c
+        weight = self.count * other.count / count
+
+        self.mean_y += delta_y * other.count / count
+        self.mean_c += delta_c * other.count / count
+        self.m2_y += other.m2_y + delta_y ** 2 * weight
+        self.m2_c += other.m2_c + delta_c ** 2 * weight
+        self.c_yc += other.c_yc + delta_y * delta_c * weight
+        self.count = count
+
+        return self
+
+    @property
+    def controlled(self):
+        # a control whose units hardly vary would only fit rounding noise, e.g. the antithetic pair means of
+        # a linear control, which are constant when the inputs are symmetric
+        if self.control_mean is None or not self.count:
+            return False
+        scale = max(abs(self.mean_c), np.sqrt(self.m2_y / self.count))
+        return self.m2_c > self.count * (1e-8 * scale) ** 2
+
+    @property
+    def beta(self):
+        return self.c_yc / self.m2_c if self.controlled else 0.0
+
+    @property
+    def estimate(self):
+        if not self.controlled:
+            return self.mean_y
+        return self.mean_y - self.beta * (self.mean_c - self.control_mean)
+
+    @property
+    def standard_error(self):
+        # one degree of freedom is spent on beta when there is a control
+        if self.controlled:
+            residual = max(self.m2_y - self.c_yc ** 2 / self.m2_c, 0.0) / max(self.count - 2, 1)
+        else:
+            residual = self.m2_y / max(self.count - 1, 1)
+        return float(np.sqrt(residual / self.count)) if self.count else 0.0
+
+
+# CONTROL VARIATES #
+def linear_controls(outputs, inputs):
+    """Returns the first order Taylor expansion of every output about the input means, whose mean is exactly
+    its value at the means for any input distributions.
+
+    - Returns a dict of the form {output name: (value at the means, {input name: (slope, input mean)})}
+      leaving out outputs that cannot be differentiated"""
+
+    moments = input_moments(inputs)
+    input_names = {input_id: input_spec['input_name'] for input_id, input_spec in inputs.items()}
+    mach_defns, dependencies = output_dependencies(outputs, inputs)
+    mach_defns = inline_definitions(mach_defns, dependencies)
+
+    controls = {}
+    for output_id, output_spec in outputs.items():
+        try:
+            value, slopes = linearization(mach_defns[output_id], tuple(sorted(moments.items())))
+        except Exception:
+            # definitions are user input, so an output that cannot be expanded simply goes without a control
+            continue
+        if np.isfinite(value) and all(np.isfinite(slope) for slope in slopes.values()):
+            controls[output_spec['output_name']] = (value, {
+                input_names[input_id]: (slope, moments[input_id][0]) for input_id, slope in slopes.items()})
+
+    return controls
+
+
+def control_data(control, inputs_data):
+    value, slopes = control
+    data = np.full(np.shape(next(iter(inputs_data.values()))), value, dtype=float)
+    for input_name, (slope, mean) in slopes.items():
+        data += slope * (np.asarray(inputs_data[input_name], dtype=float) - mean)
+    return data
+
+
+def antithetic_units(data):
+    # sample i is paired with sample i + ceil(n / 2) (see simulate.sim_unit); an odd sample out is left out
+    half = -(-len(data) // 2)
+    paired = len(data) - half
+    return (data[:paired] + data[half:half + paired]) / 2
+
+
+def fold_reductions(outputs_summaries, outputs_data, inputs_data, controls=None, antithetic=False):
+    """Folds a chunk of outputs into the ControlledMean of each output's SimSummary.
+
+    - Accepts outputs_summaries of the form {output name: SimSummary} for this chunk
+    - Accepts controls of the form returned by linear_controls (None for no control variates)
+    - Accepts antithetic as whether the chunk was sampled in antithetic pairs"""
+
+    for output_name, output_data in outputs_data.items():
+        control = (controls or {}).get(output_name)
+        units = np.asarray(output_data, dtype=float)
+        control_units = control_data(control, inputs_data) if control else None
+        if antithetic:
+            units = antithetic_units(units)
+            control_units = antithetic_units(control_units) if control else None
+
+        finite = np.isfinite(units) if control_units is None else np.isfinite(units) & np.isfinite(control_units)
+        reduction = ControlledMean(control[0] if control else None, antithetic)
+        reduction.update(units[finite], control_units[finite] if control else None)
+        outputs_summaries[output_name].reduction = reduction
+
+    return outputs_summaries
+
+
+def reduction_report(outputs_summaries):
+    """Returns the variance reduction achieved for each output's mean.
+
+    - Returns a dict of the form {output name: {'methods': [...], 'estimate': ..., 'standard_error': ...,
+      'plain_standard_error': ..., 'factor': ...}} where factor is the plain variance of the mean over the
+      reduced one, i.e. how many times more iterations plain sampling would need for the same precision"""
+
+    report = {}
+    for output_name, sim_summary in outputs_summaries.items():
+        reduction = sim_summary.reduction
+        if reduction is None or reduction.count < 3:
+            continue
+
+        stats = sim_summary.stats
+        plain_standard_error = stats.stdev / np.sqrt(stats.count)
+        methods = (['antithetic'] if reduction.paired else []) + (['control variate'] if reduction.controlled else [])
+        report[output_name] = {
+            'methods': methods,
+            'estimate': reduction.estimate,
+            'standard_error': reduction.standard_error,
+            'plain_standard_error': float(plain_standard_error),
+            'factor': float(plain_standard_error ** 2 / reduction.standard_error ** 2) if reduction.standard_error > 0 else float('inf')
+        }
+
+    return report
+
+
+if __name__ == "__main__":
+    # VARIANCE REDUCTION BENCHMARK #
+    # run as a module from the repository root: python -m tolerable_app.variance_reduction
+    from .simulate import sim_stream
+    import time
+
+    inputs = {'inputform_0': {'input_details': {'normal_input_mean': 1.0, 'normal_input_stdev': 0.05}, 'input_name': 'Gland Depth', 'input_type': 'normal'}, 'inputform_1': {'input_details': {'normal_input_mean': 1.0, 'normal_input_stdev': 0.08}, 'input_name': 'Oring Chord', 'input_type': 'normal'}, 'inputform_2': {'input_details': {'pareto_input_shape': 4.0, 'pareto_input_scale': 0.2}, 'input_name': 'Tab Height', 'input_type': 'pareto'}}
+    outputs = {'outputform_0': {'output_defn': '1 - (Gland Depth - Tab Height)/(Oring Chord)', 'output_name': 'O-ring Compression', 'output_vis': True}}
+
+    for options in ({}, {'setting_antithetic': True}, {'setting_control_variates': True}, {'setting_antithetic': True, 'setting_control_variates': True}):
+        settings = dict({'setting_alpha': 0.05, 'setting_n': 10 ** 6, 'setting_seed': 0}, **options)
+        start = time.perf_counter()
+        sim_summary = sim_stream(inputs=inputs, outputs=outputs, settings=settings)[1]['O-ring Compression']
+        elapsed = time.perf_counter() - start
+
+        report = reduction_report({'O-ring Compression': sim_summary}).get('O-ring Compression')
+        label = ' and '.join(report['methods']) if report else 'plain sampling'
+        standard_error = report['standard_error'] if report else sim_summary.stats.stdev / np.sqrt(sim_summary.stats.count)
+        print('{:<30} mean {:.6f} standard error {:.2e} variance reduction {:>6.1f}x in {:.2f} s'.format(
+            label, report['estimate'] if report else sim_summary.stats.mean, standard_error, report['factor'] if report else 1.0, elapsed))
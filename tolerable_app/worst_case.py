@@ -0,0 +1,417 @@
+from .distributions import get_distribution
+from .graph import output_dependencies, inline_definitions, CircularDefinitionError
+from .kernels import normalize_definition
+from .symbolic import evaluate, reserved_dict
+from functools import lru_cache
+from sympy import (
+    Abs, Add, Heaviside, Max, Min, Mul, Pow, Symbol, acos, acosh, acot, acoth, acsc, acsch, asec, asech,
+    asin, asinh, atan, atan2, atanh, cos, cosh, cot, coth, csc, csch, diff, exp, log, sec, sign, sin, sinc,
+    sinh, tan, tanh
+)
+import numpy as np
+
+
+# INTERVAL ARITHMETIC #
+# intervals are (low, high) tuples of floats; infinite ends are allowed
+class UnsupportedExpression(ValueError):
+    """Raised when a definition uses an operation the interval evaluator has no rule for."""
+
+
+def interval_add(a, b):
+    return a[0] + b[0], a[1] + b[1]
+
+
+def endpoint_product(x, y):
+    # zero times an infinite end is zero, as the infinite end is never reached
+    return 0.0 if x == 0 or y == 0 else x * y
+
+
+def interval_mul(a, b):
+    products = (endpoint_product(a[0], b[0]), endpoint_product(a[0], b[1]), endpoint_product(a[1], b[0]), endpoint_product(a[1], b[1]))
+    return min(products), max(products)
+
+
+def interval_reciprocal(a):
+    low, high = a
+    if low > 0 or high < 0:
+        return 1 / high, 1 / low
+    if low == high == 0:
+        raise ZeroDivisionError('division by zero')
+    if low == 0:
+        return 1 / high, np.inf
+    if high == 0:
+        return -np.inf, 1 / low
+    return -np.inf, np.inf
+
+
+def clip_domain(a, domain):
+    low, high = max(a[0], domain[0]), min(a[1], domain[1])
+    if low > high:
+        raise ValueError('math domain error')
+    return low, high
+
+
+def increasing(func, domain=(-np.inf, np.inf)):
+    def apply(a):
+        low, high = clip_domain(a, domain)
+        return func(low), func(high)
+    return apply
+
+
+def decreasing(func, domain=(-np.inf, np.inf)):
+    def apply(a):
+        low, high = clip_domain(a, domain)
+        return func(high), func(low)
+    return apply
+
+
+def even_increasing(func):
+    """Rule for an even function that increases with |x| (abs, cosh)."""
+
+    def apply(a):
+        low, high = a
+        nearest = 0.0 if low <= 0 <= high else min(abs(low), abs(high))
+        return func(nearest), func(max(abs(low), abs(high)))
+    return apply
+
+
+def compose(outer, inner):
+    return lambda a: outer(inner(a))
+
+
+def integer_power(a, n):
+    if n == 0:
+        return 1.0, 1.0
+    if n < 0:
+        return interval_reciprocal(integer_power(a, -n))
+
+    low, high = a
+    if n % 2 or low >= 0:
+        return low ** n, high ** n
+    if high <= 0:
+        return high ** n, low ** n
+    return 0.0, max(low ** n, high ** n)
+
+
+def real_power(a, p):
+    # non-integer powers are only real for non-negative bases
+    if p > 0:
+        return increasing(lambda x: x ** p, (0.0, np.inf))(a)
+    return decreasing(lambda x: x ** p if x > 0 else np.inf, (0.0, np.inf))(a)
+
+
+# PERIODIC AND OSCILLATING FUNCTIONS #
+def contains_point(a, offset, period):
+    """True if [low, high] contains offset + k * period for some integer k."""
+
+    return np.ceil((a[0] - offset) / period) * period + offset <= a[1]
+
+
+def interval_cos(a):
+    low, high = a
+    if not (np.isfinite(low) and np.isfinite(high)) or high - low >= 2 * np.pi:
+        return -1.0, 1.0
+    values = (np.cos(low), np.cos(high))
+    return (-1.0 if contains_point(a, np.pi, 2 * np.pi) else min(values),
+            1.0 if contains_point(a, 0.0, 2 * np.pi) else max(values))
+
+
+def interval_sin(a):
+    return interval_cos((a[0] - np.pi / 2, a[1] - np.pi / 2))
+
+
+def interval_tan(a):
+    if not (np.isfinite(a[0]) and np.isfinite(a[1])) or contains_point(a, np.pi / 2, np.pi):
+        return -np.inf, np.inf
+    return np.tan(a[0]), np.tan(a[1])
+
+
+def interval_cot(a):
+    if not (np.isfinite(a[0]) and np.isfinite(a[1])) or contains_point(a, 0.0, np.pi):
+        return -np.inf, np.inf
+    return 1 / np.tan(a[1]), 1 / np.tan(a[0])
+
+
+# sympy's sinc is the unnormalized sin(x) / x, whose global minimum is at the first root of tan(x) = x
+sinc_first_minimum = 4.493409457909064
+sinc_minimum = -0.21723362821122166
+
+
+def point_sinc(x):
+    return 1.0 if x == 0 else np.sin(x) / x
+
+
+def interval_sinc(a):
+    # even, decreasing in |x| up to its first minimum and bounded by +-1 / |x| beyond it
+    near, far = even_increasing(abs)(a)
+    if far <= sinc_first_minimum:
+        return point_sinc(far), point_sinc(near)
+    high = max(point_sinc(near), 1 / max(near, sinc_first_minimum)) if near > 0 else 1.0
+    low = sinc_minimum if near <= sinc_first_minimum else max(sinc_minimum, -1 / near)
+    return low, high
+
+
+def interval_atan2(y, x):
+    # the angle is continuous unless the box touches the origin or the negative real axis,
+    # and over a box it is extreme at the corners
+    if y[0] <= 0 <= y[1] and x[0] <= 0:
+        return -np.pi, np.pi
+    angles = [np.arctan2(y_end, x_end) for y_end in y for x_end in x]
+    return min(angles), max(angles)
+
+
+unary_rules = {
+    exp: increasing(np.exp),
+    log: increasing(np.log, (0.0, np.inf)),
+    Abs: even_increasing(abs),
+    sin: interval_sin,
+    cos: interval_cos,
+    tan: interval_tan,
+    cot: interval_cot,
+    sec: compose(interval_reciprocal, interval_cos),
+    csc: compose(interval_reciprocal, interval_sin),
+    sinc: interval_sinc,
+    asin: increasing(np.arcsin, (-1.0, 1.0)),
+    acos: decreasing(np.arccos, (-1.0, 1.0)),
+    atan: increasing(np.arctan),
+    acot: compose(increasing(np.arctan), interval_reciprocal),
+    asec: compose(decreasing(np.arccos, (-1.0, 1.0)), interval_reciprocal),
+    acsc: compose(increasing(np.arcsin, (-1.0, 1.0)), interval_reciprocal),
+    sinh: increasing(np.sinh),
+    cosh: even_increasing(np.cosh),
+    tanh: increasing(np.tanh),
+    coth: compose(interval_reciprocal, increasing(np.tanh)),
+    csch: compose(interval_reciprocal, increasing(np.sinh)),
+    asinh: increasing(np.arcsinh),
+    acosh: increasing(np.arccosh, (1.0, np.inf)),
+    atanh: increasing(np.arctanh, (-1.0, 1.0)),
+    acoth: compose(increasing(np.arctanh, (-1.0, 1.0)), interval_reciprocal),
+    asech: compose(increasing(np.arccosh, (1.0, np.inf)), interval_reciprocal),
+    acsch: compose(increasing(np.arcsinh), interval_reciprocal),
+    # step functions appear in the derivatives of abs, max and min
+    sign: increasing(np.sign),
+    Heaviside: increasing(lambda x: np.heaviside(x, 0.5)),
+}
+
+
+def compile_interval(expr, arg_ids):
+    """Compiles a SymPy expression into a function of a box of the form {arg id: (low, high)}
+    that returns an interval enclosing every value the expression takes over the box.
+
+    Raises UnsupportedExpression for operations outside symbolic.reserved_dict."""
+
+    if expr.is_Symbol:
+        if expr.name not in arg_ids:
+            raise UnsupportedExpression("name '{}' is not defined".format(expr.name))
+        return lambda box: box[expr.name]
+
+    if expr.is_number:
+        value = float(expr)
+        return lambda box: (value, value)
+
+    args = [compile_interval(arg, arg_ids) for arg in expr.args]
+
+    if expr.func in (Add, Mul):
+        combine = interval_add if expr.func is Add else interval_mul
+
+        def fold(box):
+            result = args[0](box)
+            for arg in args[1:]:
+                result = combine(result, arg(box))
+            return result
+        return fold
+
+    if expr.func is Pow:
+        base, exponent = args
+        if expr.exp.is_number:
+            p = float(expr.exp)
+            if p == int(p):
+                return lambda box: integer_power(base(box), int(p))
+            return lambda box: real_power(base(box), p)
+        # b ** e = exp(e * log(b))
+        return lambda box: unary_rules[exp](interval_mul(exponent(box), unary_rules[log](base(box))))
+
+    if expr.func in (Max, Min):
+        pick = max if expr.func is Max else min
+        return lambda box: tuple(pick(ends) for ends in zip(*(arg(box) for arg in args)))
+
+    if expr.func is atan2:
+        return lambda box: interval_atan2(args[0](box), args[1](box))
+
+    if expr.func in unary_rules:
+        rule, arg = unary_rules[expr.func], args[0]
+        return lambda box: rule(arg(box))
+
+    raise UnsupportedExpression('worst-case bounds are not supported for {}'.format(expr.func.__name__))
+
+
+# WORST-CASE BOUNDS #
+@lru_cache(maxsize=256)
+def compile_definition(mach_defn, arg_ids):
+    """Parses a machine readable definition over real valued inputs and compiles it and its partial derivatives.
+
+    - Returns (function, (referenced arg ids), {arg id: derivative function or None if it cannot be bounded})"""
+
+    symbols = {arg_id: Symbol(arg_id, real=True) for arg_id in arg_ids}
+    expr = evaluate(mach_defn, local_dict={**reserved_dict, **symbols})
+
+    referenced = tuple(arg_id for arg_id in arg_ids if symbols[arg_id] in expr.free_symbols)
+
+    gradient = {arg_id: None for arg_id in referenced}
+    if expr.has(atan2, acot):
+        # both jump across a branch cut where their derivatives stay bounded, so the derivatives prove nothing
+        return compile_interval(expr, arg_ids), referenced, gradient
+
+    for arg_id in referenced:
+        try:
+            gradient[arg_id] = compile_interval(diff(expr, symbols[arg_id]), arg_ids)
+        except (UnsupportedExpression, TypeError):
+            gradient[arg_id] = None
+
+    return compile_interval(expr, arg_ids), referenced, gradient
+
+
+def monotonicity(derivative, box):
+    """Returns 1 or -1 if the derivative shows the function never decreases or never increases over the box, else 0.
+
+    Only a bounded derivative is trusted, as an unbounded one may hide a pole (1 / x has a negative
+    derivative everywhere, yet is not decreasing across zero)."""
+
+    if derivative is None:
+        return 0
+    try:
+        low, high = derivative(box)
+    except (ValueError, ZeroDivisionError, OverflowError):
+        return 0
+    if not (np.isfinite(low) and np.isfinite(high)):
+        return 0
+    if low >= 0:
+        return 1
+    if high <= 0:
+        return -1
+    return 0
+
+
+def bound_box(function, referenced, gradient, box, refine):
+    """Bounds the function over the box, returning (min, max, exact).
+
+    Inputs the function is monotone in are pinned to the end that gives the min (or max), which removes
+    the overestimation plain interval arithmetic suffers when an input appears more than once. If that
+    pins every input the bounds are attained, so they are exact; otherwise the widest remaining input is
+    bisected up to refine more times and the enclosures of the halves are combined."""
+
+    min_box, max_box = dict(box), dict(box)
+    free = []
+    for arg_id in referenced:
+        low, high = box[arg_id]
+        direction = 1 if low == high else monotonicity(gradient[arg_id], box)
+        if direction:
+            min_box[arg_id] = (low, low) if direction > 0 else (high, high)
+            max_box[arg_id] = (high, high) if direction > 0 else (low, low)
+        else:
+            free.append(arg_id)
+
+    low, high = function(min_box)[0], function(max_box)[1]
+    low, high = (-np.inf if np.isnan(low) else low), (np.inf if np.isnan(high) else high)
+
+    if not free or refine <= 0:
+        return low, high, not free
+
+    widest = max(free, key=lambda arg_id: box[arg_id][1] - box[arg_id][0])
+    middle = sum(box[widest]) / 2
+    if not np.isfinite(middle):
+        return low, high, False
+
+    halves = [
+        bound_box(function, referenced, gradient, dict(box, **{widest: half}), refine - 1)
+        for half in ((box[widest][0], middle), (middle, box[widest][1]))
+    ]
+    return min(half[0] for half in halves), max(half[1] for half in halves), all(half[2] for half in halves)
+
+
+def input_bounds(inputs, k_sigma=3.0):
+    """Returns {input id: (min, max)} from the distribution registry, cutting unbounded tails at k_sigma."""
+
+    return {input_id: tuple(float(bound) for bound in get_distribution(input_spec['input_type']).bounds(input_spec['input_details'], k_sigma))
+            for input_id, input_spec in inputs.items()}
+
+
+def truncated_inputs(inputs, k_sigma=3.0):
+    """Returns the ids of the inputs whose bounds are cut at k_sigma rather than the ends of their support,
+    i.e. the inputs whose bounds still widen when the cut is moved further out."""
+
+    return {input_id for input_id, input_spec in inputs.items()
+            if input_bounds({input_id: input_spec}, k_sigma) != input_bounds({input_id: input_spec}, 2 * k_sigma)}
+
+
+def worst_case_bounds(mach_defn, bounds, refine=6, truncated=()):
+    """Returns {'min': ..., 'max': ..., 'exact': ..., 'truncated': ...} of one machine readable definition over
+    input bounds of the form {input id: (min, max)}. Exact bounds are attained by some combination of input
+    values; otherwise they are guaranteed to enclose every value the definition can take. Either way they only
+    hold within the input bounds, so they are truncated if the definition references any input id in truncated
+    (an input whose tails were cut, which the output exceeds with a small but nonzero probability)."""
+
+    function, referenced, gradient = compile_definition(normalize_definition(mach_defn), tuple(sorted(bounds)))
+    with np.errstate(all='ignore'):
+        # infinite and undefined ends are expected (e.g. log(0) or a reciprocal across zero)
+        low, high, exact = bound_box(function, referenced, gradient, bounds, refine)
+    return {'min': float(low), 'max': float(high), 'exact': exact, 'truncated': any(arg_id in truncated for arg_id in referenced)}
+
+
+def worst_case_outputs(outputs, inputs, k_sigma=3.0, refine=6):
+    """Finds the worst-case min and max of every output without sampling.
+
+    - Accepts outputs and inputs of the same form as sim_outputs
+    - Returns a dict of the form {output name: {'min': ..., 'max': ..., 'exact': ..., 'truncated': ...}} where an
+      output that cannot be bounded (e.g. an invalid or circular definition) maps to {'error': ...}"""
+
+    bounds = input_bounds(inputs, k_sigma)
+    truncated = truncated_inputs(inputs, k_sigma)
+
+    try:
+        mach_defns, dependencies = output_dependencies(outputs, inputs)
+        mach_defns = inline_definitions(mach_defns, dependencies)
+    except CircularDefinitionError as error:
+        return {output_spec['output_name']: {'error': str(error)} for output_spec in outputs.values()}
+
+    results = {}
+    for output_id, output_spec in outputs.items():
+        try:
+            results[output_spec['output_name']] = worst_case_bounds(mach_defns[output_id], bounds, refine, truncated)
+        except Exception as error:
+            # definitions are user input, so any parse or evaluation failure is reported per output
+            results[output_spec['output_name']] = {'error': str(error) or type(error).__name__}
+
+    return results
+
+
+if __name__ == "__main__":
+    # WORST CASE AGAINST SAMPLED EXTREMES #
+    # run as a module from the repository root: python -m tolerable_app.worst_case
+    from .simulate import sim_inputs, sim_outputs
+    import time
+
+    inputs = {'inputform_0': {'input_details': {'uniform_input_min': 0.95, 'uniform_input_max': 1.05}, 'input_name': 'Gland Depth', 'input_type': 'uniform'}, 'inputform_1': {'input_details': {'normal_input_mean': 1.0, 'normal_input_stdev': 0.02}, 'input_name': 'Oring Chord', 'input_type': 'normal'}, 'inputform_2': {'input_details': {'triangle_input_min': 0.2, 'triangle_input_mode': 0.25, 'triangle_input_max': 0.3}, 'input_name': 'Tab Height', 'input_type': 'triangle'}}
+    outputs = {
+        'outputform_0': {'output_defn': '1 - (Gland Depth - Tab Height)/(Oring Chord)', 'output_name': 'O-ring Compression', 'output_vis': True},
+        'outputform_1': {'output_defn': '(Gland Depth - 1)**2 + sin(4 * Tab Height)', 'output_name': 'Non-monotone', 'output_vis': True},
+    }
+    settings = {'setting_alpha': 0.05, 'setting_n': 10 ** 6, 'setting_seed': 0}
+
+    worst_case_outputs(outputs, inputs)  # parse and differentiate once, as the cache does for later calls
+
+    repeats = 1000
+    start = time.perf_counter()
+    for __ in range(repeats):
+        results = worst_case_outputs(outputs, inputs)
+    elapsed = (time.perf_counter() - start) / repeats
+
+    outputs_data = sim_outputs(outputs=outputs, inputs=inputs, inputs_data=sim_inputs(inputs=inputs, settings=settings), settings=settings)
+
+    print('worst case of {} outputs in {:.1f} us (normals cut at 3 sigma)'.format(len(outputs), elapsed * 1e6))
+    for output_name, result in results.items():
+        sampled = outputs_data[output_name]
+        print('{:<20} worst case [{:.5f}, {:.5f}] ({}{})  sampled [{:.5f}, {:.5f}] from {} iterations'.format(
+            output_name, result['min'], result['max'], 'exact' if result['exact'] else 'enclosure',
+            ', inputs cut at 3 sigma' if result['truncated'] else '',
+            sampled.min(), sampled.max(), settings['setting_n']))